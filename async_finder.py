@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Front-end asyncio
+
+Su mount NFS/SMB la latenza per file domina: pochi thread bloccanti lasciano
+inutilizzata la banda disponibile. Questo modulo espone un'API async che
+esegue centinaia di operazioni stat/open/read concorrenti, limitate da
+semafori e delegate a un executor di thread, riusando la logica di
+ImageDuplicateFinder (hash, verifica pixel, report).
+
+Esempio d'uso da un server web async:
+
+    finder = AsyncImageDuplicateFinder(max_concurrency=256)
+    duplicates = await finder.find_duplicates(Path('/mnt/nas/foto'))
+"""
+
+import asyncio
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from image_duplicate_finder import ImageDuplicateFinder
+from scan_filters import ScanFilter
+
+
+class AsyncImageDuplicateFinder:
+    """Esegue scansione e hashing con I/O concorrente tramite asyncio."""
+
+    # Operazioni di I/O concorrenti predefinite (adatte a share ad alta latenza)
+    DEFAULT_CONCURRENCY = 256
+
+    def __init__(self, finder: Optional[ImageDuplicateFinder] = None,
+                 max_concurrency: int = DEFAULT_CONCURRENCY):
+        self.finder = finder or ImageDuplicateFinder()
+        self.max_concurrency = max(1, max_concurrency)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncImageDuplicateFinder":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    def close(self) -> None:
+        """Chiude l'executor dei thread (bloccante: da usare fuori dall'event loop)."""
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def aclose(self) -> None:
+        """Chiude l'executor dei thread senza bloccare l'event loop."""
+        executor, self._executor = self._executor, None
+        if executor:
+            # L'attesa dei thread ancora in corso avviene fuori dall'event loop
+            await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+
+    async def _offload(self, func, *args):
+        """Esegue una chiamata bloccante nell'executor, rispettando il semaforo."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                thread_name_prefix="async-io")
+        if self._semaphore is None:
+            # Creato qui per legarlo all'event loop in esecuzione
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _map(self, func, items: List, *args) -> List:
+        """
+        Applica func a ogni elemento, nell'ordine degli elementi.
+
+        Al più max_concurrency coroutine consumano la lista: con milioni di
+        file non si crea un task per file.
+        """
+        results: List = [None] * len(items)
+        positions = iter(range(len(items)))
+
+        async def consume() -> None:
+            for position in positions:
+                results[position] = await self._offload(func, items[position], *args)
+
+        await asyncio.gather(*(consume() for _ in range(min(self.max_concurrency, len(items)))))
+        return results
+
+    async def _walk(self, root: Path, scan_filter: ScanFilter, found: List[Path]) -> None:
+        """
+        Visita l'albero elencando più directory in parallelo.
+
+        Al più max_concurrency coroutine prelevano le directory da una coda:
+        il numero di task non dipende dalla larghezza o profondità dell'albero.
+        """
+        pending: asyncio.Queue = asyncio.Queue()
+        pending.put_nowait(root)
+
+        async def visit() -> None:
+            while True:
+                directory = await pending.get()
+                try:
+                    subdirs, files = await self._offload(
+                        scan_filter.list_directory, directory, root,
+                        self.finder.SUPPORTED_EXTENSIONS, self.finder.log)
+                except OSError as e:
+                    self.finder.log(f"Impossibile leggere {directory}: {e}")
+                else:
+                    for file_path in files:
+                        found.append(file_path)
+                        self.finder.log(f"Trovata immagine: {file_path}")
+                    for subdir in subdirs:
+                        pending.put_nowait(subdir)
+                finally:
+                    pending.task_done()
+
+        workers = [asyncio.ensure_future(visit()) for _ in range(self.max_concurrency)]
+        finished = asyncio.ensure_future(pending.join())
+        try:
+            # Termina quando la coda è vuota, o subito se un worker fallisce
+            await asyncio.wait([finished, *workers], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (finished, *workers):
+                task.cancel()
+            await asyncio.gather(finished, *workers, return_exceptions=True)
+        for task in workers:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+
+    async def scan_directory(self, directory: Path) -> List[Path]:
+        """Versione async di ImageDuplicateFinder.scan_directory."""
+        self.finder.log(f"Scansionando directory: {directory}")
+
+        if not await self._offload(directory.exists):
+            raise FileNotFoundError(f"Directory non trovata: {directory}")
+        if not await self._offload(directory.is_dir):
+            raise NotADirectoryError(f"Il percorso non è una directory: {directory}")
+
+        # Stesse regole di esclusione della scansione sincrona
+        scan_filter = await self._offload(self.finder.scan_filter.with_ignore_file, directory)
+        found: List[Path] = []
+        await self._walk(directory, scan_filter, found)
+        # Ordine deterministico indipendente dalla latenza delle risposte
+        found.sort()
+        self.finder.image_paths.extend(found)
+        print(f"Trovate {len(self.finder.image_paths)} immagini da analizzare.")
+        return found
+
+    async def find_duplicates_by_hash(self) -> Dict[str, List[Path]]:
+        """Versione async di find_duplicates_by_hash: hash di molti file in parallelo."""
+        print("Calcolando hash dei file...")
+        paths = list(self.finder.image_paths)
+        hashes = await self._map(self.finder.calculate_file_hash, paths, 'md5')
+
+        file_hashes: Dict[str, List[Path]] = defaultdict(list)
+        for path, file_hash in zip(paths, hashes):
+            if file_hash:
+                file_hashes[file_hash].append(path)
+
+        self.finder.file_hashes = file_hashes
+        self.finder.duplicates = {h: p for h, p in file_hashes.items() if len(p) > 1}
+        print(f"Trovati {len(self.finder.duplicates)} gruppi di duplicati basati su hash.")
+        return self.finder.duplicates
+
+    async def verify_duplicates_with_pixel_comparison(self) -> Dict[str, List[Path]]:
+        """Esegue la verifica pixel (CPU-bound) senza bloccare l'event loop."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.finder.verify_duplicates_with_pixel_comparison)
+        return self.finder.duplicates
+
+    async def find_duplicates(self, directory: Path,
+                              pixel_verify: bool = False) -> Dict[str, List[Path]]:
+        """Pipeline completa: scansione, hash ed eventuale verifica pixel."""
+        await self.scan_directory(directory)
+        if not self.finder.image_paths:
+            return {}
+        await self.find_duplicates_by_hash()
+        if pixel_verify:
+            await self.verify_duplicates_with_pixel_comparison()
+        return self.finder.duplicates
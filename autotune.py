@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Auto-tuning della concorrenza
+
+Sceglie automaticamente il numero di worker per hashing e decodifica:
+parte con pochi worker, misura MB/s e file/s su finestre scorrevoli e
+aumenta o riduce la concorrenza (hill climbing) finché il throughput
+smette di crescere. Il valore scelto viene salvato per punto di mount
+e riutilizzato come punto di partenza alla scansione successiva.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+# File in cui vengono salvate le impostazioni scelte per ogni mount
+DEFAULT_TUNING_FILE = Path.home() / '.image_duplicate_finder' / 'autotune.json'
+
+
+def find_mount_point(path: Path) -> str:
+    """Restituisce il punto di mount che contiene il percorso."""
+    current = Path(os.path.abspath(path))
+    while not os.path.ismount(current) and current.parent != current:
+        current = current.parent
+    return str(current)
+
+
+class ConcurrencyTuner:
+    """Regola un limite di concorrenza in base al throughput misurato."""
+
+    def __init__(self, initial: int = 2, minimum: int = 1, maximum: int = 32,
+                 window_seconds: float = 2.0, tolerance: float = 0.05,
+                 log: Optional[Callable[[str], None]] = None, name: str = ""):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(self.maximum, max(self.minimum, initial))
+        self.window_seconds = window_seconds
+        self.tolerance = tolerance
+        self.log = log or (lambda message: None)
+        self.name = name
+
+        self.best_limit = self.limit
+        self.settled = False
+        self._best_score = 0.0
+        self._direction = 1
+        self._plateaus = 0
+        # Fase iniziale: il limite raddoppia finché il throughput cresce
+        self._exploring = True
+        self._lock = threading.Lock()
+        # Campioni (timestamp, byte, file) della finestra scorrevole
+        self._samples: Deque[Tuple[float, int, int]] = deque()
+        self._window_start = time.monotonic()
+
+    def record(self, nbytes: int, files: int = 1) -> None:
+        """Registra il completamento di un'operazione e, se serve, adatta il limite."""
+        now = time.monotonic()
+        with self._lock:
+            self._samples.append((now, nbytes, files))
+            while self._samples and self._samples[0][0] < now - self.window_seconds:
+                self._samples.popleft()
+            if not self.settled and now - self._window_start >= self.window_seconds:
+                self._adjust(now)
+
+    def throughput(self) -> Tuple[float, float]:
+        """Restituisce (byte/s, file/s) misurati sull'ultima finestra."""
+        with self._lock:
+            return self._throughput(time.monotonic())
+
+    def _throughput(self, now: float) -> Tuple[float, float]:
+        if not self._samples:
+            return 0.0, 0.0
+        elapsed = max(now - self._samples[0][0], 1e-3)
+        total_bytes = sum(sample[1] for sample in self._samples)
+        total_files = sum(sample[2] for sample in self._samples)
+        return total_bytes / elapsed, total_files / elapsed
+
+    def _adjust(self, now: float) -> None:
+        """Un passo di hill climbing; chiamato a fine finestra con il lock acquisito."""
+        bytes_rate, files_rate = self._throughput(now)
+        # Punteggio combinato: i file piccoli contano per file/s, quelli grandi per MB/s
+        score = bytes_rate / (1024 * 1024) + files_rate
+
+        if score > self._best_score * (1 + self.tolerance):
+            self._best_score = score
+            self.best_limit = self.limit
+            self._plateaus = 0
+        elif score < self._best_score * (1 - self.tolerance):
+            # Peggioramento: torna al migliore e inverti la direzione
+            self._direction = -self._direction
+            self.limit = self.best_limit
+            self._plateaus += 1
+            self._exploring = False
+        else:
+            self._plateaus += 1
+            self._exploring = False
+
+        if self._plateaus >= 2:
+            self.settled = True
+            self.limit = self.best_limit
+            self.log(f"Auto-tuning {self.name}: stabile a {self.limit} worker "
+                     f"({bytes_rate / 1024 / 1024:.1f} MB/s, {files_rate:.1f} file/s)")
+        else:
+            step = self.limit if self._exploring else self._direction
+            self.limit = min(self.maximum, max(self.minimum, self.limit + step))
+            self.log(f"Auto-tuning {self.name}: {self.limit} worker "
+                     f"({bytes_rate / 1024 / 1024:.1f} MB/s, {files_rate:.1f} file/s)")
+
+        # La finestra successiva misura solo il nuovo limite
+        self._samples.clear()
+        self._window_start = now
+
+
+class TuningStore:
+    """Persistenza su file JSON delle concorrenze scelte per ogni mount."""
+
+    def __init__(self, path: Path = DEFAULT_TUNING_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, mount: str, stage: str) -> Optional[int]:
+        """Restituisce il numero di worker salvato per mount e fase (hash/decode)."""
+        with self._lock:
+            value = self._load().get(mount, {}).get(stage)
+        return int(value) if value else None
+
+    def save(self, mount: str, stage: str, workers: int) -> None:
+        """Salva il numero di worker scelto; errori di scrittura non sono fatali."""
+        with self._lock:
+            data = self._load()
+            entry = data.setdefault(mount, {})
+            entry[stage] = workers
+            entry['updated'] = datetime.now().isoformat(timespec='seconds')
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_suffix('.tmp')
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=2)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                pass
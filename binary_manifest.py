@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Manifest binario e confronto tra librerie
+
+Formato compatto per confrontare librerie senza rileggere le immagini:
+- intestazione fissa (magic, versione, numero di record, posizioni)
+- record a larghezza fissa ordinati per (dimensione, hash):
+    dimensione (u64 big-endian) + MD5 (16 byte)  -> chiave confrontabile byte a byte
+    offset e lunghezza del percorso nella tabella delle stringhe
+- tabella delle stringhe: nome host seguito dai percorsi in UTF-8
+Il confronto (diff) mappa i due file con mmap e li scorre in parallelo come
+un merge: nessuna struttura in memoria proporzionale al numero di file.
+"""
+
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+from manifest import ManifestRecord
+
+MAGIC = b'IDFMAN\x00\x01'
+VERSION = 1
+
+# magic, versione, numero record, dimensione record, offset record,
+# offset tabella stringhe, lunghezza tabella stringhe, lunghezza host
+_HEADER = struct.Struct('<8sIQIQQQI')
+# chiave (dimensione big-endian + MD5), offset percorso, lunghezza percorso, riservato
+_RECORD = struct.Struct('>Q16sQII')
+KEY_SIZE = 24
+
+# Codifica dei percorsi: i nomi non UTF-8 restano reversibili
+_PATH_ENCODING = ('utf-8', 'surrogateescape')
+
+
+def write_binary_manifest(output_path: Path, records: Iterable[ManifestRecord], host: str = '') -> int:
+    """
+    Scrive un manifest binario ordinato per (dimensione, hash), in modo atomico.
+
+    Returns:
+        Numero di record scritti
+    """
+    host_bytes = host.encode(*_PATH_ENCODING)
+    entries = sorted((record.size, bytes.fromhex(record.digest), record.path.encode(*_PATH_ENCODING))
+                     for record in records)
+
+    records_offset = _HEADER.size
+    strings_offset = records_offset + len(entries) * _RECORD.size
+    strings_size = len(host_bytes) + sum(len(path) for _, _, path in entries)
+
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(entries), _RECORD.size, records_offset,
+                             strings_offset, strings_size, len(host_bytes)))
+        path_offset = len(host_bytes)
+        for size, digest, path in entries:
+            f.write(_RECORD.pack(size, digest, path_offset, len(path), 0))
+            path_offset += len(path)
+        f.write(host_bytes)
+        for _, _, path in entries:
+            f.write(path)
+    os.replace(tmp_path, output_path)
+    return len(entries)
+
+
+class BinaryManifest:
+    """Manifest binario mappato in memoria (sola lettura)."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # file vuoto
+            self._file.close()
+            raise ValueError(f"Non è un manifest binario valido: {path}")
+
+        if len(self._map) < _HEADER.size:
+            self.close()
+            raise ValueError(f"Non è un manifest binario valido: {path}")
+        (magic, version, self.count, record_size, self.records_offset,
+         self.strings_offset, strings_size, host_length) = _HEADER.unpack_from(self._map, 0)
+        if (magic != MAGIC or version != VERSION or record_size != _RECORD.size
+                or self.strings_offset + strings_size > len(self._map)):
+            self.close()
+            raise ValueError(f"Non è un manifest binario valido: {path}")
+        self.host = self._map[self.strings_offset:self.strings_offset + host_length].decode(*_PATH_ENCODING)
+
+    def key(self, index: int) -> bytes:
+        """Chiave (dimensione, hash) del record, confrontabile come bytes."""
+        offset = self.records_offset + index * _RECORD.size
+        return self._map[offset:offset + KEY_SIZE]
+
+    def record(self, index: int) -> ManifestRecord:
+        """Record completo, con il percorso letto dalla tabella delle stringhe."""
+        size, digest, path_offset, path_length, _ = _RECORD.unpack_from(
+            self._map, self.records_offset + index * _RECORD.size)
+        start = self.strings_offset + path_offset
+        path = self._map[start:start + path_length].decode(*_PATH_ENCODING)
+        return ManifestRecord(size, digest.hex(), self.host, path)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[ManifestRecord]:
+        return (self.record(i) for i in range(self.count))
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "BinaryManifest":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class DiffEntry(NamedTuple):
+    """Esito del confronto per una chiave: indici dei record in A e in B."""
+    status: str  # 'match', 'only_a', 'only_b'
+    indexes_a: range
+    indexes_b: range
+
+
+def _run_end(manifest: BinaryManifest, start: int) -> int:
+    """Indice successivo all'ultimo record con la stessa chiave di start."""
+    key = manifest.key(start)
+    end = start + 1
+    while end < len(manifest) and manifest.key(end) == key:
+        end += 1
+    return end
+
+
+def diff_manifests(manifest_a: BinaryManifest, manifest_b: BinaryManifest) -> Iterator[DiffEntry]:
+    """
+    Confronta due manifest ordinati con una scansione in parallelo.
+
+    Yields:
+        DiffEntry per ogni chiave distinta, in ordine di (dimensione, hash);
+        i record si leggono con BinaryManifest.record solo se servono
+    """
+    i = j = 0
+    while i < len(manifest_a) or j < len(manifest_b):
+        key_a = manifest_a.key(i) if i < len(manifest_a) else None
+        key_b = manifest_b.key(j) if j < len(manifest_b) else None
+
+        if key_b is None or (key_a is not None and key_a < key_b):
+            end = _run_end(manifest_a, i)
+            yield DiffEntry('only_a', range(i, end), range(0))
+            i = end
+        elif key_a is None or key_b < key_a:
+            end = _run_end(manifest_b, j)
+            yield DiffEntry('only_b', range(0), range(j, end))
+            j = end
+        else:
+            end_a, end_b = _run_end(manifest_a, i), _run_end(manifest_b, j)
+            yield DiffEntry('match', range(i, end_a), range(j, end_b))
+            i, j = end_a, end_b
+
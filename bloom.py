@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Filtro di Bloom delle chiavi (dimensione, hash)
+
+Al controllo di milioni di file contro un archivio grande quasi tutte le
+ricerche falliscono; il filtro risponde a quelle senza toccare l'indice:
+- "assente" è certo: il file non è nell'archivio
+- "forse presente" va confermato sull'indice esatto (falsi positivi con la
+  probabilità configurata)
+Il filtro si salva su file (intestazione + array di bit) e si carica con
+mmap in pochi millisecondi, senza leggere l'intero array.
+Le posizioni dei k bit si ottengono con il doppio hashing da un unico
+BLAKE2b della chiave.
+"""
+
+import hashlib
+import math
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Iterable, Union
+
+MAGIC = b'IDFBLOOM'
+VERSION = 1
+
+# Probabilità di falso positivo predefinita
+DEFAULT_FP_RATE = 0.001
+
+# magic, versione, bit, funzioni di hash, elementi inseriti, etichetta (generazione dell'indice)
+_HEADER = struct.Struct('<8sIQIQQ')
+_KEY = struct.Struct('>Q16s')
+
+
+def digest_key(size: int, digest: str) -> bytes:
+    """Chiave binaria (dimensione big-endian + MD5), come nei manifest binari."""
+    return _KEY.pack(size, bytes.fromhex(digest))
+
+
+def optimal_parameters(capacity: int, fp_rate: float):
+    """Numero di bit e di funzioni di hash per capacity elementi e il tasso richiesto."""
+    capacity = max(1, capacity)
+    fp_rate = min(max(fp_rate, 1e-12), 0.5)
+    bits = max(64, math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+class BloomFilter:
+    """Filtro di Bloom su un array di bit in memoria o mappato da file."""
+
+    def __init__(self, bits: int, hashes: int, buffer: Union[bytearray, mmap.mmap],
+                 count: int = 0, tag: int = 0, offset: int = 0):
+        self.bits = bits
+        self.hashes = hashes
+        self.count = count
+        self.tag = tag
+        self._buffer = buffer
+        self._offset = offset
+        self._file = None
+
+    @classmethod
+    def create(cls, capacity: int, fp_rate: float = DEFAULT_FP_RATE, tag: int = 0) -> "BloomFilter":
+        """Filtro vuoto dimensionato per capacity elementi."""
+        bits, hashes = optimal_parameters(capacity, fp_rate)
+        return cls(bits, hashes, bytearray((bits + 7) // 8), tag=tag)
+
+    def _positions(self, key: bytes):
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.bits
+
+    def add(self, key: bytes) -> None:
+        buffer, offset = self._buffer, self._offset
+        for position in self._positions(key):
+            buffer[offset + (position >> 3)] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, keys: Iterable[bytes]) -> None:
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key: bytes) -> bool:
+        buffer, offset = self._buffer, self._offset
+        return all(buffer[offset + (position >> 3)] & (1 << (position & 7))
+                   for position in self._positions(key))
+
+    @property
+    def expected_fp_rate(self) -> float:
+        """Probabilità teorica di falso positivo con gli elementi inseriti."""
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+
+    def save(self, path: Path) -> None:
+        """Salva il filtro in modo atomico."""
+        path = Path(path)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, self.bits, self.hashes, self.count, self.tag))
+            f.write(self._buffer[self._offset:self._offset + (self.bits + 7) // 8])
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "BloomFilter":
+        """Mappa un filtro salvato (sola lettura); solleva ValueError se non valido."""
+        f = open(path, 'rb')
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # file vuoto
+            f.close()
+            raise ValueError(f"Filtro non valido: {path}")
+        if len(buffer) >= _HEADER.size:
+            magic, version, bits, hashes, count, tag = _HEADER.unpack_from(buffer, 0)
+            if (magic == MAGIC and version == VERSION and bits and hashes
+                    and len(buffer) >= _HEADER.size + (bits + 7) // 8):
+                bloom = cls(bits, hashes, buffer, count, tag, offset=_HEADER.size)
+                bloom._file = f
+                return bloom
+        buffer.close()
+        f.close()
+        raise ValueError(f"Filtro non valido: {path}")
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._buffer.close()
+            self._file.close()
+            self._file = None
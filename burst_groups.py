@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Raffiche e scatti simili per data di scatto
+
+Le raffiche dei telefoni producono sequenze di foto quasi identiche ma con
+contenuto diverso, che gli hash esatti non riconoscono. Confrontare gli hash
+percettivi di tutte le coppie costa O(n²); qui si sfrutta la data EXIF:
+- indice ordinato per (modello della fotocamera, data di scatto), letto
+  dalla sola intestazione dei file
+- le feature percettive si confrontano solo tra scatti della stessa
+  fotocamera entro una finestra scorrevole di pochi secondi, quindi le
+  coppie sono circa O(n·w) con w scatti per finestra
+- si decodificano solo i file che hanno almeno un vicino nella finestra
+- le coppie simili (distanza di Hamming del dhash) vengono unite con
+  union-find, così una raffica lunga forma un unico gruppo anche se il
+  primo e l'ultimo scatto sono lontani
+I file senza data EXIF non vengono considerati.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from union_find import DisjointSet
+
+# Secondi massimi tra due scatti confrontati
+DEFAULT_BURST_WINDOW = 5.0
+
+# Distanza di Hamming massima tra i dhash (64 bit) di due scatti simili
+DEFAULT_BURST_DISTANCE = 10
+
+# Etichetta dei file senza modello della fotocamera
+UNKNOWN_CAMERA = 'sconosciuta'
+
+
+class BurstGroup(NamedTuple):
+    """Scatti simili della stessa fotocamera, in ordine di data."""
+    camera: str
+    start: datetime
+    end: datetime
+    paths: List[Path]
+
+    @property
+    def duration(self) -> float:
+        return (self.end - self.start).total_seconds()
+
+
+def build_time_index(entries: Iterable[Tuple[Path, Optional[datetime], Optional[str]]]
+                     ) -> Dict[str, List[Tuple[datetime, Path]]]:
+    """
+    Indice per fotocamera degli scatti ordinati per data.
+
+    Args:
+        entries: Tuple (percorso, data EXIF, modello della fotocamera)
+
+    Returns:
+        {fotocamera: [(data, percorso), ...]} con le liste ordinate
+    """
+    index: Dict[str, List[Tuple[datetime, Path]]] = defaultdict(list)
+    for path, taken, camera in entries:
+        if taken is not None:
+            index[camera or UNKNOWN_CAMERA].append((taken, path))
+    for shots in index.values():
+        shots.sort()
+    return dict(index)
+
+
+def _windows(shots: List[Tuple[datetime, Path]], window: float):
+    """Coppie di indici (i, j), i < j, con scatti entro window secondi."""
+    start = 0
+    for j, (taken, _) in enumerate(shots):
+        while (taken - shots[start][0]).total_seconds() > window:
+            start += 1
+        for i in range(start, j):
+            yield i, j
+
+
+def burst_candidates(index: Dict[str, List[Tuple[datetime, Path]]],
+                     window: float = DEFAULT_BURST_WINDOW) -> List[Path]:
+    """File con almeno un altro scatto della stessa fotocamera entro la finestra."""
+    candidates = []
+    for shots in index.values():
+        for j, (taken, path) in enumerate(shots):
+            previous = j > 0 and (taken - shots[j - 1][0]).total_seconds() <= window
+            following = j + 1 < len(shots) and (shots[j + 1][0] - taken).total_seconds() <= window
+            if previous or following:
+                candidates.append(path)
+    return candidates
+
+
+def find_bursts(index: Dict[str, List[Tuple[datetime, Path]]],
+                perceptual_hash: Callable[[Path], Optional[str]],
+                distance: Callable[[str, str], int],
+                window: float = DEFAULT_BURST_WINDOW,
+                max_distance: int = DEFAULT_BURST_DISTANCE) -> Tuple[List[BurstGroup], int]:
+    """
+    Raggruppa gli scatti simili entro la finestra temporale.
+
+    Args:
+        index: Indice costruito da build_time_index
+        perceptual_hash: Hash percettivo di un file (None se non decodificabile)
+        distance: Distanza tra due hash percettivi
+        window: Secondi massimi tra due scatti confrontati
+        max_distance: Distanza massima per considerare simili due scatti
+
+    Returns:
+        (gruppi ordinati per data, numero di confronti eseguiti)
+    """
+    groups = []
+    comparisons = 0
+    for camera, shots in index.items():
+        # Hash calcolati solo per gli scatti che hanno un vicino nella finestra
+        hashes: Dict[int, Optional[str]] = {}
+        components = DisjointSet(len(shots))
+        for i, j in _windows(shots, window):
+            for k in (i, j):
+                if k not in hashes:
+                    hashes[k] = perceptual_hash(shots[k][1])
+            if hashes[i] is None or hashes[j] is None:
+                continue
+            comparisons += 1
+            if distance(hashes[i], hashes[j]) <= max_distance:
+                components.union(i, j)
+
+        members: Dict[int, List[int]] = defaultdict(list)
+        for k in range(len(shots)):
+            members[components.find(k)].append(k)
+        for indexes in members.values():
+            if len(indexes) > 1:
+                groups.append(BurstGroup(camera, shots[indexes[0]][0], shots[indexes[-1]][0],
+                                         [shots[k][1] for k in indexes]))
+
+    groups.sort(key=lambda group: (group.start, group.camera))
+    return groups, comparisons
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Checkpoint per riprendere le scansioni
+
+Lo stato di un'esecuzione lunga viene salvato periodicamente su disco:
+- snapshot JSON della visita (directory ancora da elencare e file trovati),
+  scritto in modo atomico (file temporaneo, fsync, os.replace)
+- journal in sola aggiunta degli hash calcolati, una riga JSON per file,
+  scaricato su disco a intervalli regolari
+Dopo un'interruzione, --resume riparte dalla frontiera salvata e non
+ricalcola gli hash già nel journal; un'ultima riga troncata viene ignorata.
+Gli snapshot vengono distanziati in base al loro costo di scrittura, così
+il tempo speso nei checkpoint resta trascurabile.
+Un file di lock accanto allo snapshot impedisce a due esecuzioni (CLI o
+task web) di usare insieme lo stesso checkpoint: la seconda viene rifiutata
+invece di cancellare o sovrascrivere lo stato della prima. Il lock è del
+sistema operativo e viene rilasciato anche se il processo termina.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Directory predefinita dei checkpoint (uno per radice di scansione)
+DEFAULT_CHECKPOINT_DIR = Path.home() / '.image_duplicate_finder' / 'checkpoints'
+
+# Intervallo minimo tra due salvataggi (secondi)
+DEFAULT_CHECKPOINT_INTERVAL = 30.0
+
+# Lo snapshot non occupa più di 1/_COST_FACTOR del tempo di esecuzione
+_COST_FACTOR = 20
+
+CHECKPOINT_VERSION = 1
+
+
+class CheckpointInUseError(RuntimeError):
+    """Il checkpoint è già usato da un'altra esecuzione."""
+
+
+def _lock_file(path: Path) -> IO:
+    """Apre e blocca in modo esclusivo il file di lock; CheckpointInUseError se è occupato."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handle = open(path, 'a+b')
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        handle.close()
+        raise CheckpointInUseError(
+            f"Un'altra scansione sta usando il checkpoint {path.with_suffix('.json')}")
+    return handle
+
+
+def _unlock_file(handle: IO) -> None:
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+    except OSError:
+        pass
+    handle.close()
+
+
+class ScanCheckpoint:
+    """Snapshot della visita e journal degli hash di una scansione."""
+
+    def __init__(self, path: Path, root: Path, resume: bool = False,
+                 settings: Optional[Dict] = None,
+                 interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+                 log: Optional[Callable[[str], None]] = None):
+        self.path = Path(path)
+        self.journal_path = self.path.with_suffix('.journal')
+        self.root = str(Path(root).resolve())
+        self.settings = settings or {}
+        self.interval = interval
+        self.log = log or (lambda message: None)
+
+        # Stato ripristinato (vuoto se si parte da zero)
+        self.frontier: Optional[List[Path]] = None
+        self.image_paths: List[Path] = []
+        self.scan_complete = False
+        # Hash dal journal: {percorso: (hash, dimensione, mtime_ns)}
+        self.digests: Dict[Path, Tuple[str, int, int]] = {}
+
+        self._lock = threading.Lock()
+        self._next_snapshot = 0.0
+        self._next_flush = time.monotonic() + interval
+
+        # Prima di leggere o cancellare lo stato: un'altra esecuzione potrebbe usarlo
+        self._lock_handle = _lock_file(self.path.with_suffix('.lock'))
+        if resume:
+            self._load()
+        else:
+            self._remove_files()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def default_path(root: Path) -> Path:
+        """Percorso del checkpoint predefinito per una radice di scansione."""
+        key = hashlib.sha1(str(Path(root).resolve()).encode('utf-8')).hexdigest()[:16]
+        return DEFAULT_CHECKPOINT_DIR / f"{key}.json"
+
+    @property
+    def has_scan_state(self) -> bool:
+        """True se è stata ripristinata una visita (completa o parziale)."""
+        return self.scan_complete or self.frontier is not None
+
+    def _remove_files(self) -> None:
+        for file_path in (self.path, self.journal_path):
+            try:
+                file_path.unlink()
+            except OSError:
+                pass
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            self.log("Nessun checkpoint valido da riprendere")
+            self._remove_files()
+            return
+
+        if (state.get('version') != CHECKPOINT_VERSION or state.get('root') != self.root
+                or state.get('settings', {}) != self.settings):
+            self.log("Checkpoint di un'altra scansione o con altre regole: ignorato")
+            self._remove_files()
+            return
+
+        self.scan_complete = bool(state.get('scan_complete'))
+        self.frontier = [Path(p) for p in state.get('frontier', [])]
+        self.image_paths = [Path(p) for p in state.get('image_paths', [])]
+
+        valid_bytes = 0
+        try:
+            with open(self.journal_path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # scrittura interrotta
+                    try:
+                        digest, file_path, size, mtime_ns = json.loads(line.decode('utf-8'))
+                    except ValueError:
+                        break
+                    self.digests[Path(file_path)] = (digest, size, mtime_ns)
+                    valid_bytes += len(line)
+            # Le nuove righe non devono accodarsi a una riga troncata
+            os.truncate(self.journal_path, valid_bytes)
+        except OSError:
+            pass
+
+        self.log(f"Checkpoint ripristinato: {len(self.image_paths)} file, "
+                 f"{len(self.frontier)} directory da visitare, {len(self.digests)} hash")
+
+    def _write_snapshot(self, frontier: List[Path], image_paths: List[Path]) -> None:
+        started = time.monotonic()
+        state = {
+            'version': CHECKPOINT_VERSION,
+            'root': self.root,
+            'settings': self.settings,
+            'scan_complete': self.scan_complete,
+            'frontier': [str(p) for p in frontier],
+            'image_paths': [str(p) for p in image_paths],
+            'saved': datetime.now().isoformat(timespec='seconds')
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.log(f"Impossibile salvare il checkpoint: {e}")
+        elapsed = time.monotonic() - started
+        self._next_snapshot = time.monotonic() + max(self.interval, elapsed * _COST_FACTOR)
+
+    def save_scan(self, frontier: List[Path], image_paths: List[Path], force: bool = False) -> None:
+        """Salva la visita in corso se è trascorso l'intervallo (o se force)."""
+        if force or time.monotonic() >= self._next_snapshot:
+            self._write_snapshot(frontier, image_paths)
+
+    def complete_scan(self, image_paths: List[Path]) -> None:
+        """Registra la fine della visita con l'elenco definitivo dei file."""
+        self.scan_complete = True
+        self.frontier = []
+        self._write_snapshot([], image_paths)
+
+    def cached_digest(self, file_path: Path) -> Optional[str]:
+        """Hash dal journal, se il file non è cambiato da quando è stato calcolato."""
+        entry = self.digests.get(file_path)
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        digest, size, mtime_ns = entry
+        return digest if (stat.st_size, stat.st_mtime_ns) == (size, mtime_ns) else None
+
+    def record_digest(self, file_path: Path, digest: str) -> None:
+        """Aggiunge un hash al journal (thread-safe)."""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return
+        entry = (digest, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            self.digests[file_path] = entry
+            self._journal.write(json.dumps([digest, str(file_path), entry[1], entry[2]]) + '\n')
+            if time.monotonic() >= self._next_flush:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        try:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+        except OSError as e:
+            self.log(f"Impossibile salvare il journal: {e}")
+        self._next_flush = time.monotonic() + self.interval
+
+    def flush(self) -> None:
+        """Scarica su disco il journal degli hash."""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        """Scarica il journal, chiude il file e rilascia il lock (il checkpoint resta su disco)."""
+        with self._lock:
+            if not self._journal.closed:
+                self._flush_locked()
+                self._journal.close()
+            if self._lock_handle is not None:
+                _unlock_file(self._lock_handle)
+                self._lock_handle = None
+
+    def finish(self) -> None:
+        """Esecuzione completata: rimuove snapshot e journal."""
+        self.close()
+        self._remove_files()
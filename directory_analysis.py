@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Directory duplicate
+
+Le copie di intere cartelle producono migliaia di gruppi di file; questa
+analisi le riporta come un'unica voce per cartella, a partire dagli hash
+dei file già calcolati, con un solo passaggio dal basso verso l'alto:
+- impronta di ogni directory: hash della lista ordinata degli hash dei file
+  e delle impronte delle sottodirectory (i nomi non contano, quindi le
+  copie rinominate vengono riconosciute)
+- directory identiche: stessa impronta; si riportano solo le più alte
+- directory quasi duplicate: la maggior parte dei byte (soglia configurabile)
+  è presente anche fuori dalla directory
+Per i byte presenti altrove si usa, per ogni hash, l'antenato comune di
+tutte le copie: un file conta come "copiato altrove" per le directory tra
+la sua cartella e quell'antenato, escluso. Le somme sui sottoalberi
+rendono il costo lineare nel numero di file e directory.
+Le impronte considerano solo le immagini trovate dalla scansione.
+"""
+
+import hashlib
+import os
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+# Quota minima di byte presenti altrove per una directory quasi duplicata
+DEFAULT_MIN_RATIO = 0.8
+
+
+class DuplicateDirectoryGroup(NamedTuple):
+    """Directory con contenuto identico."""
+    directories: List[Path]
+    file_count: int
+    size: int  # byte di ciascuna copia
+
+    @property
+    def reclaimable(self) -> int:
+        return self.size * (len(self.directories) - 1)
+
+
+class PartialDuplicateDirectory(NamedTuple):
+    """Directory il cui contenuto è in buona parte presente altrove."""
+    directory: Path
+    file_count: int
+    size: int
+    duplicated_size: int
+
+    @property
+    def ratio(self) -> float:
+        return self.duplicated_size / self.size if self.size else 0.0
+
+    @property
+    def reclaimable(self) -> int:
+        return self.duplicated_size
+
+
+class DirectoryAnalysis(NamedTuple):
+    duplicate_groups: List[DuplicateDirectoryGroup]
+    partial_duplicates: List[PartialDuplicateDirectory]
+
+
+def analyze_directories(digests: Dict[Path, str], sizes: Dict[Path, int],
+                        min_ratio: float = DEFAULT_MIN_RATIO) -> DirectoryAnalysis:
+    """
+    Trova directory identiche e quasi duplicate.
+
+    Args:
+        digests: Hash del contenuto per file
+        sizes: Dimensione in byte per file
+        min_ratio: Quota minima di byte presenti altrove (0-1)
+
+    Returns:
+        DirectoryAnalysis con i risultati ordinati per spazio recuperabile
+    """
+    if not digests:
+        return DirectoryAnalysis([], [])
+
+    files: Dict[Path, List[str]] = defaultdict(list)
+    subdirs: Dict[Path, List[Path]] = defaultdict(list)
+    total_size: Dict[Path, int] = defaultdict(int)
+    file_count: Dict[Path, int] = defaultdict(int)
+    delta: Dict[Path, int] = defaultdict(int)
+    copies: Dict[str, List[Path]] = defaultdict(list)
+
+    root = Path(os.path.commonpath([str(path.parent) for path in digests]))
+    for path, digest in digests.items():
+        files[path.parent].append(digest)
+        total_size[path.parent] += sizes.get(path, 0)
+        file_count[path.parent] += 1
+        copies[digest].append(path)
+
+    # Albero delle directory fino alla radice comune
+    directories = set(files)
+    linked = set()
+    for directory in list(files):
+        while directory != root and directory not in linked:
+            linked.add(directory)
+            subdirs[directory.parent].append(directory)
+            directories.add(directory.parent)
+            directory = directory.parent
+
+    # Byte presenti altrove: +dimensione nella cartella del file, -dimensione
+    # nell'antenato comune di tutte le copie (somma sui sottoalberi)
+    for digest, paths in copies.items():
+        if len(paths) < 2:
+            continue
+        ancestor = Path(os.path.commonpath([str(path.parent) for path in paths]))
+        for path in paths:
+            delta[path.parent] += sizes.get(path, 0)
+            delta[ancestor] -= sizes.get(path, 0)
+
+    # Passaggio dal basso verso l'alto
+    fingerprints: Dict[Path, Optional[str]] = {}
+    duplicated: Dict[Path, int] = {}
+    for directory in sorted(directories, key=lambda d: len(d.parts), reverse=True):
+        children = ['F' + digest for digest in files.get(directory, [])]
+        duplicated[directory] = delta.get(directory, 0)
+        for subdir in subdirs.get(directory, []):
+            total_size[directory] += total_size[subdir]
+            file_count[directory] += file_count[subdir]
+            duplicated[directory] += duplicated[subdir]
+            if fingerprints[subdir] is not None:
+                children.append('D' + fingerprints[subdir])
+        fingerprints[directory] = (hashlib.sha1('\n'.join(sorted(children)).encode()).hexdigest()
+                                   if children else None)
+
+    by_fingerprint: Dict[str, List[Path]] = defaultdict(list)
+    for directory, fingerprint in fingerprints.items():
+        if fingerprint is not None:
+            by_fingerprint[fingerprint].append(directory)
+
+    def is_duplicated(directory: Path) -> bool:
+        fingerprint = fingerprints.get(directory)
+        return fingerprint is not None and len(by_fingerprint[fingerprint]) > 1
+
+    groups = []
+    for fingerprint, members in by_fingerprint.items():
+        # Solo le directory più alte: se anche i genitori sono copie, basta il loro gruppo
+        if len(members) < 2 or all(is_duplicated(member.parent) for member in members):
+            continue
+        members.sort()
+        groups.append(DuplicateDirectoryGroup(members, file_count[members[0]], total_size[members[0]]))
+
+    partial = []
+    reported = set()
+    for directory in sorted(directories, key=lambda d: len(d.parts)):
+        if directory.parent in reported:
+            reported.add(directory)  # già incluso nella directory superiore
+            continue
+        if is_duplicated(directory) or not total_size[directory]:
+            continue
+        if duplicated[directory] / total_size[directory] >= min_ratio:
+            reported.add(directory)
+            partial.append(PartialDuplicateDirectory(directory, file_count[directory],
+                                                     total_size[directory], duplicated[directory]))
+
+    groups.sort(key=lambda group: group.reclaimable, reverse=True)
+    partial.sort(key=lambda entry: entry.reclaimable, reverse=True)
+    return DirectoryAnalysis(groups, partial)
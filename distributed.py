@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Scansione distribuita coordinatore/worker
+
+Un coordinatore suddivide l'albero in porzioni (directory da visitare per
+intero oppure solo con i file diretti) e le assegna ai worker tramite un
+protocollo TCP a righe JSON:
+    worker -> {"type": "hello", "worker": nome, "host": host}
+    coord  -> {"type": "shard", "id": n, "directory": ..., "recursive": ...,
+               "root": ..., "settings": {regole di scansione}}
+    worker -> {"type": "result", "id": n, "records": [[dimensione, hash, percorso], ...]}
+              oppure {"type": "error", "id": n, "message": ...}
+    coord  -> {"type": "done"} quando non restano porzioni
+I worker usano la logica di hashing di ImageDuplicateFinder; le porzioni di
+un worker caduto (connessione chiusa o nessuna risposta entro il tempo
+massimo) vengono riassegnate. I gruppi vengono aggregati man mano che
+arrivano i risultati. I worker remoti devono vedere l'albero con gli stessi
+percorsi (es. mount condiviso).
+Il protocollo non prevede autenticazione né cifratura: chi raggiunge la
+porta può ricevere i percorsi o inviare risultati falsi. Oltre l'indirizzo
+di loopback va usato solo su reti fidate.
+"""
+
+import contextlib
+import io
+import ipaddress
+import json
+import multiprocessing
+import socket
+import threading
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from image_duplicate_finder import ImageDuplicateFinder
+from manifest import ManifestRecord
+from scan_filters import ScanFilter
+
+# Porta predefinita del coordinatore
+DEFAULT_PORT = 8765
+
+# Porzioni create per ogni worker previsto (bilanciamento del carico)
+SHARDS_PER_WORKER = 4
+
+# Tentativi massimi per porzione prima di considerarla fallita
+MAX_SHARD_ATTEMPTS = 3
+
+
+def _send(writer, message: Dict) -> None:
+    writer.write(json.dumps(message) + '\n')
+    writer.flush()
+
+
+def is_loopback(host: str) -> bool:
+    """True se l'indirizzo di ascolto è raggiungibile solo da questa macchina."""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False  # '' (tutte le interfacce) o nome host
+
+
+def _receive(reader) -> Optional[Dict]:
+    line = reader.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+class ShardCoordinator:
+    """Suddivide la scansione in porzioni e aggrega i risultati dei worker."""
+
+    def __init__(self, root: Path, scan_filter: Optional[ScanFilter] = None,
+                 shard_timeout: Optional[float] = None,
+                 log: Optional[Callable[[str], None]] = None):
+        self.root = Path(root).resolve()
+        self.scan_filter = scan_filter or ScanFilter()
+        self.shard_timeout = shard_timeout
+        self.log = log or (lambda message: None)
+
+        self.shards: Dict[int, Dict] = {}
+        self.pending: deque = deque()
+        self.completed = set()
+        self.failed = set()
+        self.attempts: Dict[int, int] = defaultdict(int)
+        self.active_connections = 0
+        # Aggregazione incrementale: (dimensione, hash) -> record
+        self.index: Dict[Tuple[int, str], List[ManifestRecord]] = defaultdict(list)
+        self.duplicate_groups = 0
+
+        self._condition = threading.Condition()
+        self._server: Optional[socket.socket] = None
+
+    def make_shards(self, target: int) -> int:
+        """
+        Suddivide l'albero in almeno target porzioni (se le directory lo permettono).
+
+        Le directory espanse diventano porzioni con i soli file diretti,
+        quelle rimaste nella frontiera porzioni ricorsive.
+        """
+        scan_filter = self.scan_filter.with_ignore_file(self.root)
+        shards = []
+        frontier = deque([self.root])
+        while frontier and len(frontier) + len(shards) < target:
+            directory = frontier.popleft()
+            try:
+                subdirs, files = scan_filter.list_directory(
+                    directory, self.root, ImageDuplicateFinder.SUPPORTED_EXTENSIONS, self.log)
+            except OSError as e:
+                self.log(f"Impossibile leggere {directory}: {e}")
+                continue
+            if files:
+                shards.append((directory, False))
+            frontier.extend(subdirs)
+        shards.extend((directory, True) for directory in frontier)
+
+        for shard_id, (directory, recursive) in enumerate(shards):
+            self.shards[shard_id] = {
+                'type': 'shard',
+                'id': shard_id,
+                'directory': str(directory),
+                'recursive': recursive,
+                'root': str(self.root),
+                'settings': self.scan_filter.settings()
+            }
+            self.pending.append(shard_id)
+        self.log(f"Albero suddiviso in {len(shards)} porzioni")
+        return len(shards)
+
+    @property
+    def finished(self) -> bool:
+        return len(self.completed) + len(self.failed) == len(self.shards)
+
+    def _next_shard(self) -> Optional[int]:
+        with self._condition:
+            while not self.pending and not self.finished:
+                self._condition.wait()
+            return self.pending.popleft() if self.pending else None
+
+    def _release(self, shard_id: int, reason: str) -> None:
+        """Riassegna una porzione non completata (o la segna come fallita)."""
+        with self._condition:
+            if shard_id in self.completed:
+                return
+            self.attempts[shard_id] += 1
+            if self.attempts[shard_id] >= MAX_SHARD_ATTEMPTS:
+                self.failed.add(shard_id)
+                self.log(f"Porzione {shard_id} fallita definitivamente: {reason}")
+            else:
+                self.pending.appendleft(shard_id)
+                self.log(f"Porzione {shard_id} riassegnata: {reason}")
+            self._condition.notify_all()
+
+    def _complete(self, shard_id: int, host: str, records: List) -> None:
+        with self._condition:
+            if shard_id in self.completed:
+                return
+            self.completed.add(shard_id)
+            for size, digest, path in records:
+                entries = self.index[(size, digest)]
+                entries.append(ManifestRecord(size, digest, host, path))
+                if len(entries) == 2:
+                    self.duplicate_groups += 1
+            self.log(f"Porzione {shard_id} completata da {host}: {len(records)} file, "
+                     f"{self.duplicate_groups} gruppi di duplicati finora")
+            self._condition.notify_all()
+
+    def _handle_worker(self, connection: socket.socket) -> None:
+        with self._condition:
+            self.active_connections += 1
+        reader = connection.makefile('r', encoding='utf-8')
+        writer = connection.makefile('w', encoding='utf-8')
+        shard_id = None
+        try:
+            hello = _receive(reader) or {}
+            host = hello.get('host', 'sconosciuto')
+            self.log(f"Worker {hello.get('worker', host)} pronto")
+            connection.settimeout(self.shard_timeout)
+            while True:
+                shard_id = self._next_shard()
+                if shard_id is None:
+                    _send(writer, {'type': 'done'})
+                    return
+                _send(writer, self.shards[shard_id])
+                reply = _receive(reader)
+                if reply is None:
+                    raise ConnectionError("connessione chiusa dal worker")
+                if reply.get('type') == 'result' and reply.get('id') == shard_id:
+                    self._complete(shard_id, host, reply.get('records', []))
+                else:
+                    self._release(shard_id, reply.get('message', 'risposta non valida'))
+                shard_id = None
+        except (OSError, ValueError) as e:
+            if shard_id is not None:
+                self._release(shard_id, str(e) or e.__class__.__name__)
+        finally:
+            with self._condition:
+                self.active_connections -= 1
+                self._condition.notify_all()
+            for stream in (reader, writer, connection):
+                try:
+                    stream.close()
+                except OSError:
+                    pass
+
+    def _accept_loop(self) -> None:
+        while True:
+            try:
+                connection, address = self._server.accept()
+            except OSError:
+                return  # socket chiuso a fine scansione
+            self.log(f"Worker connesso da {address[0]}:{address[1]}")
+            threading.Thread(target=self._handle_worker, args=(connection,), daemon=True).start()
+
+    def run(self, host: str = '127.0.0.1', port: int = DEFAULT_PORT,
+            local_workers: int = 0) -> List[List[ManifestRecord]]:
+        """
+        Distribuisce le porzioni e attende il completamento.
+
+        Args:
+            host: Indirizzo di ascolto
+            port: Porta di ascolto (0 = scelta dal sistema)
+            local_workers: Worker da avviare come processi locali
+
+        Returns:
+            Gruppi di duplicati (almeno due record con stessa dimensione e hash),
+            in ordine crescente di dimensione
+        """
+        if not self.shards:
+            self.make_shards(max(1, local_workers) * SHARDS_PER_WORKER)
+
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((host, port))
+        self._server.listen()
+        port = self._server.getsockname()[1]
+        print(f"Coordinatore in ascolto su {host}:{port} ({len(self.shards)} porzioni)")
+        if not is_loopback(host):
+            print(f"⚠️  {host} non è un indirizzo di loopback e il protocollo non ha autenticazione: "
+                  f"chiunque raggiunga la porta {port} può ricevere i percorsi o inviare risultati. "
+                  f"Usalo solo su reti fidate.")
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+        processes = [self._start_local_worker(host, port, i) for i in range(local_workers)]
+        try:
+            with self._condition:
+                while not self.finished:
+                    self._condition.wait(timeout=1.0)
+                    # Worker locali caduti senza altri worker: ne avvia uno nuovo
+                    if (processes and self.active_connections == 0 and self.pending
+                            and not any(process.is_alive() for process in processes)):
+                        self.log("Nessun worker attivo: avvio di un nuovo worker locale")
+                        processes.append(self._start_local_worker(host, port, len(processes)))
+        finally:
+            self._server.close()
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+
+        if self.failed:
+            print(f"⚠️  Porzioni non completate: {len(self.failed)}")
+            for shard_id in sorted(self.failed):
+                print(f"   - {self.shards[shard_id]['directory']}")
+        return [sorted(records, key=lambda record: (record.host, record.path))
+                for key, records in sorted(self.index.items()) if len(records) > 1]
+
+    @staticmethod
+    def _start_local_worker(host: str, port: int, number: int) -> multiprocessing.Process:
+        connect_host = '127.0.0.1' if host in ('', '0.0.0.0') else host
+        process = multiprocessing.Process(
+            target=run_worker, args=(connect_host, port, f"{socket.gethostname()}-{number}"),
+            daemon=True
+        )
+        process.start()
+        return process
+
+
+def process_shard(shard: Dict, verbose: bool = False) -> List[List]:
+    """Esegue una porzione con la logica di hashing di ImageDuplicateFinder."""
+    finder = ImageDuplicateFinder(verbose=verbose, scan_filter=ScanFilter(**shard['settings']))
+    # I messaggi di avanzamento dei worker restano visibili solo in modalità verbose
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        with output:
+            finder.scan_directory(Path(shard['directory']), root=Path(shard['root']),
+                                  recursive=shard['recursive'])
+            records = finder.manifest_records()
+        return [[record.size, record.digest, record.path] for record in records]
+    finally:
+        finder.close()
+
+
+def run_worker(host: str, port: int, name: Optional[str] = None, verbose: bool = False) -> None:
+    """Si collega al coordinatore ed elabora porzioni finché ce ne sono."""
+    name = name or socket.gethostname()
+    with socket.create_connection((host, port)) as connection:
+        reader = connection.makefile('r', encoding='utf-8')
+        writer = connection.makefile('w', encoding='utf-8')
+        _send(writer, {'type': 'hello', 'worker': name, 'host': socket.gethostname()})
+        while True:
+            message = _receive(reader)
+            if message is None or message.get('type') == 'done':
+                return
+            try:
+                records = process_shard(message, verbose)
+                _send(writer, {'type': 'result', 'id': message['id'], 'records': records})
+            except Exception as e:
+                _send(writer, {'type': 'error', 'id': message['id'], 'message': str(e)})
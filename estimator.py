@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Stima a campione di duplicati e spazio recuperabile
+
+Risponde in fretta a "vale la pena deduplicare questa condivisione?":
+- lo stat di tutti i file (economico) dà i gruppi di stessa dimensione; i
+  file con dimensione unica sono certamente unici
+- i gruppi di stessa dimensione sono le unità di campionamento (un
+  duplicato si riconosce solo confrontando tutto il gruppo) e vengono
+  stratificati per classe di dimensione e cartella di primo livello
+  (i gruppi che attraversano più cartelle formano uno strato a sé)
+- in ogni strato si estrae un campione casuale semplice di gruppi, con
+  budget proporzionale ai byte dello strato, e se ne calcolano gli hash
+- stimatore per espansione con intervallo di confidenza normale e
+  correzione per popolazione finita; gli strati piccoli vengono letti per
+  intero (nessuna incertezza)
+Il limite massimo (tutti i candidati identici) è esatto e viene usato per
+limitare l'intervallo.
+"""
+
+import math
+import os
+import random
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Quota dei byte candidati da leggere per la stima
+DEFAULT_SAMPLE_FRACTION = 0.03
+
+# Gruppi minimi per strato (gli strati più piccoli vengono letti per intero)
+MIN_SAMPLES_PER_STRATUM = 5
+
+# Quantile normale per l'intervallo di confidenza al 95%
+Z_95 = 1.96
+
+# Limiti delle classi di dimensione (byte)
+SIZE_CLASSES = (100 * 1024, 1024 * 1024, 10 * 1024 * 1024, 100 * 1024 * 1024)
+
+
+class Estimate(NamedTuple):
+    """Valore stimato con intervallo di confidenza."""
+    value: float
+    low: float
+    high: float
+
+
+class DuplicateEstimate(NamedTuple):
+    total_files: int
+    total_bytes: int
+    candidate_files: int
+    candidate_buckets: int
+    upper_bound_bytes: int
+    strata: int
+    sampled_buckets: int
+    sampled_files: int
+    sampled_bytes: int
+    duplicates: Estimate
+    reclaimable: Estimate
+
+
+def size_class(size: int) -> int:
+    """Indice della classe di dimensione."""
+    for index, limit in enumerate(SIZE_CLASSES):
+        if size < limit:
+            return index
+    return len(SIZE_CLASSES)
+
+
+def _folder_label(paths: List[Path], root: Path) -> str:
+    """Cartella di primo livello comune ai file del gruppo ('*' se più cartelle)."""
+    folders = set()
+    for path in paths:
+        try:
+            parts = path.relative_to(root).parts
+        except ValueError:
+            parts = path.parts
+        folders.add(parts[0] if len(parts) > 1 else '.')
+    return folders.pop() if len(folders) == 1 else '*'
+
+
+def _expand(values: List[Tuple[int, int]], population: int) -> Tuple[float, float, float, float]:
+    """Totali stimati e varianze (duplicati, byte) di uno strato."""
+    n = len(values)
+    if n == 0:
+        return 0.0, 0.0, 0.0, 0.0
+    results = []
+    for column in range(2):
+        sample = [value[column] for value in values]
+        mean = sum(sample) / n
+        variance = sum((x - mean) ** 2 for x in sample) / (n - 1) if n > 1 else 0.0
+        fpc = 1 - n / population
+        results.append((population * mean, population ** 2 * fpc * variance / n))
+    return results[0][0], results[0][1], results[1][0], results[1][1]
+
+
+def estimate_duplicates(sizes: Dict[Path, int],
+                        hash_files: Callable[[List[Path]], Dict[Path, str]],
+                        sample_fraction: float = DEFAULT_SAMPLE_FRACTION,
+                        seed: Optional[int] = None,
+                        log: Optional[Callable[[str], None]] = None) -> DuplicateEstimate:
+    """
+    Stima duplicati e spazio recuperabile leggendo solo un campione di file.
+
+    Args:
+        sizes: Dimensione di ogni file (dallo stat)
+        hash_files: Calcola gli hash di una lista di file (es. in parallelo)
+        sample_fraction: Quota dei byte candidati da leggere (0-1)
+        seed: Seme per un campione riproducibile
+        log: Funzione di log opzionale
+
+    Returns:
+        DuplicateEstimate con intervalli di confidenza al 95%
+    """
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+
+    by_size: Dict[int, List[Path]] = defaultdict(list)
+    for path, size in sizes.items():
+        by_size[size].append(path)
+    buckets = [(size, sorted(paths)) for size, paths in by_size.items() if len(paths) > 1]
+
+    root = Path(os.path.commonpath([str(path) for path in sizes])) if sizes else Path('.')
+    strata: Dict[Tuple[int, str], List[Tuple[int, List[Path]]]] = defaultdict(list)
+    for size, paths in buckets:
+        strata[(size_class(size), _folder_label(paths, root))].append((size, paths))
+
+    candidate_bytes = sum(size * len(paths) for size, paths in buckets)
+    budget = candidate_bytes * min(max(sample_fraction, 0.0), 1.0)
+
+    # Scelta dei gruppi da leggere: budget di byte proporzionale allo strato
+    selected: Dict[Tuple[int, str], List[Tuple[int, List[Path]]]] = {}
+    for key, stratum in strata.items():
+        stratum_bytes = sum(size * len(paths) for size, paths in stratum)
+        stratum_budget = budget * stratum_bytes / candidate_bytes if candidate_bytes else 0
+        order = stratum[:]
+        rng.shuffle(order)
+        chosen, used = [], 0
+        for size, paths in order:
+            if len(chosen) >= MIN_SAMPLES_PER_STRATUM and used >= stratum_budget:
+                break
+            chosen.append((size, paths))
+            used += size * len(paths)
+        selected[key] = chosen
+        log(f"Strato {key}: {len(chosen)} gruppi su {len(stratum)}")
+
+    sample_paths = [path for chosen in selected.values() for _, paths in chosen for path in paths]
+    hashes = hash_files(sample_paths) if sample_paths else {}
+
+    duplicates = duplicates_variance = reclaimable = reclaimable_variance = 0.0
+    for key, chosen in selected.items():
+        values = []
+        for size, paths in chosen:
+            digests = [hashes.get(path) for path in paths]
+            known = [digest for digest in digests if digest]
+            extra = len(known) - len(set(known))
+            values.append((extra, extra * size))
+        total_d, var_d, total_r, var_r = _expand(values, len(strata[key]))
+        duplicates += total_d
+        duplicates_variance += var_d
+        reclaimable += total_r
+        reclaimable_variance += var_r
+
+    upper_files = sum(len(paths) - 1 for _, paths in buckets)
+    upper_bytes = sum(size * (len(paths) - 1) for size, paths in buckets)
+
+    def interval(value: float, variance: float, upper: float) -> Estimate:
+        margin = Z_95 * math.sqrt(variance)
+        return Estimate(value, max(0.0, value - margin), min(float(upper), value + margin))
+
+    return DuplicateEstimate(
+        total_files=len(sizes),
+        total_bytes=sum(sizes.values()),
+        candidate_files=sum(len(paths) for _, paths in buckets),
+        candidate_buckets=len(buckets),
+        upper_bound_bytes=upper_bytes,
+        strata=len(strata),
+        sampled_buckets=sum(len(chosen) for chosen in selected.values()),
+        sampled_files=len(sample_paths),
+        sampled_bytes=sum(sizes[path] for path in sample_paths),
+        duplicates=interval(duplicates, duplicates_variance, upper_files),
+        reclaimable=interval(reclaimable, reclaimable_variance, upper_bytes)
+    )
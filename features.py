@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Estrazione delle feature in un'unica decodifica
+
+La decodifica è il costo CPU dominante: ogni file viene decodificato una sola
+volta e dal risultato si ricavano tutti i segnali usati dai rilevatori e
+dalle interfacce:
+- dimensioni
+- digest canonico dei pixel (SHA256 dei pixel RGB, indipendente dal formato)
+- hash percettivi (average hash e difference hash a 64 bit)
+- difference hash delle 8 trasformazioni diedrali di una copia 32x32 e il
+  loro minimo (hash canonico), per riconoscere le copie ruotate o ribaltate
+  (es. esportazioni con l'orientamento EXIF applicato ai pixel)
+- istogramma colore compatto
+- punteggio di nitidezza (varianza del laplaciano)
+
+Oltre STREAMING_PIXELS il digest viene calcolato a bande (pixel_stream) e gli
+altri segnali da una decodifica ridotta, così la memoria resta limitata.
+Il record resta nel catalogo per tutta l'esecuzione e non contiene pixel:
+le miniature delle interfacce si ottengono con image_loader.make_thumbnail,
+che passa dalla cache LRU con budget in byte.
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from PIL import Image, ImageFilter, ImageStat
+
+from image_loader import load_image
+from pixel_stream import band_rows, streaming_pixel_digest
+
+# Dimensione della copia ridotta usata per l'istogramma colore
+HISTOGRAM_SIZE = (128, 128)
+
+# Lato dell'immagine ridotta usata per la nitidezza
+SHARPNESS_SIZE = 256
+
+# Bin per canale dell'istogramma colore
+HISTOGRAM_BINS = 8
+
+# Oltre questa soglia di pixel l'immagine intera non viene mai caricata in RGB
+STREAMING_PIXELS = 40_000_000
+
+# Lato della copia quadrata da cui si calcolano gli hash diedrali: multiplo
+# di 9 e di 8, così la riduzione alla griglia del dhash usa blocchi interi
+CANONICAL_GRID = 72
+
+# Differenza minima (livelli di grigio) perché un bit del dhash diedrale valga 1:
+# il ricampionamento non è perfettamente simmetrico e senza margine le zone
+# uniformi darebbero bit diversi sulle copie ruotate
+DIHEDRAL_MARGIN = 1.0
+
+# Le 8 trasformazioni diedrali (None = identità)
+DIHEDRAL_TRANSFORMS = (
+    None,
+    Image.Transpose.ROTATE_90,
+    Image.Transpose.ROTATE_180,
+    Image.Transpose.ROTATE_270,
+    Image.Transpose.FLIP_LEFT_RIGHT,
+    Image.Transpose.FLIP_TOP_BOTTOM,
+    Image.Transpose.TRANSPOSE,
+    Image.Transpose.TRANSVERSE,
+)
+
+_LAPLACIAN = ImageFilter.Kernel((3, 3), [0, 1, 0, 1, -4, 1, 0, 1, 0], scale=1, offset=128)
+
+
+def pixel_digest(rgb: Image.Image) -> str:
+    """Digest canonico dei pixel: uguale per immagini identiche in formati diversi."""
+    digest = hashlib.sha256(f"{rgb.width}x{rgb.height}:".encode('ascii'))
+    # A bande, per non duplicare l'intero buffer con tobytes()
+    rows = band_rows(rgb.width)
+    for top in range(0, rgb.height, rows):
+        digest.update(rgb.crop((0, top, rgb.width, min(rgb.height, top + rows))).tobytes())
+    return digest.hexdigest()
+
+
+def _bits_to_hex(bits: List[bool]) -> str:
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return f"{value:0{len(bits) // 4}x}"
+
+
+def average_hash(gray: Image.Image) -> str:
+    """Average hash a 64 bit da un'immagine in scala di grigi."""
+    small = gray.resize((8, 8), Image.Resampling.BOX)
+    pixels = list(small.getdata())
+    mean = sum(pixels) / len(pixels)
+    return _bits_to_hex([p > mean for p in pixels])
+
+
+def difference_hash(gray: Image.Image) -> str:
+    """Difference hash a 64 bit (gradiente orizzontale su griglia 9x8)."""
+    small = gray.resize((9, 8), Image.Resampling.BOX)
+    pixels = list(small.getdata())
+    bits = [pixels[row * 9 + col] > pixels[row * 9 + col + 1]
+            for row in range(8) for col in range(8)]
+    return _bits_to_hex(bits)
+
+
+def _dihedral_bits(square: Image.Image) -> str:
+    small = square.resize((9, 8), Image.Resampling.BOX)
+    pixels = list(small.getdata())
+    return _bits_to_hex([pixels[row * 9 + col] > pixels[row * 9 + col + 1] + DIHEDRAL_MARGIN
+                         for row in range(8) for col in range(8)])
+
+
+def dihedral_difference_hashes(gray: Image.Image) -> List[str]:
+    """
+    Difference hash delle 8 rotazioni di 90° e ribaltamenti dell'immagine.
+
+    L'immagine viene ridotta una sola volta a un quadrato CANONICAL_GRID x
+    CANONICAL_GRID (in virgola mobile, senza arrotondamenti); le
+    trasformazioni si applicano a quella copia. Il minimo della lista è
+    l'hash canonico, uguale per tutte le copie ruotate.
+    """
+    square = gray.convert('F').resize((CANONICAL_GRID, CANONICAL_GRID), Image.Resampling.BOX)
+    return [_dihedral_bits(square.transpose(transform) if transform is not None else square)
+            for transform in DIHEDRAL_TRANSFORMS]
+
+
+def hamming_distance(hash1: str, hash2: str) -> int:
+    """Numero di bit diversi tra due hash esadecimali."""
+    return bin(int(hash1, 16) ^ int(hash2, 16)).count('1')
+
+
+def color_histogram(rgb: Image.Image) -> List[float]:
+    """Istogramma normalizzato con HISTOGRAM_BINS bin per canale R, G, B."""
+    histogram = rgb.histogram()
+    total = float(rgb.width * rgb.height) or 1.0
+    per_bin = 256 // HISTOGRAM_BINS
+    result = []
+    for channel in range(3):
+        values = histogram[channel * 256:(channel + 1) * 256]
+        result.extend(round(sum(values[b * per_bin:(b + 1) * per_bin]) / total, 4)
+                      for b in range(HISTOGRAM_BINS))
+    return result
+
+
+def sharpness_score(gray: Image.Image) -> float:
+    """Varianza del laplaciano: valori alti indicano immagini più nitide."""
+    return round(ImageStat.Stat(gray.filter(_LAPLACIAN)).var[0], 2)
+
+
+def _reduce_to(img: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """Riduzione economica in memoria prima del ridimensionamento finale."""
+    factor = max(1, min(img.width // size[0], img.height // size[1]))
+    return img.reduce(factor) if factor > 1 else img
+
+
+def extract_features(file_path: Path) -> Dict:
+    """
+    Decodifica il file una sola volta e calcola il record delle feature.
+
+    Returns:
+        Dizionario con 'dimensions', 'pixel_digest', 'ahash', 'dhash',
+        'dihedral_dhash', 'canonical_dhash', 'histogram' e 'sharpness'
+    """
+    with Image.open(file_path) as img:
+        width, height = img.size
+
+    if width * height > STREAMING_PIXELS:
+        # Immagini enormi: digest a bande e segnali da una decodifica ridotta
+        dimensions, digest = streaming_pixel_digest(file_path)
+        reduced = load_image(file_path, target_size=(SHARPNESS_SIZE, SHARPNESS_SIZE),
+                             mode='RGB', use_exif_thumbnail=False)
+    else:
+        rgb = load_image(file_path, mode='RGB')
+        dimensions, digest = rgb.size, pixel_digest(rgb)
+        reduced = rgb
+
+    # Tutti i segnali successivi partono da una copia ridotta in memoria
+    reduced = _reduce_to(reduced, (SHARPNESS_SIZE, SHARPNESS_SIZE))
+    gray = reduced.convert('L')
+    dihedral = dihedral_difference_hashes(gray)
+    small = reduced.copy()
+    small.thumbnail(HISTOGRAM_SIZE, Image.Resampling.LANCZOS)
+
+    return {
+        'dimensions': dimensions,
+        'pixel_digest': digest,
+        'ahash': average_hash(gray),
+        'dhash': difference_hash(gray),
+        'dihedral_dhash': dihedral,
+        # Hash esadecimali della stessa lunghezza: l'ordine delle stringhe è quello numerico
+        'canonical_dhash': min(dihedral),
+        'histogram': color_histogram(small),
+        'sharpness': sharpness_score(gray)
+    }
@@ -13,11 +13,16 @@ import queue
 from datetime import datetime
 import os
 import shutil
-from PIL import Image, ImageTk
+from PIL import ImageTk
 import io
+from typing import Optional
 
 # Importa la classe principale
 from image_duplicate_finder import ImageDuplicateFinder
+from image_loader import make_thumbnail
+from safe_decode import DEFAULT_MAX_PIXELS, apply_pixel_limit
+from throttle import ResourceThrottle
+from time_budget import TimeBudget
 
 class DuplicateFinderGUI:
     """Interfaccia grafica per Image Duplicate Finder."""
@@ -33,6 +38,15 @@ class DuplicateFinderGUI:
         self.pixel_verify_var = tk.BooleanVar(value=True)
         self.verbose_var = tk.BooleanVar(value=False)
         
+        # Limiti di risorse (modalità throttled), modificabili durante l'analisi
+        self.throttle = ResourceThrottle()
+        self.max_mbps_var = tk.StringVar(value="0")
+        self.max_iops_var = tk.StringVar(value="0")
+        self.cpu_percent_var = tk.StringVar(value="100")
+        # Tempo massimo dell'analisi in minuti (0 = nessun limite)
+        self.time_budget_var = tk.StringVar(value="0")
+        self.time_budget: Optional[TimeBudget] = None
+        
         # Tema corrente
         self.current_theme = "Pro"
         self.themes = {
@@ -318,7 +332,51 @@ class DuplicateFinderGUI:
                                       selectcolor=self.themes[self.current_theme]["accent"],
                                       activebackground=self.themes[self.current_theme]["button_bg"],
                                       relief='flat')
-        verbose_check.grid(row=1, column=0, sticky="w", padx=15, pady=(0, 15))
+        verbose_check.grid(row=1, column=0, sticky="w", padx=15, pady=(0, 8))
+        
+        # Limiti di I/O e CPU (0 / 100% = illimitato)
+        throttle_frame = tk.Frame(options_frame, bg=self.themes[self.current_theme]["frame_bg"])
+        throttle_frame.grid(row=2, column=0, sticky="w", padx=15, pady=(0, 15))
+        
+        option_labels = []
+        option_entries = []
+        for col, (text, var) in enumerate([("🐢 MB/s:", self.max_mbps_var),
+                                           ("IOPS:", self.max_iops_var),
+                                           ("CPU %:", self.cpu_percent_var)]):
+            label = tk.Label(throttle_frame, text=text,
+                             bg=self.themes[self.current_theme]["frame_bg"],
+                             fg=self.themes[self.current_theme]["fg"])
+            label.grid(row=0, column=col * 2, sticky="w", padx=(0, 4))
+            entry = tk.Entry(throttle_frame, textvariable=var, width=6,
+                             bg=self.themes[self.current_theme]["text_bg"],
+                             fg=self.themes[self.current_theme]["fg"],
+                             relief='solid', bd=1)
+            entry.grid(row=0, column=col * 2 + 1, sticky="w", padx=(0, 10))
+            option_labels.append(label)
+            option_entries.append(entry)
+        
+        throttle_btn = tk.Button(throttle_frame,
+                                 text="Applica limiti",
+                                 command=self.apply_throttle_limits,
+                                 bg=self.themes[self.current_theme]["button_bg"],
+                                 fg=self.themes[self.current_theme]["fg"],
+                                 font=('Arial', 8, 'bold'),
+                                 relief='solid',
+                                 bd=1,
+                                 activebackground=self.themes[self.current_theme]["accent"])
+        throttle_btn.grid(row=0, column=6, sticky="w")
+        
+        budget_label = tk.Label(throttle_frame, text="⏱️ Tempo max (min, 0 = nessuno):",
+                                bg=self.themes[self.current_theme]["frame_bg"],
+                                fg=self.themes[self.current_theme]["fg"])
+        budget_label.grid(row=1, column=0, columnspan=4, sticky="w", pady=(6, 0))
+        budget_entry = tk.Entry(throttle_frame, textvariable=self.time_budget_var, width=6,
+                                bg=self.themes[self.current_theme]["text_bg"],
+                                fg=self.themes[self.current_theme]["fg"],
+                                relief='solid', bd=1)
+        budget_entry.grid(row=1, column=4, columnspan=2, sticky="w", pady=(6, 0))
+        option_labels.append(budget_label)
+        option_entries.append(budget_entry)
         
         # Control buttons
         button_frame = tk.Frame(self.left_frame, bg=self.themes[self.current_theme]["bg"])
@@ -537,8 +595,11 @@ class DuplicateFinderGUI:
             'labels': [results_label, dir_label, options_label, progress_label,
                       summary_label_title, global_actions_label, info_label],
             'entry': self.dir_entry,
-            'buttons': [browse_btn],
+            'buttons': [browse_btn, throttle_btn],
             'checkboxes': [pixel_check, verbose_check],
+            'option_frames': [throttle_frame],
+            'option_labels': option_labels,
+            'option_entries': option_entries,
             'text_widgets': [info_text],
             'entry_frame': dir_entry_frame
         }
@@ -698,6 +759,15 @@ class DuplicateFinderGUI:
                          selectcolor=theme["accent"],
                          activebackground=theme["button_bg"])
             
+            # Aggiorna opzioni aggiuntive (limiti risorse)
+            for frame in self.themed_widgets['option_frames']:
+                frame.config(bg=theme["frame_bg"])
+            for label in self.themed_widgets['option_labels']:
+                label.config(bg=theme["frame_bg"], fg=theme["fg"])
+            for entry in self.themed_widgets['option_entries']:
+                entry.config(bg=theme["text_bg"], fg=theme["fg"],
+                             insertbackground=theme["primary"])
+            
             # Aggiorna widget di testo
             for text_widget in self.themed_widgets['text_widgets']:
                 text_widget.config(bg=theme["text_bg"], fg=theme["fg"])
@@ -782,6 +852,24 @@ class DuplicateFinderGUI:
         if directory:
             self.directory_var.set(directory)
     
+    def apply_throttle_limits(self):
+        """Applica i limiti di I/O e CPU, anche durante un'analisi in corso."""
+        try:
+            mbps = float(self.max_mbps_var.get().replace(',', '.') or 0)
+            iops = float(self.max_iops_var.get().replace(',', '.') or 0)
+            cpu_percent = float(self.cpu_percent_var.get().replace(',', '.') or 100)
+        except ValueError:
+            messagebox.showerror("Errore", "I limiti di risorse devono essere numerici")
+            return False
+        
+        self.throttle.set_limits(bytes_per_second=mbps * 1024 * 1024,
+                                 max_iops=iops,
+                                 cpu_share=cpu_percent / 100)
+        if self.is_running:
+            self.progress_queue.put(("status", f"Limiti aggiornati: {mbps:g} MB/s, "
+                                               f"{iops:g} IOPS, CPU {cpu_percent:g}%"))
+        return True
+    
     def start_analysis(self):
         """Avvia l'analisi in un thread separato."""
         directory = self.directory_var.get().strip()
@@ -794,6 +882,17 @@ class DuplicateFinderGUI:
             messagebox.showerror("Errore", "La directory selezionata non esiste")
             return
         
+        if not self.apply_throttle_limits():
+            return
+        
+        try:
+            minutes = float(self.time_budget_var.get().replace(',', '.') or 0)
+        except ValueError:
+            messagebox.showerror("Errore", "Tempo massimo non valido")
+            return
+        # Serve anche senza limite di tempo: il pulsante Stop annulla le fasi in corso
+        self.time_budget = TimeBudget(minutes * 60 if minutes > 0 else None)
+        
         # Reset UI
         self.clear_results()
         self.is_running = True
@@ -810,6 +909,8 @@ class DuplicateFinderGUI:
     def stop_analysis(self):
         """Interrompe l'analisi."""
         self.is_running = False
+        if self.time_budget is not None:
+            self.time_budget.cancel()
         self.progress_queue.put(("status", "Interruzione in corso..."))
         
         # Reset UI
@@ -819,7 +920,9 @@ class DuplicateFinderGUI:
     def run_analysis(self, directory):
         """Esegue l'analisi (da eseguire in thread separato)."""
         try:
-            self.finder = ImageDuplicateFinder(verbose=self.verbose_var.get())
+            self.finder = ImageDuplicateFinder(verbose=self.verbose_var.get(),
+                                               throttle=self.throttle,
+                                               time_budget=self.time_budget)
             
             # Scansione directory
             self.progress_queue.put(("status", "Scansionando directory..."))
@@ -864,88 +967,69 @@ class DuplicateFinderGUI:
             self.progress_queue.put(("error", f"Errore durante l'analisi: {str(e)}"))
         finally:
             self.is_running = False
+            # I risultati restano nel catalogo: il pool di decodifica non serve più
+            if self.finder:
+                self.finder.close()
     
     def verify_duplicates_with_progress(self):
         """Verifica duplicati con confronto pixel mostrando il progresso."""
         if not self.finder.duplicates:
             return
         
-        # Calcola il numero totale di confronti da fare
-        total_comparisons = 0
-        for group_paths in self.finder.duplicates.values():
-            if len(group_paths) > 1:
-                # Per ogni gruppo, confrontiamo ogni file con il primo
-                total_comparisons += len(group_paths) - 1
+        # Ogni file viene decodificato una sola volta: il progresso conta i file
+        group_items = [(file_hash, paths) for file_hash, paths in self.finder.duplicates.items()
+                       if len(paths) > 1]
+        total_files = sum(len(paths) for _, paths in group_items)
         
-        if total_comparisons == 0:
+        if total_files == 0:
             return
         
         # Lista per tenere traccia dei gruppi verificati
         verified_groups = {}
-        current_comparison = 0
+        current_file = 0
         
-        for file_hash, group_paths in list(self.finder.duplicates.items()):
-            if len(group_paths) <= 1:
-                continue
-            
+        for group_number, (file_hash, group_paths) in enumerate(group_items, 1):
             if not self.is_running:
                 break
             
             # Aggiorna status per questo gruppo
-            self.progress_queue.put(("status", f"Confronto pixel gruppo {len(verified_groups)+1}..."))
+            self.progress_queue.put(("status", f"Confronto pixel gruppo {group_number}..."))
             
-            # Confronta ogni file con il primo del gruppo
-            reference_path = group_paths[0]
-            verified_paths = [reference_path]  # Il primo è sempre incluso
+            # Decodifica in parallelo i file del gruppo (una volta sola per file)
+            self.finder.extract_features_batch(group_paths)
             
-            try:
-                with Image.open(reference_path) as ref_img:
-                    ref_pixels = list(ref_img.getdata())
-                    
-                    for i, compare_path in enumerate(group_paths[1:], 1):
-                        if not self.is_running:
-                            break
-                        
-                        current_comparison += 1
-                        
-                        # Aggiorna progresso
-                        progress = 70 + (current_comparison / total_comparisons) * 25  # 70-95%
-                        self.progress_queue.put(("progress", progress))
-                        
-                        # Aggiorna status dettagliato
-                        self.progress_queue.put(("status", 
-                            f"Confronto pixel {current_comparison}/{total_comparisons}: {compare_path.name}"))
-                        
-                        try:
-                            with Image.open(compare_path) as comp_img:
-                                # Confronta dimensioni
-                                if ref_img.size != comp_img.size:
-                                    continue  # Dimensioni diverse = non duplicati
-                                
-                                comp_pixels = list(comp_img.getdata())
-                                
-                                # Confronta pixel (campionamento per immagini grandi)
-                                if len(ref_pixels) > 1000000:  # > 1M pixel
-                                    # Campiona ogni 100° pixel per performance
-                                    sample_indices = range(0, len(ref_pixels), 100)
-                                    pixels_match = all(ref_pixels[idx] == comp_pixels[idx] 
-                                                     for idx in sample_indices)
-                                else:
-                                    # Confronto completo per immagini piccole
-                                    pixels_match = ref_pixels == comp_pixels
-                                
-                                if pixels_match:
-                                    verified_paths.append(compare_path)
-                        
-                        except Exception as e:
-                            if self.verbose_var.get():
-                                print(f"Errore confronto pixel {compare_path}: {e}")
-                            continue
+            # Confronta il digest dei pixel di ogni file con quello del primo del gruppo
+            reference_path = group_paths[0]
+            reference_features = None
+            verified_paths = []
             
-            except Exception as e:
-                if self.verbose_var.get():
-                    print(f"Errore apertura immagine di riferimento {reference_path}: {e}")
-                continue
+            for compare_path in group_paths:
+                if not self.is_running:
+                    break
+                
+                current_file += 1
+                
+                # Aggiorna progresso
+                progress = 70 + (current_file / total_files) * 25  # 70-95%
+                self.progress_queue.put(("progress", progress))
+                
+                # Aggiorna status dettagliato
+                self.progress_queue.put(("status", 
+                    f"Confronto pixel {current_file}/{total_files}: {compare_path.name}"))
+                
+                features = self.finder.get_image_features(compare_path)
+                if not features:
+                    if self.verbose_var.get():
+                        print(f"Errore decodifica immagine {compare_path}")
+                    if compare_path == reference_path:
+                        break
+                    continue
+                
+                if compare_path == reference_path:
+                    reference_features = features
+                    verified_paths.append(compare_path)
+                elif features['pixel_digest'] == reference_features['pixel_digest']:
+                    verified_paths.append(compare_path)
             
             # Aggiorna il gruppo con solo i file verificati come identici
             if len(verified_paths) > 1:
@@ -960,14 +1044,19 @@ class DuplicateFinderGUI:
     
     def prepare_results(self):
         """Prepara i risultati per la visualizzazione."""
+        unverified = sum(self.finder.unverified_summary().values())
         if not self.finder.duplicates:
             return {
                 "summary": f"Analizzate {len(self.finder.image_paths)} immagini - Nessun duplicato trovato! 🎉",
-                "details": "Tutte le immagini nella directory sono uniche."
+                "details": ("Tutte le immagini nella directory sono uniche." if not unverified else
+                            f"⏱️ Tempo esaurito: {unverified} file/directory non verificati.")
             }
         
+        # Metadati letti in parallelo una sola volta e salvati nel catalogo
+        self.finder.prefetch_metadata()
+        
         total_duplicates = sum(len(paths) - 1 for paths in self.finder.duplicates.values())
-        total_space = sum(paths[0].stat().st_size * (len(paths) - 1) 
+        total_space = sum(self.finder.get_image_metadata(paths[0])['size'] * (len(paths) - 1) 
                          for paths in self.finder.duplicates.values() if paths)
         
         summary = (f"Analizzate {len(self.finder.image_paths)} immagini - "
@@ -984,6 +1073,10 @@ class DuplicateFinderGUI:
         details.append(f"   • Gruppi di duplicati trovati: {len(self.finder.duplicates)}")
         details.append(f"   • File duplicati da rimuovere: {total_duplicates}")
         details.append(f"   • Spazio totale recuperabile: {total_space:,} bytes ({total_space/1024/1024:.2f} MB)")
+        if unverified:
+            details.append(f"   • ⏱️ Tempo esaurito: risultato parziale, {unverified} file/directory non verificati")
+            for stage, count in self.finder.unverified_summary().items():
+                details.append(f"        - fase '{stage}': {count}")
         details.append("")
         details.append("💡 SUGGERIMENTO: Mantieni UN file per gruppo, elimina gli altri")
         details.append("=" * 80)
@@ -993,7 +1086,7 @@ class DuplicateFinderGUI:
             if not paths:
                 continue
                 
-            file_size = paths[0].stat().st_size
+            file_size = self.finder.get_image_metadata(paths[0])['size']
             space_saved = file_size * (len(paths) - 1)
             
             # Header del gruppo con box
@@ -1244,7 +1337,7 @@ class DuplicateFinderGUI:
         select_all_check.pack(side="left")
         
         # Info gruppo
-        file_size = paths[0].stat().st_size if paths else 0
+        file_size = self.finder.get_image_metadata(paths[0])['size'] if paths else 0
         space_saved = file_size * (len(paths) - 1)
         info_label = tk.Label(header_frame,
                               text=f"💾 Spazio recuperabile: {space_saved/1024/1024:.1f} MB",
@@ -1347,16 +1440,14 @@ class DuplicateFinderGUI:
                                  fg=theme["fg"])
             path_label.pack(anchor="w")
             
-            # Info aggiuntive
+            # Info aggiuntive dal catalogo (nessuna nuova apertura dell'immagine)
             try:
-                stat_info = path.stat()
-                size_mb = stat_info.st_size / 1024 / 1024
+                metadata = self.finder.get_image_metadata(path)
+                size_mb = metadata['size'] / 1024 / 1024
                 
-                # Prova a leggere dimensioni immagine
-                try:
-                    with Image.open(path) as img:
-                        dimensions = f"{img.size[0]}x{img.size[1]}"
-                except:
+                if metadata['dimensions']:
+                    dimensions = f"{metadata['dimensions'][0]}x{metadata['dimensions'][1]}"
+                else:
                     dimensions = "N/A"
                 
                 extra_info = f"📏 {size_mb:.1f} MB • 📐 {dimensions} px"
@@ -1753,19 +1844,18 @@ ATTENZIONE: Questa cartella viene ricreata ad ogni nuova scansione!
         theme = self.themes[self.current_theme]
         
         try:
-            with Image.open(image_path) as img:
-                # Mantieni aspect ratio
-                img.thumbnail(size, Image.Resampling.LANCZOS)
-                photo = ImageTk.PhotoImage(img)
-                
-                label = tk.Label(parent, 
-                                image=photo,
-                                bg=theme["frame_bg"],
-                                relief='solid',
-                                bd=1,
-                                highlightbackground=theme["frame_border"])
-                label.image = photo  # Mantieni riferimento
-                return label
+            # Decodifica a risoluzione ridotta (cache LRU), mantenendo l'aspect ratio
+            img = make_thumbnail(Path(image_path), size)
+            photo = ImageTk.PhotoImage(img)
+            
+            label = tk.Label(parent, 
+                            image=photo,
+                            bg=theme["frame_bg"],
+                            relief='solid',
+                            bd=1,
+                            highlightbackground=theme["frame_border"])
+            label.image = photo  # Mantieni riferimento
+            return label
         except Exception:
             # Placeholder se non riesce a caricare
             placeholder = tk.Label(parent, 
@@ -1783,18 +1873,21 @@ ATTENZIONE: Questa cartella viene ricreata ad ogni nuova scansione!
         """Apre la finestra di preview per un gruppo di duplicati."""
         try:
             original_idx = self.find_original_file_index(group['paths'])
-            preview_window = ImagePreviewWindow(self.root, group, original_idx)
+            preview_window = ImagePreviewWindow(self.root, group, original_idx,
+                                                self.finder.get_image_metadata)
         except Exception as e:
             messagebox.showerror("Errore", f"Impossibile aprire l'anteprima:\n{str(e)}")
 
 class ImagePreviewWindow:
     """Finestra per visualizzare e confrontare originale e duplicati."""
     
-    def __init__(self, parent, group_data, original_idx):
+    def __init__(self, parent, group_data, original_idx, get_metadata):
         self.parent = parent
         self.group_data = group_data
         self.original_idx = original_idx
         self.paths = group_data['paths']
+        # Metadati dal catalogo del finder (stat e intestazione letti una sola volta)
+        self.get_metadata = get_metadata
         
         # Crea finestra
         self.window = tk.Toplevel(parent)
@@ -1919,13 +2012,10 @@ class ImagePreviewWindow:
                 error_label.pack(pady=(0, 10))
             
             # Info file
-            info_text = f"📄 {path.name}\n📁 {path.parent.name}\n📏 {path.stat().st_size:,} bytes"
-            
-            try:
-                with Image.open(path) as img:
-                    info_text += f"\n📐 {img.size[0]}x{img.size[1]} px"
-            except:
-                pass
+            metadata = self.get_metadata(path)
+            info_text = f"📄 {path.name}\n📁 {path.parent.name}\n📏 {metadata['size']:,} bytes"
+            if metadata['dimensions']:
+                info_text += f"\n📐 {metadata['dimensions'][0]}x{metadata['dimensions'][1]} px"
             
             info_label = ttk.Label(img_frame, text=info_text,
                                   font=('Arial', 9),
@@ -1971,19 +2061,17 @@ class ImagePreviewWindow:
     def create_image_thumbnail(self, parent, image_path, size=(150, 120)):
         """Crea una thumbnail dell'immagine."""
         try:
-            # Carica immagine
-            with Image.open(image_path) as img:
-                # Mantieni aspect ratio
-                img.thumbnail(size, Image.Resampling.LANCZOS)
-                
-                # Crea PhotoImage
-                photo = ImageTk.PhotoImage(img)
-                
-                # Crea label
-                label = ttk.Label(parent, image=photo)
-                label.image = photo  # Mantieni riferimento
-                
-                return label
+            # Carica immagine a risoluzione ridotta, mantenendo l'aspect ratio
+            img = make_thumbnail(Path(image_path), size)
+            
+            # Crea PhotoImage
+            photo = ImageTk.PhotoImage(img)
+            
+            # Crea label
+            label = ttk.Label(parent, image=photo)
+            label.image = photo  # Mantieni riferimento
+            
+            return label
         except Exception as e:
             # Se non riesce a caricare, mostra un placeholder
             placeholder = ttk.Label(parent, 
@@ -2032,24 +2120,22 @@ class ImagePreviewWindow:
         info_frame = ttk.LabelFrame(self.single_img_frame, text="📋 Informazioni File", padding="10")
         info_frame.pack(fill="x")
         
-        # Carica metadati
+        # Metadati dal catalogo
         try:
-            stat = path.stat()
+            metadata = self.get_metadata(path)
+            size = metadata['size']
             info_text = f"📄 Nome: {path.name}\n"
             info_text += f"📁 Percorso: {path.parent}\n"
-            info_text += f"📏 Dimensione: {stat.st_size:,} bytes ({stat.st_size/1024/1024:.2f} MB)\n"
-            info_text += f"📅 Modificato: {datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')}\n"
+            info_text += f"📏 Dimensione: {size:,} bytes ({size/1024/1024:.2f} MB)\n"
+            if metadata['modification_time']:
+                info_text += f"📅 Modificato: {metadata['modification_time'].strftime('%Y-%m-%d %H:%M:%S')}\n"
             
             # Info immagine
-            try:
-                with Image.open(path) as img:
-                    info_text += f"📐 Risoluzione: {img.size[0]} x {img.size[1]} pixel\n"
-                    info_text += f"🎨 Modalità: {img.mode}\n"
-                    if hasattr(img, '_getexif') and img._getexif():
-                        info_text += f"📷 EXIF: Presente"
-                    else:
-                        info_text += f"📷 EXIF: Non disponibile"
-            except:
+            if metadata['dimensions']:
+                info_text += f"📐 Risoluzione: {metadata['dimensions'][0]} x {metadata['dimensions'][1]} pixel\n"
+                info_text += f"🎨 Modalità: {metadata['mode'] or 'n/d'}\n"
+                info_text += f"📷 EXIF: {'Presente' if metadata['has_exif'] else 'Non disponibile'}"
+            else:
                 info_text += f"📐 Impossibile leggere metadati immagine"
             
             info_label = ttk.Label(info_frame, text=info_text,
@@ -2165,6 +2251,7 @@ class ImagePreviewWindow:
 
 def main():
     """Avvia l'interfaccia grafica."""
+    apply_pixel_limit(DEFAULT_MAX_PIXELS)
     root = tk.Tk()
     app = DuplicateFinderGUI(root)
     root.mainloop()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Cache LRU delle immagini decodificate
+
+Nella stessa sessione un file viene richiesto da verifica, miniature e
+anteprime: la cache conserva le immagini già decodificate entro un budget
+in byte, con rimozione delle meno usate di recente (LRU).
+La chiave comprende percorso, mtime, dimensione del file, dimensione
+richiesta e modalità: un file modificato non restituisce mai dati vecchi.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+from PIL import Image
+
+# Budget predefinito della cache di processo
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+# Le immagini oltre questa frazione del budget non vengono conservate
+_MAX_ENTRY_FRACTION = 8
+
+
+def image_nbytes(img: Image.Image) -> int:
+    """Occupazione approssimativa in memoria dei pixel decodificati."""
+    bands = len(img.getbands())
+    bits = {'1': 1, 'I;16': 16, 'I': 32, 'F': 32}.get(img.mode, 8)
+    return max(1, img.width * img.height * bands * bits // 8)
+
+
+class DecodedImageCache:
+    """Cache LRU thread-safe di immagini PIL con budget in byte."""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max(0, max_bytes)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Image.Image]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Image.Image]:
+        """Restituisce una copia dell'immagine in cache, o None."""
+        with self._lock:
+            img = self._entries.get(key)
+            if img is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Copia: i chiamanti possono modificare l'immagine (es. thumbnail())
+        return img.copy()
+
+    def put(self, key: Hashable, img: Image.Image) -> None:
+        """Inserisce una copia dell'immagine, liberando le voci meno recenti."""
+        size = image_nbytes(img)
+        if not self.max_bytes or size > self.max_bytes // _MAX_ENTRY_FRACTION:
+            return
+        img = img.copy()
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= image_nbytes(previous)
+            self._entries[key] = img
+            self.current_bytes += size
+            self._evict()
+
+    def _evict(self) -> None:
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, img = self._entries.popitem(last=False)
+            self.current_bytes -= image_nbytes(img)
+
+    def set_budget(self, max_bytes: int) -> None:
+        """Modifica il budget in byte (0 disattiva la cache)."""
+        with self._lock:
+            self.max_bytes = max(0, max_bytes)
+            self._evict()
+
+    def clear(self) -> None:
+        """Svuota la cache (i contatori restano invariati)."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Contatori per dimensionare il budget."""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes
+            }
+
+
+# Istanza condivisa da tutti i percorsi di decodifica del processo
+decoded_image_cache = DecodedImageCache()
@@ -16,13 +16,41 @@ import os
 import hashlib
 import sys
 from pathlib import Path
-from typing import Dict, List, Tuple, Set
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple, Set, Optional
 from collections import defaultdict
+import heapq
+import threading
 import argparse
+import socket
+import sqlite3
 from datetime import datetime
 
+from io_scheduler import DeviceIOScheduler
+from binary_manifest import BinaryManifest, diff_manifests, write_binary_manifest
+from bloom import digest_key
+from burst_groups import (DEFAULT_BURST_DISTANCE, DEFAULT_BURST_WINDOW, BurstGroup,
+                          build_time_index, burst_candidates, find_bursts)
+from checkpoint import ScanCheckpoint
+from estimator import DEFAULT_SAMPLE_FRACTION, DuplicateEstimate, estimate_duplicates
+from directory_analysis import DEFAULT_MIN_RATIO, DirectoryAnalysis, analyze_directories
+from manifest import ManifestRecord, merge_manifests, write_manifest
+from reference_index import DEFAULT_REFERENCE_INDEX, ReferenceIndex, file_signature
+from metadata_reader import read_image_header
+from near_duplicates import DEFAULT_ROTATION_DISTANCE, group_similar_hashes
+from safe_decode import (DEFAULT_DECODE_TIMEOUT, DEFAULT_MAX_PIXELS, REASON_PIXEL_LIMIT,
+                         QuarantineStore, apply_pixel_limit, exceeds_pixel_limit)
+from scan_filters import ScanFilter
+from sidecar import SIDECAR_NAME, SidecarStore
+from throttle import ResourceThrottle
+from time_budget import (STAGE_HASH, STAGE_PARTIAL_HASH, STAGE_SCAN, STAGE_SIZE, TimeBudget,
+                         UnverifiedCandidate, parse_duration)
+
 try:
-    from PIL import Image, ExifTags
+    # Questi moduli importano Pillow: la loro importazione fa da verifica di disponibilità
+    from features import STREAMING_PIXELS, extract_features, hamming_distance
+    from image_cache import decoded_image_cache
+    from pixel_stream import compare_pixels_streaming
+    from verify_engine import ProcessVerificationEngine
     PIL_AVAILABLE = True
 except ImportError:
     PIL_AVAILABLE = False
@@ -46,19 +74,99 @@ class ImageDuplicateFinder:
     # Estensioni immagine supportate
     SUPPORTED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.tif', '.webp', '.heic', '.heif'}
     
-    def __init__(self, verbose: bool = False):
+    # Dimensione dei blocchi letti durante l'hashing
+    HASH_CHUNK_SIZE = 8192
+    
+    # Lotti della modalità "più spazio recuperabile prima": piccoli, così i
+    # primi gruppi confermati arrivano subito
+    PRIORITY_BATCH_FILES = 256
+    PRIORITY_BATCH_BYTES = 256 * 1024 * 1024
+    
+    # Gruppi tenuti nel riepilogo dei maggiori recuperi
+    TOP_GROUPS = 20
+    
+    # Byte letti all'inizio e alla fine del file per l'hash parziale
+    PARTIAL_HASH_BYTES = 64 * 1024
+    
+    def __init__(self, verbose: bool = False, throttle: Optional[ResourceThrottle] = None,
+                 autotune: bool = True, scan_filter: Optional[ScanFilter] = None,
+                 decode_processes: Optional[int] = None,
+                 decode_timeout: Optional[float] = DEFAULT_DECODE_TIMEOUT,
+                 max_pixels: int = DEFAULT_MAX_PIXELS,
+                 quarantine: Optional[QuarantineStore] = None,
+                 sidecars: bool = False,
+                 time_budget: Optional[TimeBudget] = None):
         self.verbose = verbose
+        # Regole di esclusione valutate durante la visita (prima di discendere/stat)
+        self.scan_filter = scan_filter or ScanFilter()
+        # Limitatore condiviso tra hashing e decodifica (illimitato di default)
+        self.throttle = throttle or ResourceThrottle()
         self.image_paths: List[Path] = []
         self.file_hashes: Dict[str, List[Path]] = defaultdict(list)
         self.duplicates: Dict[str, List[Path]] = {}
+        # Catalogo per file: metadati già estratti, riusati da report e interfacce
+        self.file_catalog: Dict[Path, Dict] = {}
+        # Code per dispositivo con concorrenza adattata al throughput misurato
+        self.io_scheduler = DeviceIOScheduler(log=self.log, autotune=autotune)
+        # Processi per la decodifica (None = uno per core, 0 = solo thread)
+        self.decode_processes = decode_processes
+        self._verification_engine = None
+        # Limiti per file patologici: tempo massimo, pixel massimi, quarantena
+        self.decode_timeout = decode_timeout or None
+        self.max_pixels = max_pixels
+        self.quarantine = quarantine or QuarantineStore()
+        # Checkpoint opzionale per riprendere esecuzioni interrotte
+        self.checkpoint: Optional[ScanCheckpoint] = None
+        # Hash salvati in un sidecar per directory (dischi portatili)
+        self.sidecars: Optional[SidecarStore] = SidecarStore(log=self.log) if sidecars else None
+        # Analisi per directory (facoltativa, dopo find_duplicates_by_hash)
+        self.directory_analysis: Optional[DirectoryAnalysis] = None
+        # Raffiche e scatti simili (facoltativo, find_burst_groups)
+        self.burst_groups: Optional[List[BurstGroup]] = None
+        # Quasi duplicati ruotati o ribaltati (facoltativo, find_rotated_duplicates)
+        self.rotation_groups: Optional[List[List[Path]]] = None
+        # Min-heap limitato dei gruppi con più spazio recuperabile (reclaimable, ordine, hash)
+        self._top_groups: List[Tuple[int, int, str]] = []
+        self._top_lock = threading.Lock()
+        # Tempo massimo / annullamento e candidati rimasti da verificare
+        self.time_budget = time_budget
+        self.unverified: List[UnverifiedCandidate] = []
+        # File candidati che sono essi stessi nell'indice di riferimento (check_against_reference)
+        self.reference_members: List[Path] = []
         
     def log(self, message: str):
         """Stampa messaggi se modalità verbose è attiva."""
         if self.verbose:
             print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}")
     
-    def scan_directory(self, directory: Path) -> None:
-        """Scansiona ricorsivamente una directory per trovare immagini."""
+    def out_of_time(self) -> bool:
+        """True se il tempo massimo è scaduto o l'analisi è stata annullata."""
+        return self.time_budget is not None and self.time_budget.expired
+    
+    def close(self) -> None:
+        """Libera le risorse (processi di decodifica)."""
+        if self._verification_engine is not None:
+            self._verification_engine.close()
+            self._verification_engine = None
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+        if PIL_AVAILABLE:
+            stats = decoded_image_cache.stats()
+            self.log(f"Cache immagini: {stats['hits']} hit, {stats['misses']} miss "
+                     f"({stats['hit_rate']:.0%}), {stats['bytes'] / 1024 / 1024:.1f} MB "
+                     f"su {stats['max_bytes'] / 1024 / 1024:.0f} MB")
+    
+    def scan_directory(self, directory: Path, root: Optional[Path] = None,
+                       recursive: bool = True) -> None:
+        """
+        Scansiona ricorsivamente una directory per trovare immagini.
+        
+        Args:
+            directory: Directory da scansionare
+            root: Radice della scansione per .dupignore e pattern relativi
+                (default: directory stessa; usata per le porzioni distribuite)
+            recursive: False per considerare solo i file della directory
+        """
         self.log(f"Scansionando directory: {directory}")
         
         if not directory.exists():
@@ -67,36 +175,107 @@ class ImageDuplicateFinder:
         if not directory.is_dir():
             raise NotADirectoryError(f"Il percorso non è una directory: {directory}")
         
-        # Scansiona ricorsivamente tutte le immagini
-        for file_path in directory.rglob('*'):
-            if file_path.is_file() and file_path.suffix.lower() in self.SUPPORTED_EXTENSIONS:
+        # Aggiunge le regole del file .dupignore della radice
+        root = root or directory
+        scan_filter = self.scan_filter.with_ignore_file(root)
+        
+        checkpoint = self.checkpoint
+        if checkpoint is not None and checkpoint.scan_complete:
+            self.image_paths.extend(checkpoint.image_paths)
+            print(f"Ripresa dal checkpoint: {len(self.image_paths)} immagini già trovate.")
+            return
+        
+        # Visita iterativa: i sottoalberi esclusi non vengono mai elencati
+        quarantined = 0
+        pending = [directory]
+        if checkpoint is not None and checkpoint.has_scan_state:
+            # Riparte dalla frontiera salvata
+            pending = list(checkpoint.frontier)
+            self.image_paths.extend(checkpoint.image_paths)
+        while pending:
+            if self.out_of_time():
+                # Visita interrotta: le directory non visitate restano da analizzare
+                self.unverified.append(UnverifiedCandidate(STAGE_SCAN, 0, list(reversed(pending))))
+                print(f"⏱️  Tempo esaurito: {len(pending)} directory non visitate.")
+                if checkpoint is not None:
+                    checkpoint.save_scan(pending, self.image_paths, force=True)
+                break
+            if checkpoint is not None:
+                checkpoint.save_scan(pending, self.image_paths)
+            current = pending.pop()
+            try:
+                subdirs, files = scan_filter.list_directory(current, root,
+                                                            self.SUPPORTED_EXTENSIONS, self.log)
+            except OSError as e:
+                self.log(f"Impossibile leggere {current}: {e}")
+                continue
+            
+            for file_path in files:
+                # I file in quarantena restano nel confronto per hash: si salta solo la decodifica
+                if self.quarantine.contains(file_path):
+                    quarantined += 1
+                    self.log(f"In quarantena, non verrà decodificata: {file_path}")
                 self.image_paths.append(file_path)
                 self.log(f"Trovata immagine: {file_path}")
+            
+            # Visita in profondità mantenendo l'ordine alfabetico
+            if recursive:
+                pending.extend(reversed(subdirs))
+        
+        if checkpoint is not None and not pending:
+            checkpoint.complete_scan(self.image_paths)
         
         print(f"Trovate {len(self.image_paths)} immagini da analizzare.")
+        if quarantined:
+            print(f"{quarantined} immagini in quarantena: confrontate solo per hash, senza decodifica.")
     
     def calculate_file_hash(self, file_path: Path, algorithm: str = 'md5') -> str:
         """Calcola l'hash del contenuto di un file."""
         hash_algo = hashlib.new(algorithm)
         
         try:
+            self.throttle.throttle_io()
             with open(file_path, 'rb') as f:
                 # Leggi il file a blocchi per gestire file grandi
-                for chunk in iter(lambda: f.read(8192), b""):
+                for chunk in iter(lambda: f.read(self.HASH_CHUNK_SIZE), b""):
+                    if self.out_of_time():
+                        return ""  # hash incompleto: il file resta da verificare
+                    # Il budget viene addebitato sui byte effettivamente letti
+                    self.throttle.throttle_io(len(chunk))
                     hash_algo.update(chunk)
             return hash_algo.hexdigest()
         except Exception as e:
             self.log(f"Errore nel calcolo hash per {file_path}: {e}")
             return ""
     
-    def get_image_metadata(self, file_path: Path) -> Dict:
-        """Estrae metadati dall'immagine."""
+    def calculate_partial_hash(self, file_path: Path) -> str:
+        """Hash MD5 dei primi e degli ultimi PARTIAL_HASH_BYTES byte del file."""
+        hash_algo = hashlib.md5()
+        try:
+            self.throttle.throttle_io()
+            with open(file_path, 'rb') as f:
+                head = f.read(self.PARTIAL_HASH_BYTES)
+                f.seek(-self.PARTIAL_HASH_BYTES, os.SEEK_END)
+                tail = f.read(self.PARTIAL_HASH_BYTES)
+            self.throttle.throttle_io(len(head) + len(tail))
+            hash_algo.update(head)
+            hash_algo.update(tail)
+            return hash_algo.hexdigest()
+        except Exception as e:
+            self.log(f"Errore nel calcolo hash parziale per {file_path}: {e}")
+            return ""
+    
+    def _read_image_metadata(self, file_path: Path) -> Dict:
+        """Estrae i metadati leggendo solo stat e intestazione dell'immagine."""
         metadata = {
             'size': 0,
             'creation_time': None,
             'modification_time': None,
             'dimensions': None,
-            'exif_date': None
+            'mode': None,
+            'has_exif': False,
+            'exif_date': None,
+            'camera_model': None
         }
         
         try:
@@ -106,76 +285,358 @@ class ImageDuplicateFinder:
             metadata['creation_time'] = datetime.fromtimestamp(stat.st_ctime)
             metadata['modification_time'] = datetime.fromtimestamp(stat.st_mtime)
             
-            # Informazioni dell'immagine se Pillow è disponibile
-            if PIL_AVAILABLE:
-                with Image.open(file_path) as img:
-                    metadata['dimensions'] = img.size
-                    
-                    # Estrai data EXIF se disponibile
-                    if hasattr(img, '_getexif') and img._getexif():
-                        exif = img._getexif()
-                        for tag_id, value in exif.items():
-                            tag = ExifTags.TAGS.get(tag_id, tag_id)
-                            if tag == 'DateTime':
-                                try:
-                                    metadata['exif_date'] = datetime.strptime(value, '%Y:%m:%d %H:%M:%S')
-                                except:
-                                    pass
-                                break
+            # Dimensioni e data EXIF dalla sola intestazione (nessuna decodifica)
+            metadata.update(read_image_header(file_path))
         except Exception as e:
             self.log(f"Errore nell'estrazione metadati per {file_path}: {e}")
         
         return metadata
     
+    def get_image_metadata(self, file_path: Path) -> Dict:
+        """Estrae metadati dall'immagine (dal catalogo se già letti)."""
+        metadata = self.file_catalog.get(file_path)
+        if metadata is None:
+            metadata = self._read_image_metadata(file_path)
+            self.file_catalog[file_path] = metadata
+        return metadata
+    
+    def prefetch_metadata(self, paths: Optional[List[Path]] = None) -> None:
+        """
+        Legge in parallelo i metadati mancanti e li salva nel catalogo.
+        
+        Args:
+            paths: File da leggere; di default tutti i file nei gruppi di duplicati
+        """
+        if paths is None:
+            paths = [path for group in self.duplicates.values() for path in group]
+        missing = [path for path in dict.fromkeys(paths) if path not in self.file_catalog]
+        if not missing:
+            return
+        
+        self.log(f"Lettura metadati per {len(missing)} file...")
+        results = self.io_scheduler.run(missing, self._read_image_metadata, stage='metadata')
+        for path in missing:
+            self.file_catalog[path] = results.get(path) or self._read_image_metadata(path)
+    
+    def get_image_features(self, file_path: Path) -> Optional[Dict]:
+        """
+        Restituisce il record delle feature (una sola decodifica per file).
+        
+        Il record viene salvato nel catalogo e riusato da verifica e interfacce.
+        Restituisce None se l'immagine non è decodificabile.
+        """
+        metadata = self.get_image_metadata(file_path)
+        if 'features' in metadata:
+            return metadata['features']
+        
+        features = None
+        if PIL_AVAILABLE and self._check_decodable(file_path):
+            try:
+                # La decodifica legge il file per intero
+                self.throttle.throttle_io(metadata['size'])
+                with self.throttle.cpu_slice():
+                    features = extract_features(file_path)
+            except Exception as e:
+                self.log(f"Errore nella decodifica di {file_path}: {e}")
+        
+        self._store_features(file_path, features)
+        return features
+    
+    def _store_features(self, file_path: Path, features: Optional[Dict]) -> None:
+        """Salva il record delle feature nel catalogo."""
+        metadata = self.get_image_metadata(file_path)
+        if features and metadata['dimensions'] is None:
+            metadata['dimensions'] = features['dimensions']
+        metadata['features'] = features
+    
+    def _check_decodable(self, file_path: Path) -> bool:
+        """Verifica quarantena e limite di pixel prima di decodificare."""
+        if self.quarantine.contains(file_path):
+            self.log(f"In quarantena, decodifica saltata: {file_path}")
+            return False
+        if exceeds_pixel_limit(self.get_image_metadata(file_path)['dimensions'], self.max_pixels):
+            self.log(f"Oltre il limite di {self.max_pixels:,} pixel: {file_path}")
+            self.quarantine.add(file_path, REASON_PIXEL_LIMIT)
+            return False
+        return True
+    
+    def _get_verification_engine(self):
+        """Restituisce il pool di processi, o None se va usata la decodifica a thread."""
+        if not PIL_AVAILABLE or self.decode_processes == 0:
+            return None
+        # La quota CPU si applica solo ai thread del processo corrente
+        if self.throttle.cpu_share < 1.0:
+            return None
+        if (self.decode_processes or os.cpu_count() or 1) < 2:
+            return None
+        if self._verification_engine is None:
+            self._verification_engine = ProcessVerificationEngine(
+                self.decode_processes, log=self.log,
+                timeout=self.decode_timeout, max_pixels=self.max_pixels
+            )
+        return self._verification_engine
+    
+    def extract_features_batch(self, paths: Optional[List[Path]] = None) -> None:
+        """
+        Decodifica in parallelo i file non ancora analizzati.
+        
+        Args:
+            paths: File da analizzare; di default tutti i file nei gruppi di duplicati
+        """
+        if paths is None:
+            paths = [path for group in self.duplicates.values() for path in group]
+        self.prefetch_metadata(paths)
+        missing = [path for path in dict.fromkeys(paths) if 'features' not in self.file_catalog[path]]
+        if not missing:
+            return
+        
+        engine = self._get_verification_engine()
+        if engine is None:
+            # Con i thread il limite di tempo non è applicabile (un thread non si interrompe)
+            self.io_scheduler.run(missing, self.get_image_features, stage='decode')
+            return
+        
+        decodable = []
+        for path in missing:
+            if self._check_decodable(path):
+                decodable.append(path)
+            else:
+                self._store_features(path, None)
+        
+        # Decodifica su più processi sorvegliati: tornano solo le feature, senza pixel
+        results = engine.extract_features(
+            decodable,
+            before_submit=lambda path: self.throttle.throttle_io(self.file_catalog[path]['size']),
+            on_failure=self.quarantine.add
+        )
+        for path in decodable:
+            self._store_features(path, results.get(path))
+    
     def compare_images_pixel_by_pixel(self, img1_path: Path, img2_path: Path) -> bool:
-        """Confronta due immagini pixel per pixel."""
+        """Confronta due immagini pixel per pixel (tramite il digest canonico dei pixel)."""
         if not PIL_AVAILABLE:
             return False
         
-        try:
-            with Image.open(img1_path) as img1, Image.open(img2_path) as img2:
-                # Controllo dimensioni
-                if img1.size != img2.size:
-                    return False
-                
-                # Converti entrambe le immagini in RGB per confronto uniforme
-                # Questo è importante per HEIC che potrebbe avere canali alpha
-                img1_rgb = img1.convert('RGB')
-                img2_rgb = img2.convert('RGB')
-                
-                # Per immagini grandi, confronta un campione di pixel per velocità
-                width, height = img1.width, img1.height
-                total_pixels = width * height
-                
-                # Se l'immagine è molto grande (> 1MP), campiona ogni N pixel
-                if total_pixels > 1000000:
-                    step = max(1, int((total_pixels / 1000000) ** 0.5))
-                    for x in range(0, width, step):
-                        for y in range(0, height, step):
-                            if img1_rgb.getpixel((x, y)) != img2_rgb.getpixel((x, y)):
-                                return False
-                else:
-                    # Confronto pixel per pixel completo per immagini piccole
-                    for x in range(width):
-                        for y in range(height):
-                            if img1_rgb.getpixel((x, y)) != img2_rgb.getpixel((x, y)):
-                                return False
-                
-                return True
-        except Exception as e:
-            self.log(f"Errore nel confronto pixel per {img1_path} e {img2_path}: {e}")
+        # Controllo dimensioni dalle intestazioni, senza decodificare
+        metadata1 = self.get_image_metadata(img1_path)
+        metadata2 = self.get_image_metadata(img2_path)
+        if metadata1['dimensions'] != metadata2['dimensions']:
+            return False
+        
+        dimensions = metadata1['dimensions']
+        if (dimensions and dimensions[0] * dimensions[1] > STREAMING_PIXELS
+                and ('features' not in metadata1 or 'features' not in metadata2)):
+            # Immagini enormi: confronto diretto a bande, memoria limitata
+            if not self._check_decodable(img1_path) or not self._check_decodable(img2_path):
+                return False
+            try:
+                self.throttle.throttle_io(metadata1['size'] + metadata2['size'], operations=2)
+                with self.throttle.cpu_slice():
+                    return compare_pixels_streaming(img1_path, img2_path)
+            except Exception as e:
+                self.log(f"Errore nel confronto di {img1_path} e {img2_path}: {e}")
+                return False
+        
+        features1 = self.get_image_features(img1_path)
+        features2 = self.get_image_features(img2_path)
+        if not features1 or not features2:
             return False
+        return features1['pixel_digest'] == features2['pixel_digest']
+    
+    def hash_all_files(self, paths: Optional[List[Path]] = None) -> Dict[Path, str]:
+        """Calcola (o riprende dal checkpoint) l'hash MD5 dei file trovati (o di paths)."""
+        paths = self.image_paths if paths is None else paths
+        print("Calcolando hash dei file...")
+        
+        def report_progress(done: int, total: int) -> None:
+            if done % 10 == 0:  # Progress indicator
+                print(f"Progresso: {done}/{total}")
+        
+        return self._hash_paths(paths, report_progress)
+    
+    def _hash_paths(self, paths: List[Path],
+                    progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[Path, str]:
+        """Hash MD5 dei file indicati, riusando checkpoint e sidecar."""
+        # Hash già nel journal del checkpoint (file non modificati)
+        hashes: Dict[Path, str] = {}
+        if self.checkpoint is not None:
+            for img_path in paths:
+                digest = self.checkpoint.cached_digest(img_path)
+                if digest:
+                    hashes[img_path] = digest
+            if hashes:
+                print(f"Ripresi dal checkpoint {len(hashes)} hash già calcolati.")
+        
+        # Hash dei sidecar .dupindex (validi solo se dimensione e mtime coincidono)
+        if self.sidecars is not None:
+            reused = self.sidecars.cached_digests(path for path in paths if path not in hashes)
+            if reused:
+                print(f"Ripresi dai file {SIDECAR_NAME} {len(reused)} hash già calcolati.")
+            hashes.update(reused)
+        
+        def hash_file(path: Path) -> str:
+            if self.out_of_time():
+                return ""  # i file restanti vengono saltati senza leggerli
+            file_hash = self.calculate_file_hash(path, 'md5')
+            if file_hash and self.checkpoint is not None:
+                self.checkpoint.record_digest(path, file_hash)
+            if file_hash and self.sidecars is not None:
+                self.sidecars.record_digest(path, file_hash)
+            return file_hash
+        
+        # Calcola hash MD5 con code separate per dispositivo fisico
+        hashes.update(self.io_scheduler.run(
+            [path for path in paths if path not in hashes],
+            hash_file,
+            progress_callback=progress_callback
+        ))
+        if self.checkpoint is not None:
+            self.checkpoint.flush()
+        if self.sidecars is not None:
+            written = self.sidecars.flush()
+            if written:
+                self.log(f"Aggiornati {written} file {SIDECAR_NAME}")
+        return hashes
+    
+    def manifest_records(self, host: Optional[str] = None) -> List[ManifestRecord]:
+        """Record (dimensione, hash, host, percorso) di tutti i file trovati."""
+        host = host or socket.gethostname()
+        records = []
+        for img_path, file_hash in self.hash_all_files().items():
+            if not file_hash:
+                continue
+            try:
+                size = img_path.stat().st_size
+            except OSError as e:
+                self.log(f"Impossibile leggere {img_path}: {e}")
+                continue
+            records.append(ManifestRecord(size, file_hash, host, str(img_path.resolve())))
+        return records
+    
+    def export_manifest(self, output_path: Path, host: Optional[str] = None) -> int:
+        """
+        Esporta il manifest binario (record a larghezza fissa ordinati per dimensione e hash).
+        
+        Returns:
+            Numero di file esportati
+        """
+        host = host or socket.gethostname()
+        return write_binary_manifest(output_path, self.manifest_records(host), host)
+    
+    def index_reference(self, root: Path, reference: ReferenceIndex) -> Tuple[int, int]:
+        """
+        Indicizza (o aggiorna) una radice di riferimento.
+        
+        Gli hash dei file con dimensione e mtime invariati vengono ripresi
+        dall'indice; si leggono solo i file nuovi o modificati.
+        
+        Returns:
+            (file indicizzati, hash calcolati)
+        """
+        root_key = str(root.resolve())
+        stored = reference.stored_entries(root_key)
+        self.scan_directory(root)
+        
+        entries = []
+        to_hash = []
+        for img_path in self.image_paths:
+            signature = file_signature(img_path)
+            if signature is None:
+                continue
+            path_key = str(img_path.resolve())
+            previous = stored.get(path_key)
+            if previous is not None and previous[:2] == signature:
+                entries.append((path_key, signature[0], signature[1], previous[2]))
+            else:
+                to_hash.append(img_path)
+        
+        hashes = self.hash_all_files(to_hash) if to_hash else {}
+        for img_path, file_hash in hashes.items():
+            signature = file_signature(img_path)
+            if file_hash and signature is not None:
+                entries.append((str(img_path.resolve()), signature[0], signature[1], file_hash))
+        
+        reference.update_root(root_key, entries)
+        return len(entries), len(to_hash)
+    
+    def check_against_reference(self, reference: ReferenceIndex,
+                                roots: Sequence[Path]) -> Dict[Path, List[str]]:
+        """
+        Confronta i file trovati con l'indice di riferimento.
+        
+        Si calcola l'hash solo dei file con una dimensione presente nel
+        riferimento; i file di riferimento non vengono mai proposti per la
+        rimozione (anche se una radice candidata sta dentro una radice di
+        riferimento) e non vengono confrontati con se stessi.
+        Le radici candidate vengono risolte una sola volta: l'indice viene
+        interrogato per singolo file solo per i file sotto una radice di
+        riferimento.
+        
+        Args:
+            reference: Indice di riferimento
+            roots: Radici candidate scansionate (in self.image_paths)
+        
+        Returns:
+            {file candidato: percorsi di riferimento identici}
+        """
+        reference_roots = [root.rstrip(os.sep) + os.sep for root, _, _ in reference.roots()]
+        scanned = [(Path(root), Path(root).resolve()) for root in roots]
+        
+        def resolve(img_path: Path) -> str:
+            for root, root_resolved in scanned:
+                if img_path.parts[:len(root.parts)] == root.parts:
+                    return str(root_resolved.joinpath(*img_path.parts[len(root.parts):]))
+            return str(img_path.resolve())  # file fuori dalle radici indicate
+        
+        sizes: Dict[Path, int] = {}
+        resolved: Dict[Path, str] = {}
+        self.reference_members = []
+        for img_path in self.image_paths:
+            resolved[img_path] = resolve(img_path)
+            if (any(resolved[img_path].startswith(root) for root in reference_roots)
+                    and reference.is_indexed(resolved[img_path])):
+                self.reference_members.append(img_path)
+                continue
+            signature = file_signature(img_path)
+            if signature is not None and reference.has_size(signature[0]):
+                sizes[img_path] = signature[0]
+        if self.reference_members:
+            print(f"File che fanno già parte del riferimento (ignorati): {len(self.reference_members)}")
+        print(f"File con dimensione presente nel riferimento: {len(sizes)} su {len(self.image_paths)}")
+        
+        matches: Dict[Path, List[str]] = {}
+        if not sizes:
+            return matches
+        hashes = self.hash_all_files(list(sizes))
+        # I negativi certi del filtro di Bloom non interrogano l'indice
+        bloom = reference.membership_filter()
+        false_positives = 0
+        for img_path in self.image_paths:
+            file_hash = hashes.get(img_path)
+            if not file_hash or digest_key(sizes[img_path], file_hash) not in bloom:
+                continue
+            reference_paths = [path for path in reference.lookup(sizes[img_path], file_hash)
+                               if path != resolved[img_path]]
+            if reference_paths:
+                matches[img_path] = reference_paths
+            else:
+                false_positives += 1
+        self.log(f"Filtro di Bloom: {len(hashes) - len(matches) - false_positives} negativi certi, "
+                 f"{false_positives} falsi positivi")
+        return matches
     
     def find_duplicates_by_hash(self) -> None:
         """Trova duplicati basandosi sull'hash del file."""
-        print("Calcolando hash dei file...")
+        if self.time_budget is not None and self.time_budget.deadline is not None:
+            # Con un tempo massimo si segue la cascata a priorità
+            self.find_duplicates_largest_first()
+            return
         
-        for i, img_path in enumerate(self.image_paths):
-            if i % 10 == 0:  # Progress indicator
-                print(f"Progresso: {i}/{len(self.image_paths)}")
-            
-            # Calcola hash MD5
-            file_hash = self.calculate_file_hash(img_path, 'md5')
+        hashes = self.hash_all_files()
+        
+        # Mantiene l'ordine di scansione all'interno dei gruppi
+        for img_path in self.image_paths:
+            file_hash = hashes.get(img_path)
             if file_hash:
                 self.file_hashes[file_hash].append(img_path)
         
@@ -186,6 +647,331 @@ class ImageDuplicateFinder:
         
         print(f"Trovati {len(self.duplicates)} gruppi di duplicati basati su hash.")
     
+    def size_buckets(self) -> List[Tuple[int, List[Path]]]:
+        """
+        File raggruppati per dimensione, solo le dimensioni con almeno due file.
+        
+        Returns:
+            Lista (dimensione, file) in ordine decrescente di spazio
+            potenzialmente recuperabile, dimensione × (file − 1)
+        """
+        by_size: Dict[int, List[Path]] = defaultdict(list)
+        for img_path in self.image_paths:
+            try:
+                by_size[img_path.stat().st_size].append(img_path)
+            except OSError as e:
+                self.log(f"Impossibile leggere {img_path}: {e}")
+        buckets = [(size, paths) for size, paths in by_size.items() if len(paths) > 1]
+        buckets.sort(key=lambda bucket: bucket[0] * (len(bucket[1]) - 1), reverse=True)
+        return buckets
+    
+    def _publish_group(self, file_hash: str, paths: List[Path], size: int,
+                       on_group: Optional[Callable[[str, List[Path], int], None]]) -> None:
+        """Registra un gruppo confermato e lo notifica subito."""
+        self.duplicates[file_hash] = paths
+        reclaimable = size * (len(paths) - 1)
+        with self._top_lock:
+            entry = (reclaimable, -len(self.duplicates), file_hash)
+            if len(self._top_groups) < self.TOP_GROUPS:
+                heapq.heappush(self._top_groups, entry)
+            elif entry > self._top_groups[0]:
+                heapq.heapreplace(self._top_groups, entry)
+        if on_group is not None:
+            on_group(file_hash, paths, size)
+    
+    def top_groups(self, count: Optional[int] = None) -> List[Tuple[str, List[Path], int]]:
+        """
+        Gruppi confermati finora con più spazio recuperabile (utilizzabile in qualsiasi momento).
+        
+        Returns:
+            Lista (hash, file, byte recuperabili) in ordine decrescente
+        """
+        with self._top_lock:
+            entries = sorted(self._top_groups, reverse=True)
+        return [(file_hash, list(self.duplicates.get(file_hash, [])), reclaimable)
+                for reclaimable, _, file_hash in entries[:count]]
+    
+    def _batches(self, buckets: List[Tuple[int, List[Path]]]):
+        """Suddivide i gruppi di candidati (già ordinati) in lotti di lavoro."""
+        batch: List[Tuple[int, List[Path]]] = []
+        batch_files = batch_bytes = 0
+        for size, paths in buckets:
+            batch.append((size, paths))
+            batch_files += len(paths)
+            batch_bytes += size * len(paths)
+            if batch_files >= self.PRIORITY_BATCH_FILES or batch_bytes >= self.PRIORITY_BATCH_BYTES:
+                yield batch
+                batch, batch_files, batch_bytes = [], 0, 0
+        if batch:
+            yield batch
+    
+    def _partial_hash_stage(self, buckets: List[Tuple[int, List[Path]]]) -> List[Tuple[int, List[Path]]]:
+        """
+        Divide i gruppi di stessa dimensione con l'hash parziale (lettura di pochi KB per file).
+        
+        Returns:
+            Candidati (dimensione, file) rimasti, in ordine di spazio recuperabile;
+            i gruppi non raggiunti entro il tempo massimo finiscono in self.unverified
+        """
+        small = [(size, paths) for size, paths in buckets if size <= 2 * self.PARTIAL_HASH_BYTES]
+        large = [(size, paths) for size, paths in buckets if size > 2 * self.PARTIAL_HASH_BYTES]
+        if not large:
+            return buckets
+        print(f"Calcolando hash parziali di {sum(len(paths) for _, paths in large)} file grandi...")
+        
+        candidates = list(small)
+        for batch in self._batches(large):
+            if self.out_of_time():
+                self.unverified.extend(UnverifiedCandidate(STAGE_SIZE, size, paths) for size, paths in batch)
+                continue
+            paths = [path for _, bucket in batch for path in bucket]
+            partial = self.io_scheduler.run(
+                paths, lambda path: "" if self.out_of_time() else self.calculate_partial_hash(path))
+            for size, bucket in batch:
+                if any(not partial.get(path) for path in bucket) and self.out_of_time():
+                    self.unverified.append(UnverifiedCandidate(STAGE_SIZE, size, bucket))
+                    continue
+                by_partial: Dict[str, List[Path]] = defaultdict(list)
+                for path in bucket:
+                    if partial.get(path):
+                        by_partial[partial[path]].append(path)
+                candidates.extend((size, group) for group in by_partial.values() if len(group) > 1)
+        
+        candidates.sort(key=lambda bucket: bucket[0] * (len(bucket[1]) - 1), reverse=True)
+        return candidates
+    
+    def find_duplicates_largest_first(
+            self, on_group: Optional[Callable[[str, List[Path], int], None]] = None) -> None:
+        """
+        Trova i duplicati confermando prima i gruppi con più spazio recuperabile.
+        
+        I file con dimensione unica non vengono letti; i gruppi di stessa
+        dimensione vengono elaborati a lotti in ordine di dimensione × (file − 1)
+        e ogni gruppo confermato viene pubblicato subito (on_group e top_groups).
+        Con un tempo massimo, prima di leggere i file per intero si applica a
+        tutti i candidati l'hash parziale (lavoro economico e molto selettivo);
+        alla scadenza ci si ferma tra un file e l'altro e i candidati non
+        verificati vengono registrati in self.unverified.
+        
+        Args:
+            on_group: Chiamata con (hash, file, dimensione) per ogni gruppo confermato
+        """
+        candidates = self.size_buckets()
+        stage = STAGE_SIZE
+        if self.time_budget is not None and self.time_budget.deadline is not None:
+            candidates = self._partial_hash_stage(candidates)
+            stage = STAGE_PARTIAL_HASH
+        total = sum(len(paths) for _, paths in candidates)
+        print(f"Calcolando hash di {total} file in {len(candidates)} gruppi di candidati "
+              f"(prima il maggiore spazio recuperabile)...")
+        
+        done = 0
+        for batch in self._batches(candidates):
+            if self.out_of_time():
+                self.unverified.extend(UnverifiedCandidate(stage, size, paths) for size, paths in batch)
+                continue
+            hashes = self._hash_paths([path for _, paths in batch for path in paths])
+            done += len(hashes)
+            for size, paths in batch:
+                by_hash: Dict[str, List[Path]] = defaultdict(list)
+                for path in paths:
+                    if hashes.get(path):
+                        by_hash[hashes[path]].append(path)
+                for file_hash, group in by_hash.items():
+                    self.file_hashes[file_hash].extend(group)
+                    if len(group) > 1:
+                        self._publish_group(file_hash, group, size, on_group)
+                if sum(map(len, by_hash.values())) < len(paths) and self.out_of_time():
+                    # Hash interrotti dalla scadenza: il gruppo non è risolto del tutto
+                    self.unverified.append(UnverifiedCandidate(STAGE_HASH, size, paths))
+            print(f"Progresso: {done}/{total}")
+        
+        print(f"Trovati {len(self.duplicates)} gruppi di duplicati basati su hash.")
+        if self.unverified:
+            print(f"⏱️  Candidati non verificati: {len(self.unverified)} gruppi.")
+    
+    def estimate_duplicates(self, sample_fraction: float = DEFAULT_SAMPLE_FRACTION,
+                            seed: Optional[int] = None) -> DuplicateEstimate:
+        """
+        Stima duplicati e spazio recuperabile leggendo solo un campione di file.
+        
+        Lo stat riguarda tutti i file trovati, gli hash solo i gruppi di stessa
+        dimensione estratti nel campione stratificato (vedi estimator.py).
+        """
+        sizes: Dict[Path, int] = {}
+        for img_path in self.image_paths:
+            try:
+                sizes[img_path] = img_path.stat().st_size
+            except OSError as e:
+                self.log(f"Impossibile leggere {img_path}: {e}")
+        print(f"Stima a campione ({sample_fraction:.0%} dei byte candidati)...")
+        return estimate_duplicates(sizes, self._hash_paths, sample_fraction, seed, self.log)
+    
+    def find_duplicate_directories(self, min_ratio: float = DEFAULT_MIN_RATIO) -> DirectoryAnalysis:
+        """
+        Raggruppa le directory identiche o quasi duplicate a partire dagli hash dei file.
+        
+        Va chiamato dopo find_duplicates_by_hash; il costo è lineare nel
+        numero di file (nessuna lettura oltre allo stat per la dimensione).
+        """
+        known = {path: file_hash for file_hash, paths in self.file_hashes.items() for path in paths}
+        digests: Dict[Path, str] = {}
+        sizes: Dict[Path, int] = {}
+        for path in self.image_paths:
+            metadata = self.file_catalog.get(path)
+            if metadata is not None and metadata.get('size'):
+                sizes[path] = metadata['size']
+            else:
+                try:
+                    sizes[path] = path.stat().st_size
+                except OSError as e:
+                    self.log(f"Impossibile leggere {path}: {e}")
+                    continue
+            # I file con dimensione unica (non letti) sono comunque unici
+            digests[path] = known.get(path) or f"unico:{path}"
+        
+        self.directory_analysis = analyze_directories(digests, sizes, min_ratio)
+        print(f"Trovati {len(self.directory_analysis.duplicate_groups)} gruppi di directory identiche "
+              f"e {len(self.directory_analysis.partial_duplicates)} directory quasi duplicate.")
+        return self.directory_analysis
+    
+    def find_burst_groups(self, window: float = DEFAULT_BURST_WINDOW,
+                          max_distance: int = DEFAULT_BURST_DISTANCE) -> List[BurstGroup]:
+        """
+        Raggruppa raffiche e scatti simili confrontando il dhash solo tra foto
+        della stessa fotocamera scattate entro window secondi.
+        
+        Legge data EXIF e modello dall'intestazione di tutti i file, ma
+        decodifica solo quelli con almeno un vicino nella finestra.
+        """
+        if not PIL_AVAILABLE:
+            self.log("Pillow non disponibile, salto la ricerca delle raffiche.")
+            self.burst_groups = []
+            return self.burst_groups
+        
+        self.prefetch_metadata(self.image_paths)
+        index = build_time_index(
+            (path, self.file_catalog[path]['exif_date'], self.file_catalog[path]['camera_model'])
+            for path in self.image_paths
+        )
+        dated = sum(len(shots) for shots in index.values())
+        candidates = burst_candidates(index, window)
+        print(f"Raffiche: {dated} foto con data EXIF, {len(candidates)} con scatti vicini "
+              f"(finestra di {window:g} s)")
+        self.extract_features_batch(candidates)
+        
+        def perceptual_hash(path: Path) -> Optional[str]:
+            features = self.get_image_features(path)
+            return features['dhash'] if features else None
+        
+        self.burst_groups, comparisons = find_bursts(index, perceptual_hash, hamming_distance,
+                                                     window, max_distance)
+        self.log(f"Raffiche: {comparisons} confronti di dhash")
+        print(f"Trovati {len(self.burst_groups)} gruppi di scatti simili.")
+        return self.burst_groups
+    
+    def find_rotated_duplicates(self, max_distance: int = DEFAULT_ROTATION_DISTANCE) -> List[List[Path]]:
+        """
+        Raggruppa le immagini uguali a meno di rotazioni di 90° e ribaltamenti.
+        
+        Usa gli hash delle 8 trasformazioni diedrali del record delle feature
+        (una decodifica per file, le trasformazioni solo sulla copia ridotta). I gruppi con pixel tutti
+        identici non vengono riportati: sono già duplicati esatti.
+        """
+        if not PIL_AVAILABLE:
+            self.log("Pillow non disponibile, salto la ricerca delle copie ruotate.")
+            self.rotation_groups = []
+            return self.rotation_groups
+        
+        print(f"Ricerca di copie ruotate o ribaltate su {len(self.image_paths)} immagini...")
+        self.extract_features_batch(self.image_paths)
+        hashes = {}
+        for path in self.image_paths:
+            features = self.get_image_features(path)
+            if features:
+                hashes[path] = features['dihedral_dhash']
+        
+        groups, comparisons = group_similar_hashes(hashes, max_distance)
+        self.log(f"Copie ruotate: {comparisons} confronti di hash canonici")
+        self.rotation_groups = [
+            group for group in groups
+            if len({self.file_catalog[path]['features']['pixel_digest'] for path in group}) > 1
+        ]
+        print(f"Trovati {len(self.rotation_groups)} gruppi di quasi duplicati (anche ruotati o ribaltati).")
+        return self.rotation_groups
+    
+    def print_rotation_results(self) -> None:
+        """Stampa i gruppi di quasi duplicati indipendenti dall'orientamento."""
+        if self.rotation_groups is None:
+            return
+        if not self.rotation_groups:
+            print("\n🔄 Nessuna copia ruotata o ribaltata.")
+            return
+        
+        print(f"\n🔄 QUASI DUPLICATI (ANCHE RUOTATI O RIBALTATI):")
+        print("=" * 80)
+        for i, group in enumerate(self.rotation_groups, 1):
+            print(f"\n🖼️  Gruppo {i}: {len(group)} immagini")
+            for j, path in enumerate(group, 1):
+                dimensions = self.file_catalog[path]['dimensions']
+                size = f" ({dimensions[0]}x{dimensions[1]})" if dimensions else ""
+                print(f"   {j}. {path}{size}")
+        
+        print("\n" + "=" * 80)
+        print(f"   • Gruppi di quasi duplicati: {len(self.rotation_groups)}")
+        print(f"   • Immagini coinvolte: {sum(len(group) for group in self.rotation_groups)}")
+    
+    def print_burst_results(self) -> None:
+        """Stampa i gruppi di scatti simili in ordine di data."""
+        if self.burst_groups is None:
+            return
+        if not self.burst_groups:
+            print("\n📸 Nessuna raffica o scatto simile.")
+            return
+        
+        print(f"\n📸 RAFFICHE E SCATTI SIMILI:")
+        print("=" * 80)
+        for i, group in enumerate(self.burst_groups, 1):
+            print(f"\n🎞️  Gruppo {i}: {len(group.paths)} scatti, {group.camera}, "
+                  f"{group.start:%Y-%m-%d %H:%M:%S} ({group.duration:.0f} s)")
+            for j, path in enumerate(group.paths, 1):
+                print(f"   {j}. {path}")
+        
+        print("\n" + "=" * 80)
+        print(f"   • Gruppi di scatti simili: {len(self.burst_groups)}")
+        print(f"   • Scatti coinvolti: {sum(len(group.paths) for group in self.burst_groups)}")
+        print("   Sono foto diverse ma quasi uguali: scegliere a mano quali tenere.")
+    
+    def print_directory_results(self) -> None:
+        """Stampa le directory identiche e quasi duplicate."""
+        analysis = self.directory_analysis
+        if analysis is None:
+            return
+        if not analysis.duplicate_groups and not analysis.partial_duplicates:
+            print("\n📂 Nessuna directory duplicata.")
+            return
+        
+        print(f"\n📂 DIRECTORY DUPLICATE:")
+        print("=" * 80)
+        for i, group in enumerate(analysis.duplicate_groups, 1):
+            print(f"\n🗂️  Gruppo {i}: {len(group.directories)} directory identiche "
+                  f"({group.file_count} immagini, {group.size:,} bytes ciascuna)")
+            print(f"   Spazio recuperabile: {group.reclaimable:,} bytes")
+            for j, directory in enumerate(group.directories, 1):
+                print(f"   {j}. {directory}")
+        
+        for entry in analysis.partial_duplicates:
+            print(f"\n🗂️  Quasi duplicata ({entry.ratio:.0%} presente altrove): {entry.directory}")
+            print(f"   {entry.file_count} immagini, {entry.size:,} bytes, "
+                  f"recuperabili {entry.reclaimable:,} bytes")
+        
+        reclaimable = sum(group.reclaimable for group in analysis.duplicate_groups)
+        print("\n" + "=" * 80)
+        print(f"   • Gruppi di directory identiche: {len(analysis.duplicate_groups)}")
+        print(f"   • Directory quasi duplicate: {len(analysis.partial_duplicates)}")
+        print(f"   • Spazio recuperabile eliminando le copie identiche: {reclaimable:,} bytes "
+              f"({reclaimable/1024/1024:.2f} MB)")
+    
     def verify_duplicates_with_pixel_comparison(self) -> None:
         """Verifica i duplicati con confronto pixel per pixel."""
         if not PIL_AVAILABLE:
@@ -193,29 +979,68 @@ class ImageDuplicateFinder:
             return
         
         print("Verificando duplicati con confronto pixel...")
-        verified_duplicates = {}
         
+        # Ogni file viene decodificato una sola volta, in parallelo
+        skipped = set()
+        if self.time_budget is None:
+            self.extract_features_batch()
+        else:
+            # A lotti, per fermarsi alla scadenza: i gruppi non raggiunti
+            # restano confermati dall'hash (contenuto identico byte per byte)
+            skipped = set(self.duplicates)
+            batch: List[str] = []
+            for file_hash in list(self.duplicates) + [None]:
+                if file_hash is not None:
+                    batch.append(file_hash)
+                    if sum(len(self.duplicates[h]) for h in batch) < self.PRIORITY_BATCH_FILES:
+                        continue
+                if not batch or self.out_of_time():
+                    break
+                self.extract_features_batch([path for h in batch for path in self.duplicates[h]])
+                skipped.difference_update(batch)
+                batch = []
+            if skipped:
+                print(f"⏱️  Tempo esaurito: {len(skipped)} gruppi non verificati pixel per pixel "
+                      f"(restano confermati dall'hash).")
+        
+        verified_duplicates = {}
+        hash_only = 0
         for file_hash, paths in self.duplicates.items():
             if len(paths) < 2:
                 continue
+            if file_hash in skipped:
+                verified_duplicates[file_hash] = paths
+                continue
             
-            # Confronta ogni coppia nel gruppo
-            verified_group = []
-            for i, path1 in enumerate(paths):
-                is_duplicate = False
-                for j, path2 in enumerate(paths):
-                    if i != j and self.compare_images_pixel_by_pixel(path1, path2):
-                        is_duplicate = True
-                        break
-                
-                if is_duplicate and path1 not in verified_group:
-                    verified_group.append(path1)
+            # Raggruppa per digest dei pixel: equivale al confronto di ogni coppia
+            digests = {}
+            for path in paths:
+                features = self.get_image_features(path)
+                if features:
+                    digests[path] = features['pixel_digest']
+            
+            # I file in quarantena non si decodificano: il gruppo resta confermato dall'hash
+            quarantined = [path for path in paths if path not in digests and self.quarantine.contains(path)]
+            if quarantined:
+                group = [path for path in paths if path in digests or path in quarantined]
+                if len(group) > 1:
+                    verified_duplicates[file_hash] = group
+                    hash_only += 1
+                continue
+            
+            digest_counts = defaultdict(int)
+            for digest in digests.values():
+                digest_counts[digest] += 1
+            verified_group = [path for path in paths
+                              if path in digests and digest_counts[digests[path]] > 1]
             
             if len(verified_group) > 1:
                 verified_duplicates[file_hash] = verified_group
         
         self.duplicates = verified_duplicates
         print(f"Verificati {len(self.duplicates)} gruppi di duplicati reali.")
+        if hash_only:
+            print(f"{hash_only} gruppi con file in quarantena confermati solo dall'hash.")
     
     def print_results(self) -> None:
         """Stampa i risultati della ricerca duplicati."""
@@ -229,13 +1054,16 @@ class ImageDuplicateFinder:
         total_duplicates = 0
         total_wasted_space = 0
         
+        # Metadati letti una sola volta, in parallelo, per tutti i gruppi
+        self.prefetch_metadata()
+        
         for i, (file_hash, paths) in enumerate(self.duplicates.items(), 1):
             print(f"\n🔍 Gruppo {i} ({len(paths)} immagini duplicate):")
             print(f"   Hash: {file_hash}")
             
             # Calcola spazio sprecato (mantieni solo la prima, elimina le altre)
             if paths:
-                first_file_size = paths[0].stat().st_size
+                first_file_size = self.get_image_metadata(paths[0])['size']
                 wasted_space = first_file_size * (len(paths) - 1)
                 total_wasted_space += wasted_space
                 
@@ -258,6 +1086,27 @@ class ImageDuplicateFinder:
         print(f"   • Gruppi di duplicati: {len(self.duplicates)}")
         print(f"   • Immagini duplicate da rimuovere: {total_duplicates}")
         print(f"   • Spazio totale recuperabile: {total_wasted_space:,} bytes ({total_wasted_space/1024/1024:.2f} MB)")
+        self.print_unverified()
+    
+    def unverified_summary(self) -> Dict[str, int]:
+        """Numero di gruppi e di file non verificati per fase."""
+        summary: Dict[str, int] = defaultdict(int)
+        for candidate in self.unverified:
+            summary[candidate.stage] += len(candidate.paths)
+        return dict(summary)
+    
+    def print_unverified(self) -> None:
+        """Riepiloga i candidati rimasti non verificati allo scadere del tempo."""
+        if not self.unverified:
+            return
+        print(f"\n⏱️  RISULTATO PARZIALE (tempo esaurito dopo {self.time_budget.elapsed():.0f} s):")
+        for stage, count in self.unverified_summary().items():
+            what = "directory non visitate" if stage == STAGE_SCAN else f"file fermi alla fase '{stage}'"
+            print(f"   • {count} {what}")
+        reclaimable = sum(candidate.size * (len(candidate.paths) - 1)
+                          for candidate in self.unverified if candidate.stage != STAGE_SCAN)
+        print(f"   • Spazio potenzialmente recuperabile non verificato: fino a {reclaimable:,} bytes")
+        print("   I gruppi elencati sopra sono confermati; l'elenco completo è nel report (--output).")
         
     def save_results_to_file(self, output_file: Path) -> None:
         """Salva i risultati in un file di testo."""
@@ -273,12 +1122,531 @@ class ImageDuplicateFinder:
                 for path in paths:
                     f.write(f"  - {path}\n")
                 f.write("\n")
+            
+            if self.unverified:
+                f.write("CANDIDATI NON VERIFICATI (tempo esaurito)\n")
+                f.write("=" * 50 + "\n")
+                for candidate in self.unverified:
+                    f.write(f"Fase: {candidate.stage} - dimensione {candidate.size} bytes\n")
+                    for path in candidate.paths:
+                        f.write(f"  ? {path}\n")
+                    f.write("\n")
+            
+            if self.directory_analysis is not None:
+                f.write("DIRECTORY DUPLICATE\n")
+                f.write("=" * 50 + "\n")
+                for i, group in enumerate(self.directory_analysis.duplicate_groups, 1):
+                    f.write(f"Directory identiche {i} - {group.file_count} immagini, "
+                            f"recuperabili {group.reclaimable} bytes\n")
+                    for directory in group.directories:
+                        f.write(f"  - {directory}\n")
+                    f.write("\n")
+                for entry in self.directory_analysis.partial_duplicates:
+                    f.write(f"Quasi duplicata ({entry.ratio:.0%}) - {entry.directory} - "
+                            f"recuperabili {entry.reclaimable} bytes\n")
+            
+            if self.rotation_groups:
+                f.write("\nQUASI DUPLICATI (ANCHE RUOTATI O RIBALTATI)\n")
+                f.write("=" * 50 + "\n")
+                for i, group in enumerate(self.rotation_groups, 1):
+                    f.write(f"Quasi duplicati {i}\n")
+                    for path in group:
+                        f.write(f"  ~ {path}\n")
+                    f.write("\n")
+            
+            if self.burst_groups:
+                f.write("\nRAFFICHE E SCATTI SIMILI\n")
+                f.write("=" * 50 + "\n")
+                for i, group in enumerate(self.burst_groups, 1):
+                    f.write(f"Raffica {i} - {group.camera} - "
+                            f"{group.start:%Y-%m-%d %H:%M:%S} ({group.duration:.0f} s)\n")
+                    for path in group.paths:
+                        f.write(f"  ~ {path}\n")
+                    f.write("\n")
         
         print(f"📄 Risultati salvati in: {output_file}")
 
 
+def add_scan_arguments(parser: argparse.ArgumentParser) -> None:
+    """Opzioni comuni per le regole di scansione."""
+    parser.add_argument(
+        '--exclude',
+        action='append',
+        default=[],
+        metavar='GLOB',
+        help='Escludi file o directory (ripetibile, es. --exclude "Temp*" --exclude "raw/*")'
+    )
+    
+    parser.add_argument(
+        '--include',
+        action='append',
+        default=[],
+        metavar='GLOB',
+        help='Considera solo i file corrispondenti (ripetibile, es. --include "IMG_*")'
+    )
+    
+    parser.add_argument(
+        '--min-size',
+        type=int,
+        default=0,
+        help='Ignora i file più piccoli di questa dimensione in byte'
+    )
+    
+    parser.add_argument(
+        '--max-size',
+        type=int,
+        default=None,
+        help='Ignora i file più grandi di questa dimensione in byte'
+    )
+    
+    parser.add_argument(
+        '--no-default-excludes',
+        action='store_true',
+        help='Non escludere .git, node_modules, @eaDir, .thumbnails e le cartelle cestino'
+    )
+
+
+def add_resource_arguments(parser: argparse.ArgumentParser) -> None:
+    """Opzioni comuni per i limiti di risorse e la concorrenza."""
+    parser.add_argument(
+        '--max-bytes-per-sec',
+        type=float,
+        default=0,
+        help='Limite di lettura in byte/s per non saturare il disco (0 = illimitato)'
+    )
+    
+    parser.add_argument(
+        '--max-iops',
+        type=float,
+        default=0,
+        help='Limite di operazioni di I/O al secondo (0 = illimitato)'
+    )
+    
+    parser.add_argument(
+        '--cpu-share',
+        type=float,
+        default=1.0,
+        help='Quota di CPU per worker, tra 0.05 e 1.0 (1.0 = illimitato)'
+    )
+    
+    parser.add_argument(
+        '--no-autotune',
+        action='store_true',
+        help='Disattiva l\'auto-tuning della concorrenza (usa limiti fissi per dispositivo)'
+    )
+
+
+def add_sidecar_argument(parser: argparse.ArgumentParser) -> None:
+    """Opzione per gli indici sidecar per directory."""
+    parser.add_argument(
+        '--sidecar',
+        action='store_true',
+        help=f'Riusa e aggiorna i file {SIDECAR_NAME} in ogni directory (utile per i dischi esterni)'
+    )
+
+
+def build_scan_filter(args: argparse.Namespace) -> ScanFilter:
+    """Crea le regole di scansione dalle opzioni della riga di comando."""
+    return ScanFilter(include=args.include, exclude=args.exclude,
+                      min_size=args.min_size, max_size=args.max_size,
+                      use_default_excludes=not args.no_default_excludes)
+
+
+def build_throttle(args: argparse.Namespace) -> ResourceThrottle:
+    """Crea il limitatore di risorse dalle opzioni della riga di comando."""
+    return ResourceThrottle(args.max_bytes_per_sec, args.max_iops, args.cpu_share)
+
+
+def run_index(argv: List[str]) -> None:
+    """Comando index: scansiona una directory locale e scrive il manifest degli hash."""
+    parser = argparse.ArgumentParser(
+        prog='image_duplicate_finder.py index',
+        description='Crea il manifest ordinato (dimensione, hash, host, percorso) di una directory locale'
+    )
+    parser.add_argument('directory', type=str, help='Percorso della cartella da indicizzare')
+    parser.add_argument('--output', '-o', type=str, required=True, help='File manifest da scrivere')
+    parser.add_argument('--host', type=str, default=None,
+                        help='Nome host registrato nel manifest (default: nome della macchina)')
+    parser.add_argument('--binary', action='store_true',
+                        help='Scrive il manifest binario usato dal comando diff')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Abilita output dettagliato')
+    add_resource_arguments(parser)
+    add_scan_arguments(parser)
+    add_sidecar_argument(parser)
+    args = parser.parse_args(argv)
+    
+    directory = Path(args.directory)
+    if not directory.is_dir():
+        print(f"❌ Errore: Directory non trovata: {directory}")
+        sys.exit(1)
+    
+    finder = ImageDuplicateFinder(verbose=args.verbose, throttle=build_throttle(args),
+                                  autotune=not args.no_autotune,
+                                  scan_filter=build_scan_filter(args), sidecars=args.sidecar)
+    try:
+        finder.scan_directory(directory)
+        if args.binary:
+            count = finder.export_manifest(Path(args.output), args.host)
+        else:
+            count = write_manifest(Path(args.output), finder.manifest_records(args.host),
+                                   root=str(directory.resolve()))
+        print(f"✅ Manifest scritto: {args.output} ({count} file)")
+    except KeyboardInterrupt:
+        print("\n❌ Operazione annullata dall'utente.")
+        sys.exit(1)
+    finally:
+        finder.close()
+
+
+def report_groups(groups: Iterable[List[ManifestRecord]], output_file: Optional[str] = None,
+                  summary: Optional[List[str]] = None) -> None:
+    """Stampa (e salva) in streaming i gruppi di duplicati provenienti da manifest."""
+    output = open(output_file, 'w', encoding='utf-8') if output_file else None
+    
+    def emit(line: str = '') -> None:
+        print(line)
+        if output:
+            output.write(line + '\n')
+    
+    count = duplicates = reclaimable = 0
+    try:
+        for records in groups:
+            count += 1
+            duplicates += len(records) - 1
+            reclaimable += records[0].size * (len(records) - 1)
+            emit(f"📁 Gruppo {count} - {len(records)} file da {records[0].size:,} bytes "
+                 f"(hash: {records[0].digest[:16]}...)")
+            for i, record in enumerate(records, 1):
+                emit(f"   {i}. {record.host}:{record.path}")
+            emit()
+        
+        emit("=" * 80)
+        emit("📊 RIEPILOGO:")
+        for line in summary or []:
+            emit(f"   • {line}")
+        emit(f"   • Gruppi di duplicati: {count}")
+        emit(f"   • Immagini duplicate da rimuovere: {duplicates}")
+        emit(f"   • Spazio totale recuperabile: {reclaimable:,} bytes ({reclaimable/1024/1024:.2f} MB)")
+    finally:
+        if output:
+            output.close()
+
+
+def run_merge(argv: List[str]) -> None:
+    """Comando merge: unisce i manifest e stampa i gruppi di duplicati globali."""
+    parser = argparse.ArgumentParser(
+        prog='image_duplicate_finder.py merge',
+        description='Unisce i manifest di più server in gruppi di duplicati globali'
+    )
+    parser.add_argument('manifests', nargs='+', type=str, help='Manifest prodotti dal comando index')
+    parser.add_argument('--output', '-o', type=str, help='File di output per salvare i risultati')
+    args = parser.parse_args(argv)
+    
+    try:
+        # Merge in streaming: in memoria resta solo il gruppo corrente
+        report_groups(merge_manifests([Path(p) for p in args.manifests]), args.output,
+                      [f"Manifest uniti: {len(args.manifests)}"])
+    except (OSError, ValueError) as e:
+        print(f"❌ Errore durante l'unione dei manifest: {e}")
+        sys.exit(1)
+
+
+def run_diff(argv: List[str]) -> None:
+    """Comando diff: confronta due manifest binari senza leggere le immagini."""
+    parser = argparse.ArgumentParser(
+        prog='image_duplicate_finder.py diff',
+        description='Confronta due manifest binari: file presenti in entrambi, solo in A, solo in B'
+    )
+    parser.add_argument('manifest_a', type=str, help='Manifest A (es. nuovo disco)')
+    parser.add_argument('manifest_b', type=str, help='Manifest B (es. archivio principale)')
+    parser.add_argument('--output', '-o', type=str,
+                        help='File in cui scrivere l\'elenco (= presente in entrambi, < solo in A, > solo in B)')
+    parser.add_argument('--summary', action='store_true', help='Mostra solo il riepilogo')
+    args = parser.parse_args(argv)
+    
+    try:
+        with BinaryManifest(Path(args.manifest_a)) as manifest_a, \
+                BinaryManifest(Path(args.manifest_b)) as manifest_b:
+            output = open(args.output, 'w', encoding='utf-8') if args.output else None
+            counts = {'match': 0, 'only_a': 0, 'only_b': 0}
+            try:
+                for entry in diff_manifests(manifest_a, manifest_b):
+                    counts[entry.status] += len(entry.indexes_a or entry.indexes_b)
+                    if args.summary and not output:
+                        continue  # solo conteggi: i percorsi non vengono letti
+                    if entry.status == 'match':
+                        match = manifest_b.record(entry.indexes_b[0]).path
+                        lines = [f"=\t{manifest_a.record(k).path}\t{match}" for k in entry.indexes_a]
+                    elif entry.status == 'only_a':
+                        lines = [f"<\t{manifest_a.record(k).path}" for k in entry.indexes_a]
+                    else:
+                        lines = [f">\t{manifest_b.record(k).path}" for k in entry.indexes_b]
+                    for line in lines:
+                        if output:
+                            output.write(line + '\n')
+                        else:
+                            print(line)
+            finally:
+                if output:
+                    output.close()
+        
+        print("📊 RIEPILOGO:")
+        print(f"   • File di A già presenti in B: {counts['match']:,}")
+        print(f"   • File solo in A: {counts['only_a']:,}")
+        print(f"   • File solo in B: {counts['only_b']:,}")
+    except (OSError, ValueError) as e:
+        print(f"❌ Errore durante il confronto dei manifest: {e}")
+        sys.exit(1)
+
+
+def run_ref_add(argv: List[str]) -> None:
+    """Comando ref-add: indicizza una o più radici di riferimento."""
+    parser = argparse.ArgumentParser(
+        prog='image_duplicate_finder.py ref-add',
+        description='Indicizza le radici di riferimento (es. archivio principale) per i controlli ref-check'
+    )
+    parser.add_argument('directories', nargs='*', type=str, help='Radici di riferimento da indicizzare')
+    parser.add_argument('--index', type=str, default=str(DEFAULT_REFERENCE_INDEX),
+                        help=f'Database dell\'indice (default: {DEFAULT_REFERENCE_INDEX})')
+    parser.add_argument('--remove', action='store_true',
+                        help='Toglie le radici indicate dall\'indice invece di indicizzarle')
+    parser.add_argument('--list', action='store_true', help='Elenca le radici indicizzate')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Abilita output dettagliato')
+    add_resource_arguments(parser)
+    add_scan_arguments(parser)
+    add_sidecar_argument(parser)
+    args = parser.parse_args(argv)
+    
+    try:
+        with ReferenceIndex(Path(args.index)) as reference:
+            for directory in map(Path, args.directories):
+                if args.remove:
+                    removed = reference.remove_root(str(directory.resolve()))
+                    print(f"🗑️  Radice rimossa: {directory} ({removed} file)")
+                    continue
+                if not directory.is_dir():
+                    print(f"❌ Errore: Directory non trovata: {directory}")
+                    sys.exit(1)
+                finder = ImageDuplicateFinder(verbose=args.verbose, throttle=build_throttle(args),
+                                              autotune=not args.no_autotune,
+                                              scan_filter=build_scan_filter(args),
+                                              sidecars=args.sidecar)
+                try:
+                    count, hashed = finder.index_reference(directory, reference)
+                finally:
+                    finder.close()
+                print(f"✅ Riferimento indicizzato: {directory} ({count} file, {hashed} hash calcolati)")
+            
+            if args.list or not args.directories:
+                print(f"📚 Indice: {args.index} ({len(reference)} file)")
+                for root, indexed, count in reference.roots():
+                    print(f"   • {root} - {count} file (indicizzata il {indexed})")
+    except KeyboardInterrupt:
+        print("\n❌ Operazione annullata dall'utente.")
+        sys.exit(1)
+    except (OSError, sqlite3.Error) as e:
+        print(f"❌ Errore dell'indice di riferimento: {e}")
+        sys.exit(1)
+
+
+def run_ref_check(argv: List[str]) -> None:
+    """Comando ref-check: indica quali file delle radici candidate sono già nel riferimento."""
+    parser = argparse.ArgumentParser(
+        prog='image_duplicate_finder.py ref-check',
+        description='Controlla le radici candidate (es. /incoming) contro l\'indice di riferimento'
+    )
+    parser.add_argument('directories', nargs='+', type=str, help='Radici candidate da controllare')
+    parser.add_argument('--index', type=str, default=str(DEFAULT_REFERENCE_INDEX),
+                        help=f'Database dell\'indice (default: {DEFAULT_REFERENCE_INDEX})')
+    parser.add_argument('--output', '-o', type=str, help='File di output per salvare i risultati')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Abilita output dettagliato')
+    add_resource_arguments(parser)
+    add_scan_arguments(parser)
+    add_sidecar_argument(parser)
+    args = parser.parse_args(argv)
+    
+    if not Path(args.index).exists():
+        print(f"❌ Errore: Indice di riferimento non trovato: {args.index} (usa prima ref-add)")
+        sys.exit(1)
+    
+    finder = ImageDuplicateFinder(verbose=args.verbose, throttle=build_throttle(args),
+                                  autotune=not args.no_autotune,
+                                  scan_filter=build_scan_filter(args), sidecars=args.sidecar)
+    output = None
+    try:
+        with ReferenceIndex(Path(args.index)) as reference:
+            for directory in map(Path, args.directories):
+                finder.scan_directory(directory)
+            matches = finder.check_against_reference(reference, [Path(d) for d in args.directories])
+        
+        output = open(args.output, 'w', encoding='utf-8') if args.output else None
+        
+        def emit(line: str = '') -> None:
+            print(line)
+            if output:
+                output.write(line + '\n')
+        
+        reclaimable = 0
+        for i, (img_path, reference_paths) in enumerate(matches.items(), 1):
+            size = img_path.stat().st_size
+            reclaimable += size
+            emit(f"📁 {i}. {img_path} ({size:,} bytes)")
+            for reference_path in reference_paths:
+                emit(f"   = {reference_path}")
+        
+        emit("=" * 80)
+        emit("📊 RIEPILOGO:")
+        emit(f"   • File candidati controllati: {len(finder.image_paths)}")
+        emit(f"   • Già presenti nel riferimento (rimovibili): {len(matches)}")
+        emit(f"   • Già parte del riferimento (mai rimovibili): {len(finder.reference_members)}")
+        emit(f"   • File nuovi: {len(finder.image_paths) - len(matches) - len(finder.reference_members)}")
+        emit(f"   • Spazio recuperabile: {reclaimable:,} bytes ({reclaimable/1024/1024:.2f} MB)")
+    except KeyboardInterrupt:
+        print("\n❌ Operazione annullata dall'utente.")
+        sys.exit(1)
+    except (FileNotFoundError, NotADirectoryError) as e:
+        print(f"❌ Errore: {e}")
+        sys.exit(1)
+    except (OSError, sqlite3.Error) as e:
+        print(f"❌ Errore durante il controllo: {e}")
+        sys.exit(1)
+    finally:
+        if output:
+            output.close()
+        finder.close()
+
+
+def _parse_address(address: str, default_host: str) -> Tuple[str, int]:
+    """Converte "host:porta" o ":porta" in tupla (host, porta)."""
+    from distributed import DEFAULT_PORT
+    host, _, port = address.rpartition(':')
+    if not _:
+        host, port = address, ''
+    return host or default_host, int(port) if port else DEFAULT_PORT
+
+
+def run_coordinator(argv: List[str]) -> None:
+    """Comando coordinator: suddivide la scansione tra worker locali o remoti."""
+    from distributed import DEFAULT_PORT, ShardCoordinator
+    
+    parser = argparse.ArgumentParser(
+        prog='image_duplicate_finder.py coordinator',
+        description='Distribuisce la scansione di una directory a più worker (hash dei file)'
+    )
+    parser.add_argument('directory', type=str, help='Percorso della cartella da scansionare')
+    parser.add_argument('--bind', type=str, default=f'127.0.0.1:{DEFAULT_PORT}',
+                        help=f'Indirizzo di ascolto host:porta (default: 127.0.0.1:{DEFAULT_PORT}; '
+                             '0.0.0.0 per i worker remoti)')
+    parser.add_argument('--local-workers', type=int, default=0,
+                        help='Worker da avviare su questa macchina (default: 0)')
+    parser.add_argument('--shard-timeout', type=float, default=None,
+                        help='Secondi massimi per porzione prima della riassegnazione')
+    parser.add_argument('--output', '-o', type=str, help='File di output per salvare i risultati')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Abilita output dettagliato')
+    add_scan_arguments(parser)
+    args = parser.parse_args(argv)
+    
+    directory = Path(args.directory)
+    if not directory.is_dir():
+        print(f"❌ Errore: Directory non trovata: {directory}")
+        sys.exit(1)
+    if args.local_workers <= 0:
+        print("ℹ️  Nessun worker locale: avvia i worker con il comando 'worker'")
+    
+    log = ImageDuplicateFinder(verbose=args.verbose).log
+    coordinator = ShardCoordinator(directory, build_scan_filter(args),
+                                   shard_timeout=args.shard_timeout, log=log)
+    try:
+        host, port = _parse_address(args.bind, '127.0.0.1')
+        groups = coordinator.run(host, port, args.local_workers)
+        report_groups(groups, args.output, [f"Porzioni elaborate: {len(coordinator.completed)}"])
+    except KeyboardInterrupt:
+        print("\n❌ Operazione annullata dall'utente.")
+        sys.exit(1)
+    except (OSError, ValueError) as e:
+        print(f"❌ Errore del coordinatore: {e}")
+        sys.exit(1)
+
+
+def run_worker_command(argv: List[str]) -> None:
+    """Comando worker: elabora le porzioni assegnate da un coordinatore."""
+    from distributed import run_worker
+    
+    parser = argparse.ArgumentParser(
+        prog='image_duplicate_finder.py worker',
+        description='Worker per la scansione distribuita (vedi il comando coordinator)'
+    )
+    parser.add_argument('address', type=str, help='Indirizzo del coordinatore host:porta')
+    parser.add_argument('--name', type=str, default=None, help='Nome del worker nei log')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Abilita output dettagliato')
+    args = parser.parse_args(argv)
+    
+    try:
+        host, port = _parse_address(args.address, '127.0.0.1')
+        run_worker(host, port, args.name, args.verbose)
+    except KeyboardInterrupt:
+        sys.exit(1)
+    except OSError as e:
+        print(f"❌ Impossibile contattare il coordinatore: {e}")
+        sys.exit(1)
+
+
+def print_estimate(estimate: DuplicateEstimate, elapsed: float) -> None:
+    """Stampa il risultato della stima a campione."""
+    mb = 1024 * 1024
+    sampled_share = estimate.sampled_bytes / estimate.total_bytes if estimate.total_bytes else 0
+    print("\n" + "=" * 80)
+    print("📈 STIMA A CAMPIONE (intervalli di confidenza al 95%):")
+    print(f"   • Immagini: {estimate.total_files:,} ({estimate.total_bytes / mb:,.1f} MB)")
+    print(f"   • Con dimensione non unica (candidati): {estimate.candidate_files:,} "
+          f"in {estimate.candidate_buckets:,} gruppi, {estimate.strata} strati")
+    print(f"   • Letti: {estimate.sampled_files:,} file in {estimate.sampled_buckets:,} gruppi "
+          f"({estimate.sampled_bytes / mb:,.1f} MB, {sampled_share:.1%} dei byte) in {elapsed:.1f} s")
+    duplicates, reclaimable = estimate.duplicates, estimate.reclaimable
+    print(f"   • Duplicati da rimuovere stimati: {duplicates.value:,.0f} "
+          f"({duplicates.low:,.0f} – {duplicates.high:,.0f})")
+    print(f"   • Spazio recuperabile stimato: {reclaimable.value / mb:,.1f} MB "
+          f"({reclaimable.low / mb:,.1f} – {reclaimable.high / mb:,.1f} MB)")
+    print(f"   • Limite massimo (tutti i candidati identici): {estimate.upper_bound_bytes / mb:,.1f} MB")
+
+
+def print_confirmed_group(file_hash: str, paths: List[Path], size: int) -> None:
+    """Stampa un gruppo appena confermato (modalità --largest-first)."""
+    print(f"✅ Gruppo confermato: {len(paths)} file da {size:,} bytes, "
+          f"recuperabili {size * (len(paths) - 1):,} bytes")
+    for path in paths:
+        print(f"   - {path}")
+
+
+def print_top_groups(finder: ImageDuplicateFinder, count: int) -> None:
+    """Stampa i gruppi confermati finora con più spazio recuperabile."""
+    top = finder.top_groups(count)
+    if not top:
+        return
+    print(f"\n🏆 MAGGIORI RECUPERI (primi {len(top)} gruppi confermati):")
+    for i, (file_hash, paths, reclaimable) in enumerate(top, 1):
+        print(f"   {i}. {reclaimable:,} bytes - {len(paths)} file (hash: {file_hash[:16]}...)")
+        print(f"      {paths[0]}")
+
+
+# Sottocomandi; senza sottocomando resta valida la forma classica con la sola directory
+SUBCOMMANDS = {
+    'index': run_index,
+    'merge': run_merge,
+    'diff': run_diff,
+    'ref-add': run_ref_add,
+    'ref-check': run_ref_check,
+    'coordinator': run_coordinator,
+    'worker': run_worker_command
+}
+
+
 def main():
     """Funzione principale del programma."""
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        SUBCOMMANDS[sys.argv[1]](sys.argv[2:])
+        return
+    
     parser = argparse.ArgumentParser(
         description='Trova immagini duplicate in una cartella e sottocartelle',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -288,6 +1656,26 @@ Esempi d'uso:
   python image_duplicate_finder.py C:\\MieImmagini --verbose
   python image_duplicate_finder.py C:\\MieImmagini --output report.txt
   python image_duplicate_finder.py C:\\MieImmagini --no-pixel-verify
+  python image_duplicate_finder.py C:\\MieImmagini --max-bytes-per-sec 20000000 --cpu-share 0.5
+  python image_duplicate_finder.py C:\\MieImmagini --resume
+  python image_duplicate_finder.py C:\\MieImmagini --directories
+  python image_duplicate_finder.py C:\\MieImmagini --bursts --burst-window 3
+  python image_duplicate_finder.py C:\\MieImmagini --rotations
+  python image_duplicate_finder.py C:\\MieImmagini --largest-first --top 20
+  python image_duplicate_finder.py C:\\MieImmagini --time-budget 45m --output report.txt
+  python image_duplicate_finder.py C:\\MieImmagini --estimate
+
+Comandi per più server (una directory chiamata come un comando va indicata come .\\index):
+  python image_duplicate_finder.py index D:\\Foto --output server1.manifest
+  python image_duplicate_finder.py merge server1.manifest server2.manifest --output report.txt
+  python image_duplicate_finder.py coordinator D:\\Foto --local-workers 4
+  python image_duplicate_finder.py index E:\\ --binary --output nuovo.idx
+  python image_duplicate_finder.py diff nuovo.idx archivio.idx --output diff.txt
+  python image_duplicate_finder.py worker 192.168.1.10:8765
+
+Libreria di riferimento (indicizzata una volta, poi controlli sui soli file nuovi):
+  python image_duplicate_finder.py ref-add D:\\Archivio
+  python image_duplicate_finder.py ref-check E:\\Incoming --output gia_presenti.txt
         """
     )
     
@@ -315,8 +1703,154 @@ Esempi d'uso:
         help='Salta la verifica pixel per pixel (più veloce ma meno preciso)'
     )
     
+    add_resource_arguments(parser)
+    add_scan_arguments(parser)
+    add_sidecar_argument(parser)
+    
+    parser.add_argument(
+        '--image-cache-mb',
+        type=int,
+        default=256,
+        help='Memoria per la cache delle immagini decodificate, in MB (default: 256, 0 = disattivata)'
+    )
+    
+    parser.add_argument(
+        '--decode-timeout',
+        type=float,
+        default=DEFAULT_DECODE_TIMEOUT,
+        help=f'Secondi massimi di decodifica per file (default: {DEFAULT_DECODE_TIMEOUT:.0f}, 0 = nessun limite)'
+    )
+    
+    parser.add_argument(
+        '--max-pixels',
+        type=int,
+        default=DEFAULT_MAX_PIXELS,
+        help=f'Pixel massimi per immagine decodificabile (default: {DEFAULT_MAX_PIXELS:,})'
+    )
+    
+    parser.add_argument(
+        '--clear-quarantine',
+        action='store_true',
+        help='Svuota la quarantena dei file che hanno bloccato la decodifica'
+    )
+    
+    parser.add_argument(
+        '--processes',
+        type=int,
+        default=None,
+        help='Processi per la decodifica nella verifica pixel (default: uno per core, 0 = solo thread)'
+    )
+    
+    parser.add_argument(
+        '--estimate',
+        action='store_true',
+        help='Stima rapida a campione di duplicati e spazio recuperabile (senza analisi completa)'
+    )
+    
+    parser.add_argument(
+        '--sample-fraction',
+        type=float,
+        default=DEFAULT_SAMPLE_FRACTION,
+        help=f'Quota dei byte candidati letti dalla stima (default: {DEFAULT_SAMPLE_FRACTION})'
+    )
+    
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=None,
+        help='Seme del campionamento, per stime riproducibili'
+    )
+    
+    parser.add_argument(
+        '--time-budget',
+        type=str,
+        default=None,
+        help='Tempo massimo dell\'analisi, es. 90s, 45m, 2h (numero senza unità = minuti); '
+             'alla scadenza si ferma con i risultati confermati e l\'elenco dei candidati non verificati'
+    )
+    
+    parser.add_argument(
+        '--largest-first',
+        action='store_true',
+        help='Conferma prima i gruppi con più spazio recuperabile e li mostra appena trovati'
+    )
+    
+    parser.add_argument(
+        '--top',
+        type=int,
+        default=10,
+        help='Gruppi nel riepilogo dei maggiori recuperi con --largest-first (default: 10)'
+    )
+    
+    parser.add_argument(
+        '--directories',
+        action='store_true',
+        help='Riporta anche le directory identiche o quasi duplicate (copie di intere cartelle)'
+    )
+    
+    parser.add_argument(
+        '--directory-ratio',
+        type=float,
+        default=DEFAULT_MIN_RATIO,
+        help=f'Quota minima di byte presenti altrove per una directory quasi duplicata '
+             f'(default: {DEFAULT_MIN_RATIO})'
+    )
+    
+    parser.add_argument(
+        '--bursts',
+        action='store_true',
+        help='Raggruppa anche raffiche e scatti simili (stessa fotocamera, pochi secondi di distanza)'
+    )
+    
+    parser.add_argument(
+        '--burst-window',
+        type=float,
+        default=DEFAULT_BURST_WINDOW,
+        help=f'Secondi massimi tra due scatti confrontati (default: {DEFAULT_BURST_WINDOW:g})'
+    )
+    
+    parser.add_argument(
+        '--burst-distance',
+        type=int,
+        default=DEFAULT_BURST_DISTANCE,
+        help=f'Bit diversi ammessi tra i dhash di due scatti simili (default: {DEFAULT_BURST_DISTANCE})'
+    )
+    
+    parser.add_argument(
+        '--rotations',
+        action='store_true',
+        help='Cerca anche quasi duplicati ruotati di 90° o ribaltati (decodifica tutte le immagini)'
+    )
+    
+    parser.add_argument(
+        '--rotation-distance',
+        type=int,
+        default=DEFAULT_ROTATION_DISTANCE,
+        help=f'Bit diversi ammessi tra gli hash canonici di due quasi duplicati '
+             f'(default: {DEFAULT_ROTATION_DISTANCE})'
+    )
+    
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Riprende un\'esecuzione interrotta dall\'ultimo checkpoint'
+    )
+    
+    parser.add_argument(
+        '--checkpoint',
+        type=str,
+        help='File di checkpoint (default: in ~/.image_duplicate_finder/checkpoints)'
+    )
+    
     args = parser.parse_args()
     
+    time_budget = None
+    if args.time_budget:
+        try:
+            time_budget = TimeBudget(parse_duration(args.time_budget))
+        except ValueError:
+            parser.error(f"durata non valida per --time-budget: {args.time_budget}")
+    
     # Verifica che la directory esista
     directory = Path(args.directory)
     if not directory.exists():
@@ -327,6 +1861,9 @@ Esempi d'uso:
     print("=" * 40)
     print(f"📁 Directory da scansionare: {directory}")
     print(f"🔧 Verifica pixel per pixel: {'No' if args.no_pixel_verify else 'Sì'}")
+    if args.max_bytes_per_sec or args.max_iops or args.cpu_share < 1.0:
+        print(f"🐢 Modalità limitata: {args.max_bytes_per_sec or '∞'} byte/s, "
+              f"{args.max_iops or '∞'} IOPS, CPU {args.cpu_share:.0%}")
     if not PIL_AVAILABLE:
         print("⚠️  ATTENZIONE: Pillow non installato - funzionalità limitate")
     if HEIC_AVAILABLE:
@@ -335,19 +1872,59 @@ Esempi d'uso:
         print("ℹ️  Supporto HEIC/HEIF non disponibile (installa pillow-heif)")
     print()
     
+    if PIL_AVAILABLE:
+        decoded_image_cache.set_budget(max(0, args.image_cache_mb) * 1024 * 1024)
+        # Impostazione globale di Pillow: la decide il programma, non il finder
+        if args.max_pixels:
+            apply_pixel_limit(args.max_pixels)
+    
+    finder = None
     try:
         # Inizializza il finder
-        finder = ImageDuplicateFinder(verbose=args.verbose)
+        throttle = build_throttle(args)
+        scan_filter = build_scan_filter(args)
+        finder = ImageDuplicateFinder(verbose=args.verbose, throttle=throttle,
+                                      autotune=not args.no_autotune, scan_filter=scan_filter,
+                                      decode_processes=args.processes,
+                                      decode_timeout=args.decode_timeout,
+                                      max_pixels=args.max_pixels, sidecars=args.sidecar,
+                                      time_budget=time_budget)
+        if args.clear_quarantine:
+            finder.quarantine.clear()
+        finder.checkpoint = ScanCheckpoint(
+            Path(args.checkpoint) if args.checkpoint else ScanCheckpoint.default_path(directory),
+            directory, resume=args.resume, settings=scan_filter.settings(), log=finder.log
+        )
         
         # Scansiona directory
         finder.scan_directory(directory)
         
         if not finder.image_paths:
             print("❌ Nessuna immagine trovata nella directory specificata.")
+            finder.checkpoint.finish()
             sys.exit(0)
         
+        if args.estimate:
+            started = datetime.now()
+            print_estimate(finder.estimate_duplicates(args.sample_fraction, args.seed),
+                           (datetime.now() - started).total_seconds())
+            finder.checkpoint.finish()
+            return
+        
         # Trova duplicati tramite hash
-        finder.find_duplicates_by_hash()
+        if args.largest_first or time_budget is not None:
+            finder.find_duplicates_largest_first(
+                on_group=print_confirmed_group if args.largest_first else None)
+            if args.largest_first:
+                print_top_groups(finder, args.top)
+        else:
+            finder.find_duplicates_by_hash()
+        if args.directories:
+            finder.find_duplicate_directories(args.directory_ratio)
+        if args.bursts:
+            finder.find_burst_groups(args.burst_window, args.burst_distance)
+        if args.rotations:
+            finder.find_rotated_duplicates(args.rotation_distance)
         
         # Verifica con confronto pixel se richiesto
         if not args.no_pixel_verify and PIL_AVAILABLE:
@@ -355,14 +1932,25 @@ Esempi d'uso:
         
         # Mostra risultati
         finder.print_results()
+        finder.print_directory_results()
+        finder.print_rotation_results()
+        finder.print_burst_results()
         
         # Salva risultati se richiesto
         if args.output:
             output_path = Path(args.output)
             finder.save_results_to_file(output_path)
+        
+        # Esecuzione completata: il checkpoint non serve più (salvo visita interrotta dal tempo)
+        if not any(candidate.stage == STAGE_SCAN for candidate in finder.unverified):
+            finder.checkpoint.finish()
     
     except KeyboardInterrupt:
         print("\n❌ Operazione annullata dall'utente.")
+        if finder is not None and finder.duplicates and args.largest_first:
+            print_top_groups(finder, args.top)
+        if finder is not None and finder.checkpoint is not None:
+            print("   Stato salvato: riprendi con --resume")
         sys.exit(1)
     except Exception as e:
         print(f"❌ Errore durante l'esecuzione: {e}")
@@ -370,6 +1958,9 @@ Esempi d'uso:
             import traceback
             traceback.print_exc()
         sys.exit(1)
+    finally:
+        if finder is not None:
+            finder.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Decodifica centralizzata delle immagini
+
+Unico punto di decodifica usato da verifica, anteprime e miniature.
+Quando serve un'immagine piccola (64-512 px) evita la decodifica a piena
+risoluzione:
+- miniatura EXIF incorporata, se abbastanza grande
+- JPEG: scalatura DCT tramite Image.draft (1/2, 1/4, 1/8)
+- altri formati: Image.reduce con fattore intero prima del ridimensionamento
+I risultati passano dalla cache LRU di processo (image_cache).
+"""
+
+import io
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from image_cache import decoded_image_cache
+from metadata_reader import read_exif_thumbnail
+
+
+def _reduction_factor(size: Tuple[int, int], target_size: Tuple[int, int]) -> int:
+    """Fattore intero massimo che mantiene l'immagine >= target_size."""
+    return max(1, min(size[0] // max(1, target_size[0]), size[1] // max(1, target_size[1])))
+
+
+def _load_exif_thumbnail(file_path: Path, full_size: Tuple[int, int],
+                         target_size: Tuple[int, int]) -> Optional[Image.Image]:
+    """Usa la miniatura EXIF se copre target_size e ha lo stesso aspect ratio."""
+    try:
+        data = read_exif_thumbnail(file_path)
+        if not data:
+            return None
+        thumb = Image.open(io.BytesIO(data))
+        thumb.load()
+    except Exception:
+        return None
+
+    width, height = thumb.size
+    if width < target_size[0] or height < target_size[1]:
+        return None
+    # Scarta miniature con bande nere o ritagliate (aspect ratio diverso)
+    if abs(width / height - full_size[0] / full_size[1]) > 0.02:
+        return None
+    return thumb
+
+
+def load_image(file_path: Path, target_size: Optional[Tuple[int, int]] = None,
+               mode: Optional[str] = 'RGB', use_exif_thumbnail: bool = True) -> Image.Image:
+    """
+    Decodifica un'immagine, eventualmente a risoluzione ridotta.
+
+    Args:
+        file_path: File da decodificare
+        target_size: Dimensione minima richiesta (larghezza, altezza); None per
+            la risoluzione piena. L'immagine restituita è almeno grande quanto
+            target_size (salvo originali più piccoli) e va ridimensionata dal chiamante.
+        mode: Modalità colore di destinazione (None per mantenere l'originale)
+        use_exif_thumbnail: Consente l'uso della miniatura EXIF incorporata
+
+    Returns:
+        Immagine caricata in memoria e indipendente dal file
+    """
+    stat = os.stat(file_path)
+    key = (str(file_path), stat.st_mtime_ns, stat.st_size,
+           tuple(target_size) if target_size else None, mode, use_exif_thumbnail)
+    cached = decoded_image_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = _decode(file_path, target_size, mode, use_exif_thumbnail)
+    decoded_image_cache.put(key, result)
+    return result
+
+
+def _decode(file_path: Path, target_size: Optional[Tuple[int, int]],
+            mode: Optional[str], use_exif_thumbnail: bool) -> Image.Image:
+    with Image.open(file_path) as img:
+        if target_size:
+            if use_exif_thumbnail and img.format == 'JPEG':
+                thumb = _load_exif_thumbnail(file_path, img.size, target_size)
+                if thumb is not None:
+                    return thumb.convert(mode) if mode and thumb.mode != mode else thumb
+
+            # JPEG: la decodifica avviene direttamente alla scala DCT più vicina
+            img.draft(mode or img.mode, target_size)
+            factor = _reduction_factor(img.size, target_size)
+            if factor > 1:
+                result = img.reduce(factor)
+            else:
+                img.load()
+                result = img.copy()
+        else:
+            img.load()
+            result = img.copy()
+
+    if mode and result.mode != mode:
+        result = result.convert(mode)
+    return result
+
+
+def make_thumbnail(file_path: Path, size: Tuple[int, int]) -> Image.Image:
+    """Crea una miniatura che sta in size, mantenendo l'aspect ratio."""
+    img = load_image(file_path, target_size=size)
+    img.thumbnail(size, Image.Resampling.LANCZOS)
+    return img
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Scheduler I/O per dispositivo
+
+Raggruppa i file da leggere per dispositivo fisico (st_dev) e assegna a
+ciascun dispositivo una coda con il proprio limite di concorrenza:
+- dischi rotazionali (HDD): 1-2 letture alla volta, in ordine di inode
+  per ridurre i seek della testina
+- dischi a stato solido (SSD/NVMe): molte letture in parallelo
+I dispositivi diversi vengono letti in parallelo tra loro.
+Con l'auto-tuning attivo il limite di ogni dispositivo viene adattato al
+throughput misurato (vedi autotune.py).
+"""
+
+import os
+import queue
+import sys
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from autotune import ConcurrencyTuner, TuningStore, find_mount_point
+
+
+class DeviceIOScheduler:
+    """Esegue operazioni di I/O sui file con code separate per dispositivo."""
+
+    # Limiti di concorrenza predefiniti per tipo di dispositivo
+    ROTATIONAL_WORKERS = 1
+    SOLID_STATE_WORKERS = 8
+    UNKNOWN_WORKERS = 4
+    # Tetto massimo per l'auto-tuning
+    MAX_TUNED_WORKERS = 32
+
+    def __init__(self,
+                 rotational_workers: int = ROTATIONAL_WORKERS,
+                 solid_state_workers: int = SOLID_STATE_WORKERS,
+                 unknown_workers: int = UNKNOWN_WORKERS,
+                 log: Optional[Callable[[str], None]] = None,
+                 autotune: bool = False,
+                 tuning_store: Optional[TuningStore] = None,
+                 max_tuned_workers: int = MAX_TUNED_WORKERS):
+        self.rotational_workers = max(1, rotational_workers)
+        self.solid_state_workers = max(1, solid_state_workers)
+        self.unknown_workers = max(1, unknown_workers)
+        self.log = log or (lambda message: None)
+        self.autotune = autotune
+        self.tuning_store = tuning_store or TuningStore()
+        self.max_tuned_workers = max(1, max_tuned_workers)
+        self._rotational_cache: Dict[int, Optional[bool]] = {}
+        self._cache_lock = threading.Lock()
+
+    def is_rotational(self, st_dev: int) -> Optional[bool]:
+        """
+        Indica se il dispositivo è rotazionale.
+
+        Su Linux legge /sys/dev/block/<major>:<minor>/queue/rotational (o quello
+        del disco padre per le partizioni). Restituisce None se non determinabile
+        (altri sistemi operativi, filesystem di rete, device-mapper, ecc.).
+        """
+        with self._cache_lock:
+            if st_dev in self._rotational_cache:
+                return self._rotational_cache[st_dev]
+
+        rotational = None
+        if sys.platform.startswith('linux'):
+            try:
+                block_dir = Path(f"/sys/dev/block/{os.major(st_dev)}:{os.minor(st_dev)}").resolve()
+                for candidate in (block_dir, block_dir.parent):
+                    flag_file = candidate / 'queue' / 'rotational'
+                    if flag_file.exists():
+                        rotational = flag_file.read_text().strip() == '1'
+                        break
+            except (OSError, ValueError):
+                rotational = None
+
+        with self._cache_lock:
+            self._rotational_cache[st_dev] = rotational
+        return rotational
+
+    def workers_for_device(self, st_dev: int) -> int:
+        """Restituisce il limite di concorrenza per un dispositivo."""
+        rotational = self.is_rotational(st_dev)
+        if rotational is True:
+            return self.rotational_workers
+        if rotational is False:
+            return self.solid_state_workers
+        return self.unknown_workers
+
+    def group_by_device(self, items: Iterable[Any],
+                        key: Optional[Callable[[Any], Path]] = None
+                        ) -> Dict[int, List[Tuple[Any, os.stat_result]]]:
+        """Raggruppa gli elementi per dispositivo, ordinando per inode quelli rotazionali."""
+        key = key or (lambda item: item)
+        groups: Dict[int, List[Tuple[Any, os.stat_result]]] = {}
+        for item in items:
+            try:
+                stat = key(item).stat()
+            except OSError as e:
+                self.log(f"Impossibile leggere stat per {key(item)}: {e}")
+                continue
+            groups.setdefault(stat.st_dev, []).append((item, stat))
+
+        for st_dev, entries in groups.items():
+            if self.is_rotational(st_dev):
+                # L'ordine degli inode approssima l'ordine fisico sul disco
+                entries.sort(key=lambda entry: entry[1].st_ino)
+        return groups
+
+    def _create_tuner(self, st_dev: int, mount: str, stage: str) -> ConcurrencyTuner:
+        """Crea il tuner di un dispositivo partendo dal valore salvato o dal default."""
+        initial = self.tuning_store.get(mount, stage) or min(2, self.workers_for_device(st_dev))
+        # Sui dischi rotazionali più letture parallele moltiplicano i seek:
+        # il tuner resta entro il limite sequenziale (letture in ordine di inode)
+        maximum = (self.rotational_workers if self.is_rotational(st_dev) is True
+                   else self.max_tuned_workers)
+        return ConcurrencyTuner(initial=initial, maximum=maximum,
+                                log=self.log, name=f"{stage} {mount}")
+
+    def run(self, items: Iterable[Any], func: Callable[[Any], Any],
+            progress_callback: Optional[Callable[[int, int], None]] = None,
+            key: Optional[Callable[[Any], Path]] = None,
+            stage: str = 'hash') -> Dict[Any, Any]:
+        """
+        Applica func a ogni elemento rispettando le code per dispositivo.
+
+        Args:
+            items: Elementi da elaborare (di default percorsi di file)
+            func: Funzione da applicare a ciascun elemento
+            progress_callback: Chiamata con (completati, totale) dopo ogni elemento
+            key: Restituisce il file di un elemento, usato per dispositivo e ordine
+            stage: Nome della fase ('hash' o 'decode') per l'auto-tuning
+
+        Returns:
+            Dizionario {elemento: risultato di func}
+        """
+        key = key or (lambda item: item)
+        groups = self.group_by_device(items, key)
+        total = sum(len(entries) for entries in groups.values())
+        results: Dict[Any, Any] = {}
+        done_queue: "queue.Queue[Tuple[Any, bool, Any]]" = queue.Queue()
+        stop_event = threading.Event()
+        threads: List[threading.Thread] = []
+        tuners: Dict[str, ConcurrencyTuner] = {}
+
+        for st_dev, entries in groups.items():
+            rotational = self.is_rotational(st_dev)
+            kind = {True: "HDD", False: "SSD", None: "sconosciuto"}[rotational]
+            tuner = None
+            if self.autotune:
+                mount = find_mount_point(key(entries[0][0]))
+                tuner = tuners.get(mount) or self._create_tuner(st_dev, mount, stage)
+                tuners[mount] = tuner
+                max_workers = tuner.maximum
+                self.log(f"Dispositivo {st_dev} ({kind}): {len(entries)} file, "
+                         f"auto-tuning da {tuner.limit} letture parallele")
+            else:
+                max_workers = self.workers_for_device(st_dev)
+                self.log(f"Dispositivo {st_dev} ({kind}): {len(entries)} file, "
+                         f"{max_workers} letture parallele")
+
+            device_queue = _DeviceQueue(entries, max_workers if tuner is None else None, tuner)
+            for i in range(min(max_workers, len(entries))):
+                thread = threading.Thread(target=device_queue.worker,
+                                          args=(func, done_queue, stop_event),
+                                          name=f"io-dev{st_dev}-{i}", daemon=True)
+                threads.append(thread)
+
+        try:
+            for thread in threads:
+                thread.start()
+            for completed in range(1, total + 1):
+                item, ok, value = done_queue.get()
+                if ok:
+                    results[item] = value
+                else:
+                    self.log(f"Errore durante l'elaborazione di {key(item)}: {value}")
+                if progress_callback:
+                    progress_callback(completed, total)
+        finally:
+            # Interrompe le letture non ancora avviate (es. Ctrl+C)
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+
+        for mount, tuner in tuners.items():
+            self.log(f"Concorrenza {stage} scelta per {mount}: {tuner.best_limit} worker")
+            self.tuning_store.save(mount, stage, tuner.best_limit)
+
+        return results
+
+
+class _DeviceQueue:
+    """Coda di lavoro di un dispositivo con limite di concorrenza fisso o adattivo."""
+
+    def __init__(self, entries: List[Tuple[Any, os.stat_result]],
+                 limit: Optional[int], tuner: Optional[ConcurrencyTuner]):
+        self._entries = deque(entries)
+        self._limit = limit
+        self._tuner = tuner
+        self._active = 0
+        self._condition = threading.Condition()
+
+    def _current_limit(self) -> int:
+        return self._tuner.limit if self._tuner else self._limit
+
+    def worker(self, func: Callable[[Any], Any], done_queue: queue.Queue,
+               stop_event: threading.Event) -> None:
+        """Ciclo di un worker: preleva in ordine finché la coda non è vuota."""
+        while not stop_event.is_set():
+            with self._condition:
+                # Attende un posto libero: il limite può cambiare durante l'esecuzione
+                while self._entries and self._active >= self._current_limit():
+                    self._condition.wait(0.1)
+                    if stop_event.is_set():
+                        return
+                if not self._entries:
+                    return
+                item, stat = self._entries.popleft()
+                self._active += 1
+
+            try:
+                done_queue.put((item, True, func(item)))
+            except Exception as e:
+                done_queue.put((item, False, e))
+            finally:
+                if self._tuner:
+                    self._tuner.record(stat.st_size)
+                with self._condition:
+                    self._active -= 1
+                    self._condition.notify_all()
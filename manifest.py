@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Manifest degli hash per scansioni distribuite
+
+Ogni server esegue il comando `index` in locale e produce un manifest
+compatto: un record (dimensione, hash, host, percorso) per riga, separati
+da tabulazioni e ordinati per (dimensione, hash). Il comando `merge` unisce
+un numero qualsiasi di manifest con un merge a k vie in streaming: in
+memoria resta solo il gruppo corrente, mai i manifest interi.
+"""
+
+import heapq
+import itertools
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple
+
+# Prima riga di ogni manifest
+MANIFEST_HEADER = '# image-duplicate-finder manifest v1'
+
+_ESCAPES = {'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'}
+_UNESCAPES = {'\\': '\\', 't': '\t', 'n': '\n', 'r': '\r'}
+
+
+class ManifestRecord(NamedTuple):
+    """Un file indicizzato."""
+    size: int
+    digest: str
+    host: str
+    path: str
+
+    @property
+    def sort_key(self):
+        return (self.size, self.digest)
+
+
+def _escape(text: str) -> str:
+    return ''.join(_ESCAPES.get(char, char) for char in text)
+
+
+def _unescape(text: str) -> str:
+    return re.sub(r'\\(.)', lambda match: _UNESCAPES.get(match.group(1), match.group(1)), text)
+
+
+def write_manifest(output_path: Path, records: Iterable[ManifestRecord], root: str = '') -> int:
+    """
+    Scrive un manifest ordinato (in modo atomico).
+
+    Returns:
+        Numero di record scritti
+    """
+    records = sorted(records)
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(MANIFEST_HEADER + '\n')
+        f.write(f"# created: {datetime.now().isoformat(timespec='seconds')}\n")
+        if root:
+            f.write(f"# root: {_escape(root)}\n")
+        for record in records:
+            f.write(f"{record.size}\t{record.digest}\t{_escape(record.host)}\t{_escape(record.path)}\n")
+    os.replace(tmp_path, output_path)
+    return len(records)
+
+
+def read_manifest(manifest_path: Path) -> Iterator[ManifestRecord]:
+    """
+    Legge un manifest riga per riga, verificando formato e ordinamento.
+
+    Solleva ValueError se il file non è un manifest valido o non è ordinato.
+    """
+    with open(manifest_path, 'r', encoding='utf-8', newline='\n') as f:
+        if f.readline().rstrip('\n') != MANIFEST_HEADER:
+            raise ValueError(f"Non è un manifest valido: {manifest_path}")
+
+        previous = None
+        for line_number, line in enumerate(f, 2):
+            if line.startswith('#') or not line.strip():
+                continue
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) != 4:
+                raise ValueError(f"{manifest_path}:{line_number}: record malformato")
+            record = ManifestRecord(int(fields[0]), fields[1], _unescape(fields[2]), _unescape(fields[3]))
+            if previous is not None and record.sort_key < previous:
+                raise ValueError(f"{manifest_path}:{line_number}: manifest non ordinato")
+            previous = record.sort_key
+            yield record
+
+
+def merge_manifests(manifest_paths: List[Path]) -> Iterator[List[ManifestRecord]]:
+    """
+    Unisce i manifest e restituisce i gruppi di duplicati globali.
+
+    Yields:
+        Liste di record con stessa dimensione e hash (almeno due), in ordine
+        crescente di dimensione
+    """
+    streams = [read_manifest(path) for path in manifest_paths]
+    merged = heapq.merge(*streams, key=lambda record: record.sort_key)
+    for _, group in itertools.groupby(merged, key=lambda record: record.sort_key):
+        records = list(group)
+        if len(records) > 1:
+            yield records
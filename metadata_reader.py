@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Lettura metadati dalle sole intestazioni
+
+Estrae dimensioni, modalità colore, data EXIF e modello della fotocamera
+leggendo solo i primi byte del file:
+- JPEG: segmento APP1 (EXIF) e marker SOF per le dimensioni
+- PNG: chunk IHDR ed eventuale chunk eXIf prima dei dati immagine
+- GIF e BMP: intestazione a lunghezza fissa
+Per gli altri formati (TIFF, WebP, HEIC, ...) usa Image.open di Pillow,
+che legge comunque solo l'intestazione senza decodificare i pixel.
+"""
+
+import struct
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Tuple
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Tag EXIF/TIFF utilizzati
+TAG_MODEL = 0x0110
+TAG_DATETIME = 0x0132
+TAG_THUMBNAIL_OFFSET = 0x0201
+TAG_THUMBNAIL_LENGTH = 0x0202
+
+# Marker JPEG Start Of Frame che contengono le dimensioni
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# Modalità Pillow per numero di componenti JPEG e tipo di colore PNG
+_JPEG_MODES = {1: 'L', 3: 'RGB', 4: 'CMYK'}
+_PNG_MODES = {0: 'L', 2: 'RGB', 3: 'P', 4: 'LA', 6: 'RGBA'}
+
+# Limite di lettura per i segmenti JPEG prima del SOF
+_MAX_HEADER_BYTES = 1024 * 1024
+
+
+def _parse_exif_datetime(value: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(value.strip('\x00 '), '%Y:%m:%d %H:%M:%S')
+    except (ValueError, AttributeError):
+        return None
+
+
+def parse_tiff_tags(data: bytes) -> Dict[int, object]:
+    """
+    Estrae i tag ASCII dell'IFD0 di un blocco TIFF/EXIF.
+
+    Restituisce solo i valori stringa, sufficienti per data e modello;
+    i dati malformati producono un dizionario vuoto o parziale.
+    """
+    tags: Dict[int, object] = {}
+    if len(data) < 8 or data[:2] not in (b'II', b'MM'):
+        return tags
+
+    endian = '<' if data[:2] == b'II' else '>'
+    try:
+        ifd_offset = struct.unpack(endian + 'I', data[4:8])[0]
+        count = struct.unpack(endian + 'H', data[ifd_offset:ifd_offset + 2])[0]
+        for i in range(count):
+            entry = data[ifd_offset + 2 + i * 12:ifd_offset + 14 + i * 12]
+            if len(entry) < 12:
+                break
+            tag, field_type, n_values = struct.unpack(endian + 'HHI', entry[:8])
+            if field_type != 2:  # ASCII
+                continue
+            if n_values <= 4:
+                raw = entry[8:8 + n_values]
+            else:
+                value_offset = struct.unpack(endian + 'I', entry[8:12])[0]
+                raw = data[value_offset:value_offset + n_values]
+            tags[tag] = raw.split(b'\x00', 1)[0].decode('ascii', errors='replace')
+    except struct.error:
+        pass
+    return tags
+
+
+def _tiff_thumbnail(data: bytes) -> Optional[bytes]:
+    """Estrae la miniatura JPEG dall'IFD1 di un blocco EXIF, se presente."""
+    if len(data) < 8 or data[:2] not in (b'II', b'MM'):
+        return None
+
+    endian = '<' if data[:2] == b'II' else '>'
+    try:
+        ifd0 = struct.unpack(endian + 'I', data[4:8])[0]
+        count = struct.unpack(endian + 'H', data[ifd0:ifd0 + 2])[0]
+        next_ifd_pos = ifd0 + 2 + count * 12
+        ifd1 = struct.unpack(endian + 'I', data[next_ifd_pos:next_ifd_pos + 4])[0]
+        if not ifd1:
+            return None
+
+        values = {}
+        count = struct.unpack(endian + 'H', data[ifd1:ifd1 + 2])[0]
+        for i in range(count):
+            entry = data[ifd1 + 2 + i * 12:ifd1 + 14 + i * 12]
+            if len(entry) < 12:
+                break
+            tag, field_type = struct.unpack(endian + 'HH', entry[:4])
+            if tag in (TAG_THUMBNAIL_OFFSET, TAG_THUMBNAIL_LENGTH):
+                fmt = 'H' if field_type == 3 else 'I'
+                values[tag] = struct.unpack(endian + fmt, entry[8:8 + struct.calcsize(fmt)])[0]
+    except struct.error:
+        return None
+
+    offset = values.get(TAG_THUMBNAIL_OFFSET)
+    length = values.get(TAG_THUMBNAIL_LENGTH)
+    if not offset or not length or offset + length > len(data):
+        return None
+    return data[offset:offset + length]
+
+
+def read_exif_thumbnail(file_path: Path) -> Optional[bytes]:
+    """Restituisce la miniatura JPEG incorporata nell'EXIF di un JPEG (o None)."""
+    with open(file_path, 'rb') as f:
+        if f.read(2) != b'\xff\xd8':
+            return None
+        while f.tell() < _MAX_HEADER_BYTES:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF or marker[1] in (0xD9, 0xDA):
+                return None
+            length_bytes = f.read(2)
+            if len(length_bytes) < 2:
+                return None
+            length = struct.unpack('>H', length_bytes)[0]
+            if marker[1] == 0xE1:
+                segment = f.read(length - 2)
+                if segment.startswith(b'Exif\x00\x00'):
+                    return _tiff_thumbnail(segment[6:])
+            elif marker[1] in _SOF_MARKERS:
+                return None
+            else:
+                f.seek(length - 2, 1)
+    return None
+
+
+def _read_jpeg(f: BinaryIO) -> Tuple[Optional[Tuple[int, int]], Optional[str], Dict[int, object]]:
+    dimensions = mode = None
+    tags: Dict[int, object] = {}
+    f.seek(2)
+    while f.tell() < _MAX_HEADER_BYTES:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            break
+        code = marker[1]
+        if code == 0xFF:  # byte di riempimento
+            f.seek(-1, 1)
+            continue
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue
+        if code in (0xD9, 0xDA):  # fine immagine o inizio dati compressi
+            break
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            break
+        length = struct.unpack('>H', length_bytes)[0]
+        if code == 0xE1 and not tags:
+            segment = f.read(length - 2)
+            if segment.startswith(b'Exif\x00\x00'):
+                tags = parse_tiff_tags(segment[6:])
+        elif code in _SOF_MARKERS:
+            segment = f.read(6)
+            height, width = struct.unpack('>HH', segment[1:5])
+            dimensions = (width, height)
+            mode = _JPEG_MODES.get(segment[5]) if len(segment) == 6 else None
+            break
+        else:
+            f.seek(length - 2, 1)
+    return dimensions, mode, tags
+
+
+def _read_png(f: BinaryIO) -> Tuple[Optional[Tuple[int, int]], Optional[str], Dict[int, object]]:
+    dimensions = mode = None
+    tags: Dict[int, object] = {}
+    f.seek(8)
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        length, chunk_type = struct.unpack('>I4s', header)
+        if chunk_type == b'IHDR':
+            width, height, bit_depth, color_type = struct.unpack('>IIBB', f.read(10))
+            dimensions = (width, height)
+            if color_type == 0 and bit_depth in (1, 16):
+                mode = '1' if bit_depth == 1 else 'I;16'
+            else:
+                mode = _PNG_MODES.get(color_type)
+            f.seek(length - 10 + 4, 1)
+        elif chunk_type == b'eXIf':
+            tags = parse_tiff_tags(f.read(length))
+            f.seek(4, 1)
+        elif chunk_type in (b'IDAT', b'IEND'):
+            break
+        else:
+            f.seek(length + 4, 1)
+    return dimensions, mode, tags
+
+
+def read_image_header(file_path: Path) -> Dict:
+    """
+    Legge dimensioni, modalità, data EXIF e modello della fotocamera dall'intestazione del file.
+
+    Returns:
+        Dizionario con 'dimensions' (tupla o None), 'mode' (modalità Pillow o
+        None), 'has_exif' (bool), 'exif_date' (datetime o None) e
+        'camera_model' (stringa o None)
+    """
+    result = {'dimensions': None, 'mode': None, 'has_exif': False,
+              'exif_date': None, 'camera_model': None}
+    tags: Dict[int, object] = {}
+
+    with open(file_path, 'rb') as f:
+        signature = f.read(30)
+        if signature[:2] == b'\xff\xd8':
+            result['dimensions'], result['mode'], tags = _read_jpeg(f)
+        elif signature[:8] == b'\x89PNG\r\n\x1a\n':
+            result['dimensions'], result['mode'], tags = _read_png(f)
+        elif signature[:6] in (b'GIF87a', b'GIF89a'):
+            result['dimensions'] = struct.unpack('<HH', signature[6:10])
+            result['mode'] = 'P'
+        elif signature[:2] == b'BM' and len(signature) >= 30:
+            width, height, _, bit_count = struct.unpack('<iiHH', signature[18:30])
+            result['dimensions'] = (width, abs(height))
+            # Solo il caso non ambiguo: gli altri dipendono da palette e maschere
+            result['mode'] = 'RGB' if bit_count == 24 else None
+
+    if result['dimensions'] is None and PIL_AVAILABLE:
+        # Formati senza parser dedicato: Image.open legge solo l'intestazione
+        with Image.open(file_path) as img:
+            result['dimensions'] = img.size
+            result['mode'] = img.mode
+            tags = dict(img.getexif())
+
+    result['has_exif'] = bool(tags)
+    if TAG_DATETIME in tags:
+        result['exif_date'] = _parse_exif_datetime(tags[TAG_DATETIME])
+    if isinstance(tags.get(TAG_MODEL), str) and tags[TAG_MODEL].strip('\x00 '):
+        result['camera_model'] = tags[TAG_MODEL].strip('\x00 ')
+
+    return result
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Quasi duplicati indipendenti dall'orientamento
+
+Le copie ruotate o ribaltate (esportazioni con l'orientamento EXIF
+applicato ai pixel, scansioni capovolte) sfuggono sia all'hash MD5 sia al
+confronto diretto degli hash percettivi. Si usano i difference hash delle 8
+trasformazioni diedrali calcolati da features.py:
+- l'indice contiene solo l'hash canonico (il minimo degli 8) di ogni file
+- ogni file interroga l'indice con tutti i suoi 8 hash: se due copie
+  scelgono trasformazioni diverse come minimo (basta un bit diverso), la
+  trasformazione corrispondente dell'una resta vicina al canonico dell'altra
+- distanza d > 0: l'hash a 64 bit viene diviso in d + 1 segmenti; due hash
+  entro distanza d coincidono in almeno un segmento (principio dei
+  cassetti), quindi si confrontano solo gli hash che condividono un segmento
+Il canonico è spesso l'hash con meno bit a 1, quindi da solo non basta: due
+file sono quasi duplicati se ognuno degli 8 hash dell'uno ha un hash entro
+distanza d nell'altro. Le immagini quasi uniformi (hash con quasi tutti i
+bit uguali) non vengono considerate, e ogni membro di un gruppo deve essere
+vicino al rappresentante del gruppo (nessuna unione a catena).
+"""
+
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+# Bit diversi ammessi tra gli hash di due quasi duplicati
+DEFAULT_ROTATION_DISTANCE = 4
+
+# Bit dell'hash (difference hash 8x8)
+HASH_BITS = 64
+
+# Bit "minoritari" minimi (a 1 o a 0) perché un hash porti informazione
+MIN_INFORMATIVE_BITS = 6
+
+
+def _popcount(value: int) -> int:
+    return bin(value).count('1')
+
+
+def is_informative(values: Sequence[int]) -> bool:
+    """False per le immagini uniformi: tutti gli hash con quasi tutti i bit uguali."""
+    return max(min(_popcount(value), HASH_BITS - _popcount(value)) for value in values) \
+        >= MIN_INFORMATIVE_BITS
+
+
+def dihedral_distance(a: Sequence[int], b: Sequence[int]) -> int:
+    """
+    Distanza tra due insiemi di 8 hash: il massimo, su ogni hash di uno dei
+    due, della distanza dall'hash più vicino dell'altro.
+    """
+    def directed(source: Sequence[int], target: Sequence[int]) -> int:
+        return max(min(_popcount(x ^ y) for y in target) for x in source)
+    return max(directed(a, b), directed(b, a))
+
+
+def _segments(max_distance: int) -> List[Tuple[int, int]]:
+    """(spostamento, maschera) dei max_distance + 1 segmenti dell'hash."""
+    count = min(max_distance + 1, HASH_BITS)
+    bounds = [HASH_BITS * k // count for k in range(count + 1)]
+    return [(bounds[k], (1 << (bounds[k + 1] - bounds[k])) - 1) for k in range(count)]
+
+
+def group_similar_hashes(hashes: Dict[Path, Sequence[str]],
+                         max_distance: int = DEFAULT_ROTATION_DISTANCE) -> Tuple[List[List[Path]], int]:
+    """
+    Raggruppa i file uguali a meno di rotazioni di 90° e ribaltamenti.
+
+    Il primo file (in ordine di percorso) non ancora assegnato diventa il
+    rappresentante di un nuovo gruppo e vi raccoglie i file non assegnati
+    entro max_distance da lui.
+
+    Args:
+        hashes: Per file, gli hash esadecimali delle 8 trasformazioni diedrali
+        max_distance: Distanza massima tra due quasi duplicati (dihedral_distance)
+
+    Returns:
+        (gruppi di almeno due file, numero di confronti eseguiti)
+    """
+    variants = {path: [int(value, 16) for value in values] for path, values in hashes.items()}
+    paths = sorted(path for path, values in variants.items() if is_informative(values))
+    canonical = [min(variants[path]) for path in paths]
+    segments = _segments(max(0, max_distance))
+
+    index: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+    for position, value in enumerate(canonical):
+        for segment, (shift, mask) in enumerate(segments):
+            index[(segment, (value >> shift) & mask)].append(position)
+
+    comparisons = 0
+    assigned = set()
+    groups = []
+    for i, path in enumerate(paths):
+        if i in assigned:
+            continue
+        values = variants[path]
+        candidates = set()
+        for value in set(values):
+            for segment, (shift, mask) in enumerate(segments):
+                candidates.update(j for j in index.get((segment, (value >> shift) & mask), ())
+                                  if j > i and j not in assigned)
+        group = [path]
+        for j in sorted(candidates):
+            comparisons += 1
+            if dihedral_distance(values, variants[paths[j]]) <= max_distance:
+                assigned.add(j)
+                group.append(paths[j])
+        if len(group) > 1:
+            groups.append(group)
+    return groups, comparisons
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Confronto pixel a bande con memoria limitata
+
+Le immagini enormi (panorami, scansioni da centinaia di megapixel) vengono
+elaborate a bande di righe, con un tetto fisso alla memoria per banda:
+- BMP, TIFF a una striscia non compressa e altri formati con un unico
+  blocco 'raw': le righe della banda vengono lette dal file e decodificate
+  con Image.frombytes
+- TIFF a più strisce o a tile, non compressi o compressi LZW/Deflate/
+  PackBits/JPEG: le strisce o le righe di tile di ogni banda vengono lette
+  dal file e decodificate da sole, come un piccolo TIFF in memoria con la
+  stessa struttura (stessi tag, meno righe); una banda contiene almeno una
+  striscia o una riga di tile
+- JPEG, PNG e gli altri formati compressi non permettono a Pillow di
+  decodificare una parte dell'immagine: vengono decodificati una volta e
+  convertiti in RGB una banda alla volta
+Il confronto di due immagini decodifica un file alla volta (digest per
+banda), quindi nel caso peggiore in memoria c'è una sola immagine.
+Il digest ottenuto è identico a features.pixel_digest sull'immagine intera.
+"""
+
+import hashlib
+import io
+import math
+import struct
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from PIL import Image, TiffImagePlugin
+
+# Byte RGB massimi per banda
+BAND_BYTES = 32 * 1024 * 1024
+
+# Tag TIFF che descrivono la struttura dei pixel, copiati nei TIFF delle bande
+_TIFF_STRUCTURE_TAGS = (
+    256,  # ImageWidth
+    258,  # BitsPerSample
+    259,  # Compression
+    262,  # PhotometricInterpretation
+    266,  # FillOrder
+    277,  # SamplesPerPixel
+    284,  # PlanarConfiguration
+    317,  # Predictor
+    320,  # ColorMap
+    322,  # TileWidth
+    323,  # TileLength
+    338,  # ExtraSamples
+    339,  # SampleFormat
+    347,  # JPEGTables
+    529,  # YCbCrCoefficients
+    530,  # YCbCrSubSampling
+    532,  # ReferenceBlackWhite
+)
+_TIFF_LONG = 4
+
+
+class _RawLayout(NamedTuple):
+    """Disposizione dei pixel non compressi nel file."""
+    offset: int
+    rawmode: str
+    stride: int
+    orientation: int
+    palette: Optional[List[int]]
+
+
+class _TiffLayout(NamedTuple):
+    """Strisce o tile di un TIFF, decodificabili a gruppi di righe."""
+    tags: TiffImagePlugin.ImageFileDirectory_v2
+    tiled: bool
+    unit_height: int  # righe per striscia o per riga di tile
+    units_per_row: int  # tile per riga (1 per le strisce)
+    offsets: Tuple[int, ...]
+    counts: Tuple[int, ...]
+
+
+def band_rows(width: int, band_bytes: int = BAND_BYTES) -> int:
+    """Righe per banda che stanno in band_bytes (almeno una)."""
+    return max(1, band_bytes // max(1, width * 3))
+
+
+def _raw_layout(img: Image.Image) -> Optional[_RawLayout]:
+    """Restituisce la disposizione se l'immagine è un unico blocco 'raw' leggibile a righe."""
+    if len(img.tile) != 1:
+        return None
+    codec, extents, offset, args = img.tile[0]
+    if codec != 'raw' or tuple(extents) != (0, 0) + img.size:
+        return None
+
+    if isinstance(args, str):
+        args = (args,)
+    rawmode = args[0]
+    stride = args[1] if len(args) > 1 else 0
+    orientation = args[2] if len(args) > 2 else 1
+    if orientation not in (1, -1):
+        return None
+    if not stride:
+        # Lunghezza di una riga impacchettata nel formato del file
+        try:
+            stride = len(Image.new(img.mode, (img.width, 1)).tobytes('raw', rawmode))
+        except Exception:
+            return None
+    palette = img.getpalette() if img.mode == 'P' else None
+    return _RawLayout(offset, rawmode, stride, orientation, palette)
+
+
+def _tiff_layout(img: Image.Image) -> Optional[_TiffLayout]:
+    """Strisce o tile del frame corrente, se la struttura è decodificabile a pezzi."""
+    tags = img.tag_v2
+    if tags.get(284, 1) != 1:  # piani separati: strisce diverse per ogni canale
+        return None
+    width, height = img.size
+    tiled = 322 in tags
+    if tiled:
+        unit_height = tags.get(323, 0)
+        units_per_row = math.ceil(width / max(1, tags.get(322, 0)))
+        offsets, counts = tags.get(324), tags.get(325)
+    else:
+        unit_height = min(height, tags.get(278, height))
+        units_per_row = 1
+        offsets, counts = tags.get(273), tags.get(279)
+    if not unit_height or offsets is None or counts is None:
+        return None
+    offsets = offsets if isinstance(offsets, tuple) else (offsets,)
+    counts = counts if isinstance(counts, tuple) else (counts,)
+    needed = math.ceil(height / unit_height) * units_per_row
+    if len(offsets) < needed or len(counts) < needed:
+        return None
+    return _TiffLayout(tags, tiled, unit_height, units_per_row, offsets, counts)
+
+
+def _decode_raw_band(file_path: Path, layout: _RawLayout, size: Tuple[int, int], mode: str,
+                     top: int, bottom: int) -> Image.Image:
+    """Decodifica dal file le sole righe [top, bottom)."""
+    width, height = size
+    rows = bottom - top
+    # Con orientamento -1 (BMP) le righe sono memorizzate dal basso
+    first_row = top if layout.orientation > 0 else height - bottom
+    with open(file_path, 'rb') as f:
+        f.seek(layout.offset + first_row * layout.stride)
+        data = f.read(rows * layout.stride)
+    band = Image.frombytes(mode, (width, rows), data, 'raw',
+                           layout.rawmode, layout.stride, layout.orientation)
+    if layout.palette is not None:
+        band.putpalette(layout.palette)
+    return band.convert('RGB') if band.mode != 'RGB' else band
+
+
+def _decode_tiff_band(file_path: Path, layout: _TiffLayout, first: int, last: int,
+                      rows: int) -> Image.Image:
+    """Decodifica le strisce (o righe di tile) [first, last) come un TIFF a sé di rows righe."""
+    source = layout.tags
+    directory = TiffImagePlugin.ImageFileDirectory_v2(prefix=source.prefix)
+    for tag in _TIFF_STRUCTURE_TAGS:
+        if tag in source:
+            directory[tag] = source[tag]
+            directory.tagtype[tag] = source.tagtype[tag]
+    directory[257] = rows
+    if not layout.tiled:
+        directory[278] = layout.unit_height
+
+    chunks = []
+    with open(file_path, 'rb') as f:
+        for unit in range(first * layout.units_per_row, last * layout.units_per_row):
+            f.seek(layout.offsets[unit])
+            chunks.append(f.read(layout.counts[unit]))
+    relative, position = [], 0
+    for chunk in chunks:
+        relative.append(position)
+        position += (len(chunk) + 1) // 2 * 2
+
+    # Intestazione, IFD, dati. Pillow somma la fine dell'IFD agli StripOffsets,
+    # non ai TileOffsets: per le tile servono gli offset assoluti
+    offset_tag, count_tag = (324, 325) if layout.tiled else (273, 279)
+    directory[count_tag] = tuple(len(chunk) for chunk in chunks)
+    directory[offset_tag] = tuple(relative)
+    directory.tagtype[offset_tag] = directory.tagtype[count_tag] = _TIFF_LONG
+    header = source.prefix + struct.pack(('<' if source.prefix == b'II' else '>') + 'HL', 42, 8)
+    if layout.tiled:
+        data_start = len(header) + len(directory.tobytes(len(header)))
+        directory[offset_tag] = tuple(data_start + offset for offset in relative)
+
+    buffer = io.BytesIO()
+    buffer.write(header)
+    buffer.write(directory.tobytes(len(header)))
+    for chunk in chunks:
+        buffer.write(chunk)
+        if len(chunk) % 2:
+            buffer.write(b'\0')
+    buffer.seek(0)
+    with Image.open(buffer) as band:
+        band.load()
+        return band.convert('RGB') if band.mode != 'RGB' else band.copy()
+
+
+def _iter_tiff_bands(file_path: Path, layout: _TiffLayout, size: Tuple[int, int],
+                     band_bytes: int) -> Iterator[Image.Image]:
+    height = size[1]
+    units = math.ceil(height / layout.unit_height)
+    # Almeno una striscia o riga di tile per banda, anche se supera band_bytes
+    per_band = max(1, band_rows(size[0], band_bytes) // layout.unit_height)
+    for first in range(0, units, per_band):
+        last = min(units, first + per_band)
+        top = first * layout.unit_height
+        yield _decode_tiff_band(file_path, layout, first, last,
+                                min(height, last * layout.unit_height) - top)
+
+
+def iter_rgb_bands(file_path: Path, band_bytes: int = BAND_BYTES) -> Iterator[Image.Image]:
+    """
+    Restituisce l'immagine come sequenza di bande RGB a larghezza piena.
+
+    Args:
+        file_path: File da decodificare
+        band_bytes: Byte RGB massimi per banda (TIFF: almeno una striscia o riga di tile)
+
+    Yields:
+        Bande dall'alto verso il basso, in modalità RGB
+    """
+    with Image.open(file_path) as img:
+        size, mode = img.size, img.mode
+        # Un unico blocco non compresso si legge a righe; altrimenti strisce o tile TIFF
+        layout = _raw_layout(img)
+        tiff = _tiff_layout(img) if layout is None and img.format == 'TIFF' else None
+        rows = band_rows(img.width, band_bytes)
+
+        if tiff is None and layout is None:
+            # Nessun accesso parziale: una decodifica nativa, conversione a bande
+            img.load()
+            for top in range(0, img.height, rows):
+                band = img.crop((0, top, img.width, min(img.height, top + rows)))
+                yield band.convert('RGB') if band.mode != 'RGB' else band
+            return
+
+    if tiff is not None:
+        yield from _iter_tiff_bands(file_path, tiff, size, band_bytes)
+        return
+    for top in range(0, size[1], rows):
+        yield _decode_raw_band(file_path, layout, size, mode, top, min(size[1], top + rows))
+
+
+def streaming_pixel_digest(file_path: Path, band_bytes: int = BAND_BYTES) -> Tuple[Tuple[int, int], str]:
+    """
+    Digest canonico dei pixel calcolato a bande.
+
+    Returns:
+        Tupla (dimensioni, digest), con lo stesso digest di features.pixel_digest
+    """
+    with Image.open(file_path) as img:
+        size = img.size
+    digest = hashlib.sha256(f"{size[0]}x{size[1]}:".encode('ascii'))
+    for band in iter_rgb_bands(file_path, band_bytes):
+        digest.update(band.tobytes())
+    return size, digest.hexdigest()
+
+
+def _chunk_digests(file_path: Path, band_bytes: int) -> Iterator[bytes]:
+    """SHA256 di blocchi di pixel di lunghezza fissa, indipendenti dalla suddivisione in bande."""
+    pending = bytearray()
+    chunk = 0
+    for band in iter_rgb_bands(file_path, band_bytes):
+        chunk = chunk or band_rows(band.width, band_bytes) * band.width * 3
+        pending += band.tobytes()
+        while len(pending) >= chunk:
+            yield hashlib.sha256(pending[:chunk]).digest()
+            del pending[:chunk]
+    if pending:
+        yield hashlib.sha256(pending).digest()
+
+
+def compare_pixels_streaming(path1: Path, path2: Path, band_bytes: int = BAND_BYTES) -> bool:
+    """
+    Confronto a bande, con uscita alla prima banda diversa.
+
+    I pixel vengono confrontati a blocchi tramite SHA256, così il primo file
+    viene letto per intero (e rilasciato) prima di decodificare il secondo.
+    """
+    with Image.open(path1) as img1, Image.open(path2) as img2:
+        if img1.size != img2.size:
+            return False
+
+    digests1 = list(_chunk_digests(path1, band_bytes))
+    count = 0
+    for count, digest in enumerate(_chunk_digests(path2, band_bytes), 1):
+        if count > len(digests1) or digest != digests1[count - 1]:
+            return False
+    return count == len(digests1)
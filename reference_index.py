@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Indice persistente di una libreria di riferimento
+
+Per l'acquisizione di nuovo materiale il controllo è asimmetrico: "quali file
+di /incoming sono già in /archivio?". Le radici di riferimento vengono
+indicizzate una volta in un database SQLite (percorso, dimensione, mtime,
+hash); i controlli successivi leggono solo i file nuovi:
+- un file la cui dimensione non compare nell'indice è nuovo senza calcolarne
+  l'hash (basta lo stat)
+- gli altri vengono confrontati per (dimensione, hash) con l'indice
+I file di riferimento non vengono mai proposti per la rimozione e i duplicati
+interni al riferimento non vengono ricalcolati. Reindicizzare una radice
+ricalcola solo gli hash dei file nuovi o modificati.
+Accanto al database viene mantenuto un filtro di Bloom (bloom.py) delle
+chiavi (dimensione, hash): le ricerche che falliscono, la grande maggioranza
+all'acquisizione, non interrogano SQLite.
+"""
+
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bloom import DEFAULT_FP_RATE, BloomFilter, digest_key
+
+# Indice di riferimento predefinito
+DEFAULT_REFERENCE_INDEX = Path.home() / '.image_duplicate_finder' / 'reference.sqlite'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_size_digest ON files (size, digest);
+CREATE INDEX IF NOT EXISTS files_root ON files (root);
+CREATE TABLE IF NOT EXISTS roots (
+    root TEXT PRIMARY KEY,
+    indexed TEXT NOT NULL
+);
+"""
+
+
+class ReferenceIndex:
+    """Indice SQLite (dimensione, hash) dei file di riferimento."""
+
+    def __init__(self, path: Path = DEFAULT_REFERENCE_INDEX):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path))
+        self._connection.executescript(_SCHEMA)
+        self._sizes: Optional[set] = None
+        self._bloom: Optional[BloomFilter] = None
+        self.bloom_path = self.path.with_name(self.path.name + '.bloom')
+
+    @property
+    def generation(self) -> int:
+        """Contatore delle modifiche, usato per riconoscere un filtro non aggiornato."""
+        return self._connection.execute("PRAGMA user_version").fetchone()[0]
+
+    def _changed(self) -> None:
+        """Da chiamare dentro la transazione di ogni modifica."""
+        self._connection.execute(f"PRAGMA user_version = {self.generation + 1}")
+        self._sizes = None
+        if self._bloom is not None:
+            self._bloom.close()
+            self._bloom = None
+
+    def roots(self) -> List[Tuple[str, str, int]]:
+        """Radici indicizzate: (radice, data di indicizzazione, numero di file)."""
+        return self._connection.execute(
+            "SELECT r.root, r.indexed, COUNT(f.path) FROM roots r "
+            "LEFT JOIN files f ON f.root = r.root GROUP BY r.root ORDER BY r.root"
+        ).fetchall()
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def stored_entries(self, root: str) -> Dict[str, Tuple[int, int, str]]:
+        """Voci di una radice: {percorso: (dimensione, mtime_ns, hash)}."""
+        return {path: (size, mtime_ns, digest) for path, size, mtime_ns, digest in
+                self._connection.execute(
+                    "SELECT path, size, mtime_ns, digest FROM files WHERE root = ?", (root,))}
+
+    def update_root(self, root: str, entries: Iterable[Tuple[str, int, int, str]]) -> None:
+        """
+        Sostituisce il contenuto di una radice in un'unica transazione.
+
+        Args:
+            root: Radice di riferimento (percorso assoluto)
+            entries: Tuple (percorso, dimensione, mtime_ns, hash)
+        """
+        with self._connection:
+            self._connection.execute("DELETE FROM files WHERE root = ?", (root,))
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO files (path, root, size, mtime_ns, digest) "
+                "VALUES (?, ?, ?, ?, ?)",
+                ((path, root, size, mtime_ns, digest) for path, size, mtime_ns, digest in entries))
+            self._connection.execute(
+                "INSERT OR REPLACE INTO roots (root, indexed) VALUES (?, ?)",
+                (root, datetime.now().isoformat(timespec='seconds')))
+            self._changed()
+
+    def remove_root(self, root: str) -> int:
+        """Toglie una radice dall'indice; restituisce il numero di file rimossi."""
+        with self._connection:
+            removed = self._connection.execute("DELETE FROM files WHERE root = ?", (root,)).rowcount
+            self._connection.execute("DELETE FROM roots WHERE root = ?", (root,))
+            self._changed()
+        return removed
+
+    def is_indexed(self, path: str) -> bool:
+        """True se il percorso (assoluto) è esso stesso un file di riferimento."""
+        return self._connection.execute(
+            "SELECT 1 FROM files WHERE path = ? LIMIT 1", (path,)).fetchone() is not None
+
+    def has_size(self, size: int) -> bool:
+        """True se almeno un file di riferimento ha questa dimensione."""
+        if self._sizes is None:
+            # Le dimensioni distinte stanno comodamente in memoria anche per milioni di file
+            self._sizes = {size for size, in self._connection.execute("SELECT DISTINCT size FROM files")}
+        return size in self._sizes
+
+    def membership_filter(self, fp_rate: float = DEFAULT_FP_RATE) -> BloomFilter:
+        """
+        Filtro di Bloom delle chiavi (dimensione, hash) dell'indice.
+
+        Il filtro salvato viene mappato da file se corrisponde alla generazione
+        attuale dell'indice, altrimenti viene ricostruito e salvato.
+        """
+        if self._bloom is not None:
+            return self._bloom
+        generation = self.generation
+        try:
+            bloom = BloomFilter.load(self.bloom_path)
+            if bloom.tag == generation:
+                self._bloom = bloom
+                return bloom
+            bloom.close()
+        except (OSError, ValueError):
+            pass
+
+        bloom = BloomFilter.create(len(self), fp_rate, tag=generation)
+        bloom.update(digest_key(size, digest) for size, digest in
+                     self._connection.execute("SELECT size, digest FROM files"))
+        try:
+            bloom.save(self.bloom_path)
+        except OSError:
+            pass  # il filtro resta valido in memoria
+        self._bloom = bloom
+        return bloom
+
+    def contains(self, size: int, digest: str) -> bool:
+        """True se un file di riferimento ha la stessa dimensione e hash."""
+        if digest_key(size, digest) not in self.membership_filter():
+            return False  # negativo certo, senza interrogare il database
+        return self._connection.execute(
+            "SELECT 1 FROM files WHERE size = ? AND digest = ? LIMIT 1", (size, digest)
+        ).fetchone() is not None
+
+    def lookup(self, size: int, digest: str) -> List[str]:
+        """Percorsi di riferimento con la stessa dimensione e hash."""
+        return [path for path, in self._connection.execute(
+            "SELECT path FROM files WHERE size = ? AND digest = ? ORDER BY path", (size, digest))]
+
+    def close(self) -> None:
+        if self._bloom is not None:
+            self._bloom.close()
+            self._bloom = None
+        self._connection.close()
+
+    def __enter__(self) -> "ReferenceIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def file_signature(file_path: Path) -> Optional[Tuple[int, int]]:
+    """(dimensione, mtime_ns) di un file, None se non leggibile."""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
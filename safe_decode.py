@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Decodifica sorvegliata e quarantena
+
+Un singolo file patologico (TIFF corrotto, PNG "decompression bomb") non
+deve bloccare una scansione di ore:
+- limite di pixel verificato sull'intestazione prima di decodificare
+- limite di tempo per file, applicato dal pool di processi (verify_engine),
+  che termina il worker bloccato e prosegue con gli altri file
+- i file che superano i limiti o fanno cadere il worker finiscono in una
+  lista di quarantena persistente: le scansioni successive non li
+  decodificano più, ma li confrontano ancora per hash
+Un file in quarantena torna a essere analizzato se dimensione o data di
+modifica cambiano.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# File di quarantena condiviso tra le esecuzioni
+DEFAULT_QUARANTINE_FILE = Path.home() / '.image_duplicate_finder' / 'quarantine.json'
+
+# Tempo massimo di decodifica per file (secondi)
+DEFAULT_DECODE_TIMEOUT = 120.0
+
+# Pixel massimi decodificabili (le scansioni da gigapixel restano sotto la soglia)
+DEFAULT_MAX_PIXELS = 1_000_000_000
+
+# Motivi di quarantena
+REASON_TIMEOUT = 'timeout'
+REASON_PIXEL_LIMIT = 'pixel_limit'
+REASON_CRASH = 'crash'
+
+
+def apply_pixel_limit(max_pixels: int) -> None:
+    """
+    Allinea il controllo "decompression bomb" di Pillow al limite configurato.
+
+    Modifica un'impostazione globale di Pillow: va chiamata dal programma
+    (main, inizializzatore dei worker), non dalle classi di libreria.
+    """
+    from PIL import Image
+    # Pillow avvisa oltre MAX_IMAGE_PIXELS e solleva un errore oltre il doppio
+    Image.MAX_IMAGE_PIXELS = max_pixels
+
+
+def exceeds_pixel_limit(dimensions: Optional[Tuple[int, int]], max_pixels: int) -> bool:
+    """True se le dimensioni dell'intestazione superano il limite (0 = nessun limite)."""
+    if not dimensions or not max_pixels:
+        return False
+    return dimensions[0] * dimensions[1] > max_pixels
+
+
+class QuarantineStore:
+    """Lista persistente dei file da non decodificare più."""
+
+    def __init__(self, path: Path = DEFAULT_QUARANTINE_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict]] = None
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def contains(self, file_path: Path) -> bool:
+        """True se il file è in quarantena e non è cambiato da allora."""
+        with self._lock:
+            entry = self._load().get(str(file_path))
+        if entry is None:
+            return False
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        return entry.get('size') == stat.st_size and entry.get('mtime') == stat.st_mtime
+
+    def add(self, file_path: Path, reason: str) -> None:
+        """Mette un file in quarantena; errori di scrittura non sono fatali."""
+        try:
+            stat = os.stat(file_path)
+            size, mtime = stat.st_size, stat.st_mtime
+        except OSError:
+            size = mtime = None
+        with self._lock:
+            self._load()[str(file_path)] = {
+                'reason': reason,
+                'size': size,
+                'mtime': mtime,
+                'added': datetime.now().isoformat(timespec='seconds')
+            }
+            self._save()
+
+    def remove(self, file_path: Path) -> None:
+        """Toglie un file dalla quarantena."""
+        with self._lock:
+            if self._load().pop(str(file_path), None) is not None:
+                self._save()
+
+    def entries(self) -> Dict[str, Dict]:
+        """Copia delle voci in quarantena {percorso: dettagli}."""
+        with self._lock:
+            return dict(self._load())
+
+    def clear(self) -> None:
+        """Svuota la quarantena."""
+        with self._lock:
+            self._entries = {}
+            self._save()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Regole di esclusione della scansione
+
+Regole include/exclude in formato glob, compilate in un'unica espressione
+regolare e valutate durante la visita delle directory:
+- le directory escluse non vengono nemmeno elencate (sottoalbero saltato)
+- i file vengono filtrati per nome prima di qualsiasi stat
+- i limiti di dimensione vengono applicati con lo stat già fornito da scandir
+
+Ogni radice di scansione può contenere un file .dupignore con un pattern per
+riga, con la semantica di .gitignore: # per i commenti, l'ultima regola che
+corrisponde vince e !pattern annulla un'esclusione precedente (anche quelle
+predefinite o di --exclude). Un file dentro una directory esclusa resta
+escluso salvo una regola ! che lo riguardi direttamente; per questo una
+directory esclusa viene visitata solo se una regola ! con percorso può
+corrispondere a qualcosa al suo interno.
+"""
+
+import fnmatch
+import os
+import re
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Pattern, Set, Tuple
+
+from sidecar import SIDECAR_NAME
+
+
+class _IgnoreRule:
+    """Riga di un .dupignore: glob sul nome o sul percorso relativo, eventualmente negata."""
+
+    def __init__(self, line: str):
+        self.negate = line.startswith('!')
+        pattern = (line[1:] if self.negate else line).strip()
+        # Come in .gitignore: un '/' (non finale) ancora il pattern al percorso relativo
+        self.on_path = '/' in pattern.rstrip('/')
+        self.pattern = pattern.strip('/')
+        self.regex = re.compile(fnmatch.translate(self.pattern))
+
+    def matches(self, name: str, rel_path: str) -> bool:
+        return bool(self.regex.match(rel_path if self.on_path else name))
+
+    def may_match_inside(self, rel_dir: str) -> bool:
+        """True se il pattern (con percorso) può corrispondere a un elemento sotto rel_dir."""
+        if not self.on_path:
+            return False
+        dir_parts = rel_dir.split('/')
+        parts = self.pattern.split('/')
+        return len(parts) > len(dir_parts) and all(
+            fnmatch.fnmatchcase(part, pattern) for part, pattern in zip(dir_parts, parts))
+
+
+def _compile_globs(patterns: Iterable[str]) -> Optional[Pattern]:
+    """Compila una lista di glob in un'unica regex (None se la lista è vuota)."""
+    patterns = [p.strip().rstrip('/') for p in patterns if p and p.strip()]
+    if not patterns:
+        return None
+    return re.compile('|'.join(f'(?:{fnmatch.translate(p)})' for p in patterns))
+
+
+class ScanFilter:
+    """Filtri applicati durante la visita dell'albero delle directory."""
+
+    # Directory che non contengono mai foto da deduplicare
+    DEFAULT_EXCLUDES = [
+        '.git', '.svn', '.hg', 'node_modules', '__pycache__',
+        '.thumbnails', '@eaDir', '.Trash*', '$RECYCLE.BIN',
+        'web_garbage_duplicates', 'web_results', 'garbage_duplicates'
+    ]
+
+    # Nome del file di regole letto in ogni radice di scansione
+    IGNORE_FILE_NAME = '.dupignore'
+
+    def __init__(self, include: Optional[List[str]] = None,
+                 exclude: Optional[List[str]] = None,
+                 min_size: int = 0, max_size: Optional[int] = None,
+                 use_default_excludes: bool = True,
+                 ignore_rules: Optional[List[str]] = None):
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.min_size = max(0, min_size or 0)
+        self.max_size = max_size
+        self.use_default_excludes = use_default_excludes
+        # Righe del .dupignore in ordine (valutate dopo le esclusioni di base)
+        self.ignore_rules = list(ignore_rules or [])
+        self._rules = [_IgnoreRule(line) for line in self.ignore_rules]
+
+        excludes = (self.DEFAULT_EXCLUDES if use_default_excludes else []) + self.exclude
+        # I pattern senza '/' valgono per il solo nome, gli altri per il percorso relativo
+        self._exclude_names = _compile_globs(p for p in excludes if '/' not in p.rstrip('/'))
+        self._exclude_paths = _compile_globs(p for p in excludes if '/' in p.rstrip('/'))
+        self._include_names = _compile_globs(p for p in self.include if '/' not in p)
+        self._include_paths = _compile_globs(p for p in self.include if '/' in p)
+
+    def settings(self) -> Dict:
+        """Regole in forma serializzabile (per riconoscere i checkpoint compatibili)."""
+        return {
+            'include': self.include,
+            'exclude': self.exclude,
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'use_default_excludes': self.use_default_excludes,
+            'ignore_rules': self.ignore_rules
+        }
+
+    @property
+    def has_size_limits(self) -> bool:
+        """True se è necessario conoscere la dimensione dei file."""
+        return self.min_size > 0 or self.max_size is not None
+
+    def with_ignore_file(self, root: Path) -> "ScanFilter":
+        """Restituisce un filtro che aggiunge le regole del .dupignore della radice."""
+        ignore_file = root / self.IGNORE_FILE_NAME
+        try:
+            lines = ignore_file.read_text(encoding='utf-8').splitlines()
+        except OSError:
+            return self
+
+        rules = [line.strip() for line in lines]
+        rules = [line for line in rules if line and not line.startswith('#') and line != '!']
+        if not rules:
+            return self
+        return ScanFilter(self.include, self.exclude, self.min_size, self.max_size,
+                          self.use_default_excludes, self.ignore_rules + rules)
+
+    def _decision(self, name: str, rel_path: str) -> Optional[bool]:
+        """True/False se una regola riguarda direttamente l'elemento (l'ultima vince), altrimenti None."""
+        for rule in reversed(self._rules):
+            if rule.matches(name, rel_path):
+                return not rule.negate
+        if ((self._exclude_names and self._exclude_names.match(name)) or
+                (self._exclude_paths and self._exclude_paths.match(rel_path))):
+            return True
+        return None
+
+    def _excluded(self, name: str, rel_path: str, inherited: bool = False) -> bool:
+        decision = self._decision(name, rel_path)
+        return inherited if decision is None else decision
+
+    def directory_excluded(self, rel_dir: str) -> bool:
+        """True se la directory (percorso relativo, '.' per la radice) è esclusa, anche per ereditarietà."""
+        excluded = False
+        if rel_dir in ('', '.'):
+            return excluded
+        parts = rel_dir.split('/')
+        for depth in range(1, len(parts) + 1):
+            excluded = self._excluded(parts[depth - 1], '/'.join(parts[:depth]), excluded)
+        return excluded
+
+    def allows_directory(self, name: str, rel_path: str, inherited: bool = False) -> bool:
+        """Valuta una directory prima di discendervi (True se va visitata)."""
+        if not self._excluded(name, rel_path, inherited):
+            return True
+        # Esclusa: va visitata solo se una regola ! può reincludere qualcosa al suo interno
+        return any(rule.negate and rule.may_match_inside(rel_path) for rule in self._rules)
+
+    def allows_file(self, name: str, rel_path: str, inherited: bool = False) -> bool:
+        """Valuta un file per nome e percorso, senza stat."""
+        # File di regole e sidecar (anche temporanei) non sono mai immagini da confrontare
+        if (name == self.IGNORE_FILE_NAME or name.startswith(SIDECAR_NAME)
+                or self._excluded(name, rel_path, inherited)):
+            return False
+        if self._include_names is None and self._include_paths is None:
+            return True
+        return bool((self._include_names and self._include_names.match(name)) or
+                    (self._include_paths and self._include_paths.match(rel_path)))
+
+    def allows_size(self, size: int) -> bool:
+        """Applica i limiti minimo e massimo di dimensione (in byte)."""
+        if size < self.min_size:
+            return False
+        return self.max_size is None or size <= self.max_size
+
+    def list_directory(self, directory: Path, root: Path, extensions: Set[str],
+                       log: Optional[Callable[[str], None]] = None
+                       ) -> Tuple[List[Path], List[Path]]:
+        """
+        Elenca una directory applicando le regole.
+
+        Args:
+            directory: Directory da elencare
+            root: Radice della scansione (per i pattern con percorso relativo)
+            extensions: Estensioni ammesse (minuscole, con il punto)
+            log: Funzione di log opzionale
+
+        Returns:
+            Tupla (sottodirectory da visitare, file ammessi), in ordine alfabetico.
+            Solleva OSError se la directory non è leggibile.
+        """
+        log = log or (lambda message: None)
+        subdirs: List[Path] = []
+        files: List[Path] = []
+
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+        # Directory visitata solo per possibili reinclusioni: il contenuto resta escluso di default
+        inherited = bool(self._rules) and self.directory_excluded(
+            Path(directory).relative_to(root).as_posix())
+
+        for entry in entries:
+            rel_path = Path(entry.path).relative_to(root).as_posix()
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if self.allows_directory(entry.name, rel_path, inherited):
+                        subdirs.append(Path(entry.path))
+                    else:
+                        log(f"Directory esclusa: {entry.path}")
+                    continue
+
+                # Filtri sul nome prima di qualsiasi stat
+                if os.path.splitext(entry.name)[1].lower() not in extensions:
+                    continue
+                if not self.allows_file(entry.name, rel_path, inherited) or not entry.is_file():
+                    continue
+                if self.has_size_limits and not self.allows_size(entry.stat().st_size):
+                    continue
+            except OSError as e:
+                log(f"Impossibile leggere {entry.path}: {e}")
+                continue
+
+            files.append(Path(entry.path))
+
+        return subdirs, files
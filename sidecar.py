@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Indici sidecar per directory
+
+Per i dischi esterni che passano da una postazione all'altra una cache
+centrale non serve: ogni directory può contenere un file .dupindex con
+dimensione, mtime e hash dei propri file, così qualsiasi macchina che
+scansiona il disco riusa gli hash invece di rileggere le immagini.
+- le voci sono indicizzate per nome del file, quindi restano valide anche
+  se il disco viene montato con un'altra lettera o in un altro percorso
+- il file contiene un checksum delle voci: un sidecar troncato o
+  modificato a mano viene ignorato per intero
+- una voce vale solo se dimensione e mtime coincidono con il file attuale
+- la scrittura è atomica (file temporaneo + os.replace); gli errori
+  (es. disco in sola lettura) non interrompono la scansione
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Set
+
+# Nome del sidecar in ogni directory (ignorato dalla scansione delle immagini)
+SIDECAR_NAME = '.dupindex'
+
+SIDECAR_FORMAT = 'image-duplicate-finder sidecar'
+SIDECAR_VERSION = 1
+
+
+def _checksum(files: Dict[str, Dict]) -> str:
+    return hashlib.sha1(json.dumps(files, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def read_sidecar(directory: Path) -> Dict[str, Dict]:
+    """
+    Legge e valida il sidecar di una directory.
+
+    Returns:
+        {nome file: {'size', 'mtime_ns', 'md5'}}; vuoto se assente o non valido
+    """
+    try:
+        with open(Path(directory) / SIDECAR_NAME, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if (not isinstance(data, dict) or data.get('format') != SIDECAR_FORMAT
+            or data.get('version') != SIDECAR_VERSION):
+        return {}
+    files = data.get('files')
+    if not isinstance(files, dict) or data.get('checksum') != _checksum(files):
+        return {}
+    return files
+
+
+def write_sidecar(directory: Path, files: Dict[str, Dict]) -> None:
+    """Scrive il sidecar di una directory in modo atomico (solleva OSError)."""
+    sidecar_path = Path(directory) / SIDECAR_NAME
+    tmp_path = sidecar_path.with_name(SIDECAR_NAME + '.tmp')
+    data = {
+        'format': SIDECAR_FORMAT,
+        'version': SIDECAR_VERSION,
+        'files': files,
+        'checksum': _checksum(files)
+    }
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, sidecar_path)
+    except OSError:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+        raise
+
+
+class SidecarStore:
+    """Hash letti dai sidecar e aggiornamenti da riscrivere a fine calcolo."""
+
+    def __init__(self, log: Optional[Callable[[str], None]] = None):
+        self.log = log or (lambda message: None)
+        self._lock = threading.Lock()
+        self._directories: Dict[Path, Dict[str, Dict]] = {}
+        self._dirty: Set[Path] = set()
+
+    def _entries(self, directory: Path) -> Dict[str, Dict]:
+        entries = self._directories.get(directory)
+        if entries is None:
+            entries = self._directories[directory] = read_sidecar(directory)
+        return entries
+
+    def cached_digest(self, file_path: Path) -> Optional[str]:
+        """Hash dal sidecar, se il file non è cambiato da quando è stato calcolato."""
+        with self._lock:
+            entry = self._entries(file_path.parent).get(file_path.name)
+        if not entry:
+            return None
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        if (stat.st_size, stat.st_mtime_ns) != (entry.get('size'), entry.get('mtime_ns')):
+            return None
+        return entry.get('md5') or None
+
+    def cached_digests(self, paths: Iterable[Path]) -> Dict[Path, str]:
+        """Hash validi dai sidecar per i file indicati."""
+        digests = {}
+        for file_path in paths:
+            digest = self.cached_digest(file_path)
+            if digest:
+                digests[file_path] = digest
+        return digests
+
+    def record_digest(self, file_path: Path, digest: str) -> None:
+        """Registra un hash appena calcolato (thread-safe)."""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return
+        with self._lock:
+            self._entries(file_path.parent)[file_path.name] = {
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'md5': digest
+            }
+            self._dirty.add(file_path.parent)
+
+    def flush(self) -> int:
+        """
+        Riscrive i sidecar delle directory aggiornate.
+
+        Le voci dei file non più presenti vengono rimosse.
+
+        Returns:
+            Numero di sidecar scritti
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            pending = {directory: dict(self._directories[directory]) for directory in dirty}
+
+        written = 0
+        for directory, entries in pending.items():
+            entries = {name: entry for name, entry in entries.items() if (directory / name).is_file()}
+            try:
+                write_sidecar(directory, entries)
+                written += 1
+            except OSError as e:
+                self.log(f"Impossibile scrivere il sidecar in {directory}: {e}")
+        return written
@@ -0,0 +1,9 @@
+"""Configurazione comune dei test: i moduli del progetto stanno nella radice."""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+TEST_IMAGES = ROOT / 'test_images'
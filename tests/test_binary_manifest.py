@@ -0,0 +1,76 @@
+"""Test del manifest binario e del confronto tra librerie (binary_manifest.py)."""
+
+import hashlib
+
+import pytest
+
+from binary_manifest import BinaryManifest, diff_manifests, write_binary_manifest
+from manifest import ManifestRecord
+
+
+def _record(host: str, path: str, content: str, size: int) -> ManifestRecord:
+    return ManifestRecord(size, hashlib.md5(content.encode()).hexdigest(), host, path)
+
+
+def _write(tmp_path, name, host, records):
+    path = tmp_path / name
+    assert write_binary_manifest(path, records, host) == len(records)
+    return BinaryManifest(path)
+
+
+def test_round_trip_keeps_records_sorted(tmp_path):
+    records = [_record('nas', '/b/grande.jpg', 'grande', 5000),
+               _record('nas', '/a/piccolo.jpg', 'piccolo', 10),
+               _record('nas', '/a/è non ascii \udcff.png', 'altro', 700)]
+    with _write(tmp_path, 'a.idfm', 'nas', records) as manifest:
+        assert manifest.host == 'nas'
+        assert list(manifest) == sorted(records, key=lambda r: (r.size, bytes.fromhex(r.digest)))
+
+
+def test_diff_of_two_small_manifests(tmp_path):
+    a = [_record('a', '/a/comune1.jpg', 'comune', 100),
+         _record('a', '/a/comune2.jpg', 'comune', 100),
+         _record('a', '/a/solo_a.jpg', 'solo a', 100),
+         _record('a', '/a/stessa_dimensione.jpg', 'versione a', 300)]
+    b = [_record('b', '/b/comune.jpg', 'comune', 100),
+         _record('b', '/b/stessa_dimensione.jpg', 'versione b', 300),
+         _record('b', '/b/solo_b.jpg', 'solo b', 900)]
+
+    with _write(tmp_path, 'a.idfm', 'a', a) as manifest_a, \
+            _write(tmp_path, 'b.idfm', 'b', b) as manifest_b:
+        entries = list(diff_manifests(manifest_a, manifest_b))
+        outcome = {}
+        for entry in entries:
+            paths_a = sorted(manifest_a.record(i).path for i in entry.indexes_a)
+            paths_b = sorted(manifest_b.record(i).path for i in entry.indexes_b)
+            outcome[(tuple(paths_a), tuple(paths_b))] = entry.status
+
+        # Una voce per chiave distinta, con tutti i record della chiave
+        assert len(entries) == 5
+        assert outcome == {
+            (('/a/comune1.jpg', '/a/comune2.jpg'), ('/b/comune.jpg',)): 'match',
+            (('/a/solo_a.jpg',), ()): 'only_a',
+            (('/a/stessa_dimensione.jpg',), ()): 'only_a',
+            ((), ('/b/stessa_dimensione.jpg',)): 'only_b',
+            ((), ('/b/solo_b.jpg',)): 'only_b',
+        }
+        # Ordine crescente di (dimensione, hash)
+        keys = [(manifest_a.key(e.indexes_a[0]) if e.indexes_a else manifest_b.key(e.indexes_b[0]))
+                for e in entries]
+        assert keys == sorted(keys)
+
+
+def test_diff_with_empty_manifest(tmp_path):
+    records = [_record('a', '/a/x.jpg', 'x', 10), _record('a', '/a/y.jpg', 'y', 20)]
+    with _write(tmp_path, 'a.idfm', 'a', records) as manifest_a, \
+            _write(tmp_path, 'vuoto.idfm', 'b', []) as empty:
+        assert [e.status for e in diff_manifests(manifest_a, empty)] == ['only_a', 'only_a']
+        assert [e.status for e in diff_manifests(empty, manifest_a)] == ['only_b', 'only_b']
+        assert list(diff_manifests(empty, empty)) == []
+
+
+def test_invalid_file_is_rejected(tmp_path):
+    path = tmp_path / 'non_manifest.idfm'
+    path.write_bytes(b'# image-duplicate-finder manifest v1\n' * 4)
+    with pytest.raises(ValueError):
+        BinaryManifest(path)
@@ -0,0 +1,89 @@
+"""Test del filtro di Bloom (bloom.py) e del suo uso nell'indice di riferimento."""
+
+import hashlib
+
+import pytest
+
+from bloom import BloomFilter, digest_key
+from reference_index import ReferenceIndex
+
+
+def _key(n: int) -> bytes:
+    return digest_key(n, hashlib.md5(str(n).encode()).hexdigest())
+
+
+def test_observed_false_positive_rate_matches_target():
+    inserted = 20000
+    bloom = BloomFilter.create(inserted, fp_rate=0.01)
+    bloom.update(_key(n) for n in range(inserted))
+
+    assert all(_key(n) in bloom for n in range(inserted))
+    probes = 100000
+    false_positives = sum(_key(n) in bloom for n in range(inserted, inserted + probes))
+    # Atteso circa l'1%: tolleranza ampia per non dipendere dalle chiavi scelte
+    assert 0.005 <= false_positives / probes <= 0.015
+    assert abs(bloom.expected_fp_rate - 0.01) < 0.002
+
+
+def test_save_and_mmap_load_round_trip(tmp_path):
+    bloom = BloomFilter.create(1000, fp_rate=0.01, tag=7)
+    bloom.update(_key(n) for n in range(1000))
+    path = tmp_path / 'filtro.bloom'
+    bloom.save(path)
+
+    loaded = BloomFilter.load(path)
+    try:
+        assert (loaded.bits, loaded.hashes, loaded.count, loaded.tag) == \
+            (bloom.bits, bloom.hashes, bloom.count, 7)
+        assert all(_key(n) in loaded for n in range(1000))
+        assert [_key(n) in loaded for n in range(1000, 3000)] == \
+            [_key(n) in bloom for n in range(1000, 3000)]
+    finally:
+        loaded.close()
+
+
+def test_load_rejects_invalid_file(tmp_path):
+    path = tmp_path / 'filtro.bloom'
+    for content in (b'', b'non un filtro di Bloom' * 4):
+        path.write_bytes(content)
+        with pytest.raises(ValueError):
+            BloomFilter.load(path)
+
+
+def _entries(root: str, numbers):
+    return [(f"{root}/{n}.jpg", n, 0, hashlib.md5(str(n).encode()).hexdigest()) for n in numbers]
+
+
+def test_stale_filter_is_rebuilt(tmp_path):
+    db = tmp_path / 'riferimento.db'
+    with ReferenceIndex(db) as index:
+        index.update_root('/archivio', _entries('/archivio', range(100)))
+        assert index.membership_filter().tag == index.generation
+    assert index.bloom_path.exists()
+
+    # Un altro processo modifica l'indice: il filtro salvato ha la generazione precedente
+    with ReferenceIndex(db) as index:
+        index.update_root('/nuovo', _entries('/nuovo', [500]))
+        generation = index.generation
+
+    with ReferenceIndex(db) as index:
+        bloom = index.membership_filter()
+        assert bloom.tag == generation
+        assert _key(500) in bloom
+        assert index.contains(500, hashlib.md5(b'500').hexdigest())
+
+    # Il filtro ricostruito è stato salvato con la nuova generazione
+    saved = BloomFilter.load(tmp_path / 'riferimento.db.bloom')
+    try:
+        assert saved.tag == generation
+    finally:
+        saved.close()
+
+
+def test_modification_invalidates_loaded_filter(tmp_path):
+    with ReferenceIndex(tmp_path / 'riferimento.db') as index:
+        index.update_root('/archivio', _entries('/archivio', range(10)))
+        assert _key(42) not in index.membership_filter()
+        index.update_root('/altro', _entries('/altro', [42]))
+        assert _key(42) in index.membership_filter()
+        assert index.membership_filter().tag == index.generation
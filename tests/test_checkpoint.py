@@ -0,0 +1,100 @@
+"""Test dei checkpoint di scansione (checkpoint.py): journal, ripresa e lock."""
+
+import pytest
+
+from checkpoint import CheckpointInUseError, ScanCheckpoint
+
+
+@pytest.fixture
+def files(tmp_path):
+    root = tmp_path / 'foto'
+    root.mkdir()
+    paths = []
+    for n in range(3):
+        path = root / f'{n}.jpg'
+        path.write_bytes(b'x' * (n + 1))
+        paths.append(path)
+    return root, paths
+
+
+def test_resume_after_torn_journal_line(tmp_path, files):
+    root, paths = files
+    state = tmp_path / 'stato.json'
+    checkpoint = ScanCheckpoint(state, root)
+    checkpoint.complete_scan(paths)
+    checkpoint.record_digest(paths[0], 'a' * 32)
+    checkpoint.record_digest(paths[1], 'b' * 32)
+    checkpoint.close()
+
+    # Interruzione a metà della scrittura di una riga
+    journal = state.with_suffix('.journal')
+    valid = journal.read_bytes()
+    with open(journal, 'ab') as f:
+        f.write(b'["cccccccc", "' + str(paths[2]).encode())
+
+    resumed = ScanCheckpoint(state, root, resume=True)
+    assert resumed.scan_complete and resumed.image_paths == paths
+    assert resumed.cached_digest(paths[0]) == 'a' * 32
+    assert resumed.cached_digest(paths[1]) == 'b' * 32
+    assert resumed.cached_digest(paths[2]) is None
+    # La riga troncata viene tolta: le nuove righe non si accodano a essa
+    assert journal.read_bytes() == valid
+    resumed.record_digest(paths[2], 'c' * 32)
+    resumed.close()
+
+    again = ScanCheckpoint(state, root, resume=True)
+    try:
+        assert [again.cached_digest(path) for path in paths] == ['a' * 32, 'b' * 32, 'c' * 32]
+    finally:
+        again.close()
+
+
+def test_changed_file_invalidates_journal_entry(tmp_path, files):
+    root, paths = files
+    state = tmp_path / 'stato.json'
+    checkpoint = ScanCheckpoint(state, root)
+    checkpoint.record_digest(paths[0], 'a' * 32)
+    checkpoint.close()
+
+    paths[0].write_bytes(b'contenuto diverso')
+    resumed = ScanCheckpoint(state, root, resume=True)
+    try:
+        assert resumed.cached_digest(paths[0]) is None
+    finally:
+        resumed.close()
+
+
+def test_checkpoint_of_other_settings_is_discarded(tmp_path, files):
+    root, paths = files
+    state = tmp_path / 'stato.json'
+    checkpoint = ScanCheckpoint(state, root, settings={'min_size': 0})
+    checkpoint.complete_scan(paths)
+    checkpoint.close()
+
+    resumed = ScanCheckpoint(state, root, resume=True, settings={'min_size': 1024})
+    try:
+        assert not resumed.has_scan_state and not resumed.image_paths
+    finally:
+        resumed.close()
+
+
+def test_concurrent_run_on_same_checkpoint_is_refused(tmp_path, files):
+    root, paths = files
+    state = tmp_path / 'stato.json'
+    first = ScanCheckpoint(state, root)
+    first.complete_scan(paths)
+    first.record_digest(paths[0], 'a' * 32)
+    first.flush()
+
+    with pytest.raises(CheckpointInUseError):
+        ScanCheckpoint(state, root)
+    # Lo stato della prima esecuzione non è stato toccato
+    assert state.exists() and state.with_suffix('.journal').stat().st_size > 0
+
+    first.close()
+    second = ScanCheckpoint(state, root, resume=True)
+    try:
+        assert second.cached_digest(paths[0]) == 'a' * 32
+    finally:
+        second.finish()
+    assert not state.exists()
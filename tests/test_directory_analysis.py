@@ -0,0 +1,63 @@
+"""Test dell'analisi delle directory duplicate (directory_analysis.py)."""
+
+from pathlib import Path
+
+from directory_analysis import DuplicateDirectoryGroup, analyze_directories
+
+ROOT = Path('/foto')
+
+
+def _tree(files):
+    """{percorso relativo: contenuto} -> (hash, dimensioni) con file da 100 byte."""
+    digests = {ROOT / path: content for path, content in files.items()}
+    sizes = {path: 100 for path in digests}
+    return digests, sizes
+
+
+def test_trees_differing_by_one_file():
+    digests, sizes = _tree({
+        'A/x.jpg': 'x', 'A/y.jpg': 'y', 'A/sub/z.jpg': 'z',
+        'B/x.jpg': 'x', 'B/y.jpg': 'y', 'B/sub/z.jpg': 'z', 'B/extra.jpg': 'extra',
+    })
+    analysis = analyze_directories(digests, sizes)
+
+    # Solo le sottocartelle identiche più alte formano un gruppo
+    assert analysis.duplicate_groups == [
+        DuplicateDirectoryGroup([ROOT / 'A/sub', ROOT / 'B/sub'], 1, 100)]
+    # A è interamente presente in B; B ha un file in più (75% < 80%)
+    assert [(entry.directory, entry.duplicated_size, entry.size)
+            for entry in analysis.partial_duplicates] == [(ROOT / 'A', 300, 300)]
+
+
+def test_identical_trees_are_one_group():
+    digests, sizes = _tree({
+        'A/x.jpg': 'x', 'A/sub/z.jpg': 'z',
+        'copia di A/x (1).jpg': 'x', 'copia di A/altro nome/z.jpg': 'z',
+    })
+    analysis = analyze_directories(digests, sizes)
+    assert analysis.duplicate_groups == [
+        DuplicateDirectoryGroup([ROOT / 'A', ROOT / 'copia di A'], 2, 200)]
+    assert analysis.duplicate_groups[0].reclaimable == 200
+    assert analysis.partial_duplicates == []
+
+
+def test_copies_inside_a_directory_are_not_duplicated_elsewhere():
+    digests, sizes = _tree({
+        'C/p.jpg': 'p', 'C/q/p_copia.jpg': 'p',
+        'D/r.jpg': 'r',
+    })
+    analysis = analyze_directories(digests, sizes)
+    # La copia in C/q è presente altrove (in C); per C stessa entrambe le copie sono interne
+    assert [(entry.directory, entry.duplicated_size) for entry in analysis.partial_duplicates] == \
+        [(ROOT / 'C/q', 100)]
+    assert analysis.duplicate_groups == []
+
+
+def test_threshold_is_configurable():
+    digests, sizes = _tree({
+        'A/x.jpg': 'x', 'A/y.jpg': 'y',
+        'B/x.jpg': 'x', 'B/y.jpg': 'y', 'B/extra.jpg': 'extra',
+    })
+    partial = analyze_directories(digests, sizes, min_ratio=0.6).partial_duplicates
+    assert sorted(entry.directory for entry in partial) == [ROOT / 'A', ROOT / 'B']
+    assert analyze_directories({}, {}).duplicate_groups == []
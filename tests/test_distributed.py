@@ -0,0 +1,104 @@
+"""Test della scansione distribuita (distributed.py) con worker locali."""
+
+import contextlib
+import io
+import shutil
+import socket
+import threading
+import time
+
+import pytest
+
+from conftest import TEST_IMAGES
+from distributed import ShardCoordinator, _receive, _send, is_loopback, run_worker
+from image_duplicate_finder import ImageDuplicateFinder
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / 'foto'
+    shutil.copytree(TEST_IMAGES, root)
+    return root
+
+
+def _expected_groups(root):
+    """Gruppi per (dimensione, hash) della scansione in un unico processo."""
+    finder = ImageDuplicateFinder()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            finder.scan_directory(root)
+            records = finder.manifest_records()
+    finally:
+        finder.close()
+    groups = {}
+    for record in records:
+        groups.setdefault((record.size, record.digest), set()).add(record.path)
+    return sorted(sorted(paths) for paths in groups.values() if len(paths) > 1)
+
+
+def _paths(groups):
+    return sorted(sorted(record.path for record in group) for group in groups)
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def _connect(port):
+    """Attende che il coordinatore sia in ascolto."""
+    for _ in range(100):
+        try:
+            return socket.create_connection(('127.0.0.1', port), timeout=5)
+        except OSError:
+            time.sleep(0.05)
+    raise ConnectionError(f"coordinatore non raggiungibile sulla porta {port}")
+
+
+def test_local_workers_merge_results(tree):
+    coordinator = ShardCoordinator(tree)
+    with contextlib.redirect_stdout(io.StringIO()):
+        groups = coordinator.run('127.0.0.1', 0, local_workers=2)
+
+    assert len(coordinator.shards) > 1
+    assert coordinator.completed == set(coordinator.shards) and not coordinator.failed
+    assert _paths(groups) == _expected_groups(tree)
+    assert _paths(groups)
+
+
+def test_shard_of_killed_worker_is_reassigned(tree):
+    coordinator = ShardCoordinator(tree, shard_timeout=30)
+    coordinator.make_shards(8)
+    port = _free_port()
+    results = []
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        thread = threading.Thread(target=lambda: results.append(coordinator.run('127.0.0.1', port)),
+                                  daemon=True)
+        thread.start()
+
+        # Un worker riceve una porzione e cade prima di rispondere
+        with _connect(port) as connection:
+            reader = connection.makefile('r', encoding='utf-8')
+            writer = connection.makefile('w', encoding='utf-8')
+            _send(writer, {'type': 'hello', 'worker': 'caduto', 'host': 'caduto'})
+            lost = _receive(reader)['id']
+            reader.close()
+            writer.close()
+
+        run_worker('127.0.0.1', port, 'superstite')
+        thread.join(timeout=60)
+
+    assert not thread.is_alive()
+    assert coordinator.attempts[lost] == 1
+    assert coordinator.completed == set(coordinator.shards) and not coordinator.failed
+    assert _paths(results[0]) == _expected_groups(tree)
+    assert 'loopback' not in output.getvalue()
+
+
+def test_non_loopback_bind_is_detected():
+    assert is_loopback('127.0.0.1') and is_loopback('::1') and is_loopback('localhost')
+    assert not is_loopback('0.0.0.0')
+    assert not is_loopback('')
+    assert not is_loopback('192.168.1.10')
@@ -0,0 +1,77 @@
+"""Test della stima a campione dei duplicati (estimator.py)."""
+
+import random
+from pathlib import Path
+
+from estimator import estimate_duplicates
+
+
+def _population(seed: int = 1):
+    """
+    Popolazione sintetica con duplicati noti: gruppi di stessa dimensione in
+    più cartelle, di cui una parte con contenuto identico.
+
+    Returns:
+        (dimensioni, hash, duplicati veri, byte recuperabili veri)
+    """
+    rng = random.Random(seed)
+    sizes, digests = {}, {}
+    duplicates = reclaimable = 0
+    for bucket in range(3000):
+        size = rng.choice((50_000, 500_000, 5_000_000)) + bucket
+        folder = rng.choice(('foto', 'backup', 'telefono'))
+        copies = rng.choice((2, 2, 3, 4))
+        identical = rng.random() < 0.4
+        for k in range(copies):
+            path = Path('/archivio') / folder / f'{bucket}_{k}.jpg'
+            sizes[path] = size
+            digests[path] = f'{bucket:08x}' + ('0' * 24 if identical or k == 0 else f'{k:024x}')
+        if identical:
+            duplicates += copies - 1
+            reclaimable += size * (copies - 1)
+    # File con dimensione unica: certamente unici
+    for n in range(2000):
+        path = Path('/archivio/foto') / f'unico_{n}.jpg'
+        sizes[path] = 10_000_000 + n
+        digests[path] = f'{n:032x}'
+    return sizes, digests, duplicates, reclaimable
+
+
+def _hasher(digests, read):
+    def hash_files(paths):
+        read.extend(paths)
+        return {path: digests[path] for path in paths}
+    return hash_files
+
+
+def test_estimate_on_known_population_lands_in_interval():
+    sizes, digests, duplicates, reclaimable = _population()
+    covered = 0
+    for seed in range(20):
+        read = []
+        estimate = estimate_duplicates(sizes, _hasher(digests, read), sample_fraction=0.05, seed=seed)
+        assert estimate.duplicates.low <= estimate.duplicates.value <= estimate.duplicates.high
+        assert estimate.reclaimable.high <= estimate.upper_bound_bytes
+        # Si leggono solo i gruppi campionati, mai i file con dimensione unica
+        assert len(read) == estimate.sampled_files < estimate.candidate_files
+        assert not any(path.name.startswith('unico_') for path in read)
+        covered += (estimate.duplicates.low <= duplicates <= estimate.duplicates.high
+                    and estimate.reclaimable.low <= reclaimable <= estimate.reclaimable.high)
+    # Intervalli al 95%: quasi tutti i campioni devono contenere il valore vero
+    assert covered >= 17
+
+
+def test_full_sample_is_exact():
+    sizes, digests, duplicates, reclaimable = _population(seed=2)
+    estimate = estimate_duplicates(sizes, _hasher(digests, []), sample_fraction=1.0, seed=0)
+    assert estimate.sampled_buckets == estimate.candidate_buckets
+    assert estimate.duplicates == (duplicates, duplicates, duplicates)
+    assert estimate.reclaimable == (reclaimable, reclaimable, reclaimable)
+    assert estimate.total_files == len(sizes)
+
+
+def test_no_candidates():
+    sizes = {Path(f'/a/{n}.jpg'): n + 1 for n in range(10)}
+    estimate = estimate_duplicates(sizes, _hasher({}, []), seed=0)
+    assert estimate.candidate_buckets == 0 and estimate.sampled_files == 0
+    assert estimate.duplicates == (0.0, 0.0, 0.0)
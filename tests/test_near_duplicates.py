@@ -0,0 +1,63 @@
+"""Test dei quasi duplicati indipendenti dall'orientamento (near_duplicates.py)."""
+
+import random
+
+import pytest
+
+from conftest import TEST_IMAGES
+
+Image = pytest.importorskip('PIL.Image')
+ImageDraw = pytest.importorskip('PIL.ImageDraw')
+
+from features import extract_features  # noqa: E402
+from near_duplicates import group_similar_hashes, is_informative  # noqa: E402
+
+
+def _sample_features():
+    records = {}
+    for path in sorted(TEST_IMAGES.rglob('*')):
+        try:
+            records[path] = extract_features(path)
+        except Exception:
+            continue  # es. HEIC senza pillow-heif
+    return records
+
+
+def test_sample_set_does_not_merge_unrelated_images():
+    records = _sample_features()
+    groups, _ = group_similar_hashes({path: r['dihedral_dhash'] for path, r in records.items()})
+
+    flat = [path for path, r in records.items()
+            if not is_informative([int(value, 16) for value in r['dihedral_dhash']])]
+    assert flat, "il campione contiene immagini a tinta unita"
+    grouped = {path for group in groups for path in group}
+    assert not grouped & set(flat)
+    for group in groups:
+        # Nel campione gli unici quasi duplicati sono copie con gli stessi pixel
+        assert len({records[path]['pixel_digest'] for path in group}) == 1, group
+
+
+def _drawing(seed: int):
+    """Immagine con dettagli netti (cerchi casuali su fondo scuro)."""
+    rng = random.Random(seed)
+    img = Image.new('RGB', (400, 300), (30, 60, 90))
+    draw = ImageDraw.Draw(img)
+    for _ in range(20):
+        x, y = rng.randint(0, 350), rng.randint(0, 250)
+        draw.ellipse([x, y, x + 40, y + 40], fill=(rng.randint(0, 255),) * 3)
+    return img
+
+
+def test_rotated_and_flipped_copies_are_grouped(tmp_path):
+    original = _drawing(1)
+    original.save(tmp_path / 'originale.png')
+    original.transpose(Image.Transpose.ROTATE_90).save(tmp_path / 'ruotata.jpg', quality=90)
+    original.transpose(Image.Transpose.FLIP_LEFT_RIGHT).save(tmp_path / 'specchiata.png')
+    original.resize((200, 150)).transpose(Image.Transpose.TRANSVERSE).save(tmp_path / 'piccola.jpg')
+    _drawing(2).save(tmp_path / 'altra.png')
+
+    hashes = {path: extract_features(path)['dihedral_dhash'] for path in tmp_path.iterdir()}
+    groups, _ = group_similar_hashes(hashes)
+
+    assert [sorted(path.name for path in group) for group in groups] == [
+        ['originale.png', 'piccola.jpg', 'ruotata.jpg', 'specchiata.png']]
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Limitatore di risorse
+
+Modalità "throttled" per eseguire scansioni su server in produzione senza
+saturare disco e CPU. Un unico ResourceThrottle viene condiviso tra i worker
+di hashing e di decodifica e applica tre limiti:
+- byte al secondo letti dal disco (token bucket)
+- operazioni di I/O al secondo (token bucket)
+- quota di CPU per thread (pause proporzionali al tempo CPU consumato)
+I limiti possono essere modificati a runtime (GUI e interfaccia web).
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+
+class TokenBucket:
+    """Token bucket thread-safe; rate <= 0 significa nessun limite."""
+
+    def __init__(self, rate: float = 0.0):
+        self._lock = threading.Lock()
+        self.rate = 0.0
+        self.capacity = 0.0
+        self._tokens = 0.0
+        self._last = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate: float) -> None:
+        """Modifica il rate (token al secondo); ha effetto sulle richieste successive."""
+        with self._lock:
+            self.rate = max(0.0, float(rate or 0))
+            # Consenti burst di al massimo un secondo
+            self.capacity = self.rate
+            self._tokens = min(self._tokens, self.capacity)
+            self._last = time.monotonic()
+
+    def consume(self, amount: float) -> None:
+        """Preleva amount token, attendendo se il bucket è in debito."""
+        with self._lock:
+            if self.rate <= 0:
+                return
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # La prenotazione avviene sotto lock: i thread in attesa restano in fila
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+
+
+class ResourceThrottle:
+    """Limiti di I/O e CPU condivisi tra tutti i worker di una scansione."""
+
+    def __init__(self, bytes_per_second: float = 0, max_iops: float = 0,
+                 cpu_share: float = 1.0):
+        self._bytes_bucket = TokenBucket()
+        self._iops_bucket = TokenBucket()
+        self.cpu_share = 1.0
+        self.set_limits(bytes_per_second, max_iops, cpu_share)
+
+    @property
+    def enabled(self) -> bool:
+        """True se almeno un limite è attivo."""
+        return (self._bytes_bucket.rate > 0 or self._iops_bucket.rate > 0
+                or self.cpu_share < 1.0)
+
+    def set_limits(self, bytes_per_second: Optional[float] = None,
+                   max_iops: Optional[float] = None,
+                   cpu_share: Optional[float] = None) -> None:
+        """
+        Aggiorna i limiti; i parametri None restano invariati.
+
+        Args:
+            bytes_per_second: Budget di lettura in byte/s (0 = illimitato)
+            max_iops: Budget di operazioni di I/O al secondo (0 = illimitato)
+            cpu_share: Quota di CPU per worker tra 0.05 e 1.0 (1.0 = illimitato)
+        """
+        if bytes_per_second is not None:
+            self._bytes_bucket.set_rate(bytes_per_second)
+        if max_iops is not None:
+            self._iops_bucket.set_rate(max_iops)
+        if cpu_share is not None:
+            self.cpu_share = min(1.0, max(0.05, float(cpu_share)))
+
+    def get_limits(self) -> Dict[str, float]:
+        """Restituisce i limiti correnti."""
+        return {
+            'bytes_per_second': self._bytes_bucket.rate,
+            'max_iops': self._iops_bucket.rate,
+            'cpu_share': self.cpu_share
+        }
+
+    def throttle_io(self, nbytes: int = 0, operations: int = 1) -> None:
+        """Da chiamare prima di ogni lettura: attende il budget di IOPS e byte."""
+        if operations:
+            self._iops_bucket.consume(operations)
+        if nbytes:
+            self._bytes_bucket.consume(nbytes)
+
+    @contextmanager
+    def cpu_slice(self) -> Iterator[None]:
+        """
+        Delimita un blocco di lavoro CPU-bound (es. decodifica immagine).
+
+        All'uscita il thread dorme in proporzione al tempo CPU consumato,
+        così che la sua quota media non superi cpu_share.
+        """
+        start = time.thread_time()
+        try:
+            yield
+        finally:
+            share = self.cpu_share
+            if share < 1.0:
+                used = time.thread_time() - start
+                time.sleep(used * (1.0 - share) / share)
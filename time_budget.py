@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Tempo massimo e annullamento cooperativo
+
+Un TimeBudget viene passato a ImageDuplicateFinder e controllato dalle fasi
+della ricerca (visita, hash parziali, hash completi, verifica pixel) nei
+punti in cui possono fermarsi senza lasciare risultati incoerenti:
+- scadenza del tempo massimo (--time-budget)
+- annullamento esplicito (pulsante Stop dell'interfaccia grafica)
+Il lavoro non svolto viene registrato come UnverifiedCandidate, così il
+report distingue i duplicati confermati dai candidati rimasti da verificare.
+"""
+
+import threading
+import time
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+# Fasi in cui un candidato può restare non verificato
+STAGE_SCAN = 'visita'
+STAGE_SIZE = 'dimensione'
+STAGE_PARTIAL_HASH = 'hash parziale'
+STAGE_HASH = 'hash'
+
+
+class UnverifiedCandidate(NamedTuple):
+    """Gruppo di possibili duplicati non verificato entro il tempo disponibile."""
+    stage: str
+    size: int
+    paths: List[Path]
+
+
+class TimeBudget:
+    """Scadenza e richiesta di annullamento condivise tra le fasi (thread-safe)."""
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.seconds = seconds if seconds and seconds > 0 else None
+        self.started = time.monotonic()
+        self.deadline = self.started + self.seconds if self.seconds else None
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        """Chiede alle fasi in corso di fermarsi al primo punto sicuro."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def expired(self) -> bool:
+        """True se il tempo è scaduto o è stato richiesto l'annullamento."""
+        if self._cancelled.is_set():
+            return True
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def remaining(self) -> Optional[float]:
+        """Secondi rimasti (None se senza limite di tempo)."""
+        if self._cancelled.is_set():
+            return 0.0
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+
+def parse_duration(text: str) -> float:
+    """
+    Converte una durata in secondi: "90s", "45m", "1.5h" (numero senza unità = minuti).
+
+    Solleva ValueError se il formato non è valido.
+    """
+    text = text.strip().lower()
+    units = {'s': 1, 'm': 60, 'h': 3600}
+    factor = units.get(text[-1:]) if text else None
+    value = float(text[:-1] if factor else text)
+    if value < 0:
+        raise ValueError(f"Durata negativa: {text}")
+    return value * (factor or 60)
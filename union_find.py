@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Union-find
+
+Insiemi disgiunti su indici 0..n-1, usati per unire coppie simili in gruppi
+(es. raffiche di scatti).
+"""
+
+from typing import List
+
+
+class DisjointSet:
+    """Union-find con compressione dei cammini e unione per rango."""
+
+    def __init__(self, size: int):
+        self.parent: List[int] = list(range(size))
+        self.rank: List[int] = [0] * size
+
+    def find(self, item: int) -> int:
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a: int, b: int) -> None:
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.rank[a] < self.rank[b]:
+            a, b = b, a
+        self.parent[b] = a
+        if self.rank[a] == self.rank[b]:
+            self.rank[a] += 1
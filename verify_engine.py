@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Image Duplicate Finder - Motore di verifica multiprocesso
+
+La decodifica di Pillow trattiene il GIL per buona parte del lavoro: con i
+thread la verifica pixel non usa più di circa un core. Questo motore esegue
+extract_features in processi separati:
+- i worker restituiscono solo il record delle feature (digest, hash, ...),
+  pochi KB senza pixel: l'immagine decodificata non lascia mai il worker
+
+Il motore sorveglia anche i worker: un file che supera il tempo massimo o
+fa cadere il processo viene segnalato (quarantena) e il pool viene ricreato.
+I PID dei worker vengono comunicati dall'inizializzatore del pool, così un
+worker bloccato in una decodifica si può terminare.
+"""
+
+import multiprocessing
+import os
+import queue as queue_module
+import signal
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from features import extract_features
+from safe_decode import REASON_CRASH, REASON_TIMEOUT, apply_pixel_limit
+
+
+def _init_worker(max_pixels: int, pids) -> None:
+    pids.put(os.getpid())
+    if max_pixels:
+        apply_pixel_limit(max_pixels)
+
+
+def _extract_in_worker(path: str) -> Dict:
+    """Eseguita nel processo worker: il record delle feature, senza pixel."""
+    return extract_features(Path(path))
+
+
+class ProcessVerificationEngine:
+    """Pool di processi sorvegliato per la decodifica e il calcolo delle feature."""
+
+    def __init__(self, max_workers: Optional[int] = None,
+                 log: Optional[Callable[[str], None]] = None,
+                 timeout: Optional[float] = None, max_pixels: int = 0):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.log = log or (lambda message: None)
+        self.timeout = timeout
+        self.max_pixels = max_pixels
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._context = multiprocessing.get_context()
+        self._pid_queue = None
+        self._worker_pids: Set[int] = set()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self.log(f"Avvio pool di verifica con {self.max_workers} processi")
+            self._pid_queue = self._context.Queue()
+            self._worker_pids = set()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=self._context,
+                                                 initializer=_init_worker,
+                                                 initargs=(self.max_pixels, self._pid_queue))
+        return self._executor
+
+    def _kill_executor(self) -> None:
+        """Termina subito i worker (anche quelli bloccati in una decodifica)."""
+        if self._executor is None:
+            return
+        # ProcessPoolExecutor non offre un modo pubblico per interrompere un task:
+        # si terminano i worker di cui l'inizializzatore ha comunicato il PID
+        while True:
+            try:
+                self._worker_pids.add(self._pid_queue.get_nowait())
+            except (queue_module.Empty, OSError, ValueError):
+                break
+        for pid in self._worker_pids:
+            try:
+                os.kill(pid, signal.SIGTERM)  # su Windows equivale a TerminateProcess
+            except OSError:
+                pass  # già terminato
+        self._executor.shutdown(wait=False)
+        self._executor = None
+        self._pid_queue.close()
+        self._pid_queue = None
+
+    def extract_features(self, paths: List[Path],
+                         before_submit: Optional[Callable[[Path], None]] = None,
+                         progress_callback: Optional[Callable[[int, int], None]] = None,
+                         on_failure: Optional[Callable[[Path, str], None]] = None
+                         ) -> Dict[Path, Optional[Dict]]:
+        """
+        Calcola le feature dei file in parallelo su più processi.
+
+        Args:
+            paths: File da decodificare
+            before_submit: Chiamata una volta prima di inviare ogni file (es. limiti di I/O)
+            progress_callback: Chiamata con (completati, totale)
+            on_failure: Chiamata con (percorso, motivo) per i file che superano
+                il tempo massimo o fanno cadere il worker
+
+        Returns:
+            Dizionario {percorso: record delle feature o None se non decodificabile}
+        """
+        results: Dict[Path, Optional[Dict]] = {}
+        queue = deque(paths)
+        # File in corso quando un worker è caduto: ripetuti uno alla volta
+        suspects: deque = deque()
+        in_flight: Dict = {}
+        submitted = set()
+
+        def finish(path: Path, features: Optional[Dict], reason: Optional[str] = None) -> None:
+            results[path] = features
+            if reason:
+                self.log(f"Decodifica interrotta ({reason}): {path}")
+                if on_failure:
+                    on_failure(path, reason)
+            if progress_callback:
+                progress_callback(len(results), len(paths))
+
+        def collect(future, path: Path) -> None:
+            try:
+                features = future.result()
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                self.log(f"Errore nella decodifica di {path}: {e}")
+                finish(path, None)
+                return
+            finish(path, features)
+
+        def salvage(future, path: Path) -> bool:
+            """Raccoglie un task completato prima della chiusura del pool."""
+            if not future.done() or future.cancelled():
+                return False
+            try:
+                collect(future, path)
+                return True
+            except BrokenProcessPool:
+                return False
+
+        while queue or suspects or in_flight:
+            # Un solo task alla volta per i sospetti, così il colpevole è certo
+            limit = 1 if suspects else self.max_workers
+            source = suspects if suspects else queue
+            while source and len(in_flight) < limit:
+                path = source.popleft()
+                if before_submit and path not in submitted:
+                    before_submit(path)
+                submitted.add(path)
+                future = self._get_executor().submit(_extract_in_worker, str(path))
+                # Il task parte subito: i file in volo non superano i worker
+                in_flight[future] = (path, time.monotonic(), source is suspects)
+
+            wait_time = None
+            if self.timeout:
+                oldest = min(started for _, started, _ in in_flight.values())
+                wait_time = max(0.0, oldest + self.timeout - time.monotonic())
+            done, _ = wait(list(in_flight), timeout=wait_time, return_when=FIRST_COMPLETED)
+
+            broken = False
+            for future in done:
+                path, _, isolated = in_flight.pop(future)
+                try:
+                    collect(future, path)
+                except BrokenProcessPool:
+                    broken = True
+                    if isolated:
+                        finish(path, None, REASON_CRASH)
+                    else:
+                        suspects.append(path)
+
+            if broken:
+                # I task ancora in volo sono persi con il pool
+                for future, (path, _, _) in in_flight.items():
+                    if not salvage(future, path):
+                        suspects.append(path)
+                in_flight.clear()
+                self._kill_executor()
+                continue
+
+            if self.timeout:
+                now = time.monotonic()
+                expired = [future for future, (_, started, _) in in_flight.items()
+                           if now - started >= self.timeout]
+                if expired:
+                    for future in expired:
+                        finish(in_flight.pop(future)[0], None, REASON_TIMEOUT)
+                    # Gli altri file in volo ripartono nel nuovo pool
+                    for future, (path, _, isolated) in in_flight.items():
+                        if not salvage(future, path):
+                            (suspects if isolated else queue).appendleft(path)
+                    in_flight.clear()
+                    self._kill_executor()
+
+        return results
+
+    def close(self) -> None:
+        """Termina i processi worker."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            self._pid_queue.close()
+            self._pid_queue = None
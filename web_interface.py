@@ -15,9 +15,14 @@ from werkzeug.utils import secure_filename
 import threading
 import uuid
 from datetime import datetime
+from typing import Optional
 
 # Importa la classe principale
 from image_duplicate_finder import ImageDuplicateFinder
+from checkpoint import ScanCheckpoint
+from safe_decode import DEFAULT_MAX_PIXELS, apply_pixel_limit
+from throttle import ResourceThrottle
+from time_budget import STAGE_SCAN, TimeBudget
 
 app = Flask(__name__)
 app.secret_key = 'duplicate_finder_secret_key'
@@ -36,21 +41,30 @@ active_tasks = {}
 class WebDuplicateFinder:
     """Wrapper per l'interfaccia web."""
     
-    def __init__(self, task_id: str):
+    def __init__(self, task_id: str, throttle: ResourceThrottle = None):
         self.task_id = task_id
-        self.finder = ImageDuplicateFinder(verbose=True)
+        self.throttle = throttle or ResourceThrottle()
+        self.finder = ImageDuplicateFinder(verbose=True, throttle=self.throttle)
         self.status = "Inizializzazione..."
         self.progress = 0
         self.results = None
         self.error = None
         
-    def run_analysis(self, directory_path: str, pixel_verify: bool = True):
-        """Esegue l'analisi in background."""
+    def run_analysis(self, directory_path: str, pixel_verify: bool = True, resume: bool = False,
+                     time_budget: Optional[float] = None):
+        """Esegue l'analisi in background (time_budget in secondi, None = nessun limite)."""
         try:
+            if time_budget:
+                self.finder.time_budget = TimeBudget(time_budget)
             self.status = "Scansionando directory..."
             self.progress = 10
             
             directory = Path(directory_path)
+            # Checkpoint periodici: un task interrotto può essere ripreso
+            self.finder.checkpoint = ScanCheckpoint(
+                ScanCheckpoint.default_path(directory), directory, resume=resume,
+                settings=self.finder.scan_filter.settings(), log=self.finder.log
+            )
             self.finder.scan_directory(directory)
             
             if not self.finder.image_paths:
@@ -72,23 +86,32 @@ class WebDuplicateFinder:
             
             # Prepara risultati per JSON
             self.results = self._prepare_results()
+            # Una visita interrotta dal tempo massimo resta riprendibile
+            if not any(candidate.stage == STAGE_SCAN for candidate in self.finder.unverified):
+                self.finder.checkpoint.finish()
             
         except Exception as e:
             self.error = str(e)
             self.status = "Errore"
+        finally:
+            self.finder.close()
     
     def _prepare_results(self):
         """Prepara i risultati per la visualizzazione web."""
         if not self.finder.duplicates:
-            return {"groups": [], "summary": {"total_images": len(self.finder.image_paths), "duplicate_groups": 0, "duplicates_to_remove": 0, "space_saved": 0}}
+            return {"groups": [], "summary": {"total_images": len(self.finder.image_paths), "duplicate_groups": 0, "duplicates_to_remove": 0, "space_saved": 0,
+                                              "unverified_files": sum(self.finder.unverified_summary().values())}}
         
         groups = []
         total_duplicates = 0
         total_space_saved = 0
         
+        # Metadati letti in parallelo una sola volta e salvati nel catalogo
+        self.finder.prefetch_metadata()
+        
         for i, (file_hash, paths) in enumerate(self.finder.duplicates.items(), 1):
             if paths:
-                file_size = paths[0].stat().st_size
+                file_size = self.finder.get_image_metadata(paths[0])['size']
                 space_saved = file_size * (len(paths) - 1)
                 total_space_saved += space_saved
                 total_duplicates += len(paths) - 1
@@ -148,7 +171,9 @@ class WebDuplicateFinder:
                 "total_images": len(self.finder.image_paths),
                 "duplicate_groups": len(self.finder.duplicates),
                 "duplicates_to_remove": total_duplicates,
-                "space_saved": total_space_saved
+                "space_saved": total_space_saved,
+                # Candidati rimasti da verificare allo scadere del tempo massimo
+                "unverified_files": sum(self.finder.unverified_summary().values())
             }
         }
 
@@ -157,23 +182,44 @@ def index():
     """Pagina principale."""
     return render_template('index.html')
 
+def _parse_throttle_limits(data: dict) -> dict:
+    """Converte i limiti ricevuti dal browser (MB/s, IOPS, CPU %) per ResourceThrottle."""
+    limits = {}
+    if data.get('max_mbps') is not None:
+        limits['bytes_per_second'] = float(data['max_mbps']) * 1024 * 1024
+    if data.get('max_iops') is not None:
+        limits['max_iops'] = float(data['max_iops'])
+    if data.get('cpu_percent') is not None:
+        limits['cpu_share'] = float(data['cpu_percent']) / 100
+    return limits
+
 @app.route('/start_analysis', methods=['POST'])
 def start_analysis():
     """Avvia l'analisi in background."""
     data = request.get_json()
     directory = data.get('directory', '')
     pixel_verify = data.get('pixel_verify', True)
+    resume = bool(data.get('resume', False))
+    try:
+        time_budget = float(data.get('time_budget_minutes') or 0) * 60
+    except (TypeError, ValueError):
+        return jsonify({"error": "Tempo massimo non valido"}), 400
     
     if not directory or not Path(directory).exists():
         return jsonify({"error": "Directory non valida o inesistente"}), 400
     
+    try:
+        throttle = ResourceThrottle(**_parse_throttle_limits(data.get('throttle') or {}))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Limiti di risorse non validi"}), 400
+    
     # Crea nuovo task
     task_id = str(uuid.uuid4())
-    web_finder = WebDuplicateFinder(task_id)
+    web_finder = WebDuplicateFinder(task_id, throttle)
     active_tasks[task_id] = web_finder
     
     # Avvia analisi in background
-    thread = threading.Thread(target=web_finder.run_analysis, args=(directory, pixel_verify))
+    thread = threading.Thread(target=web_finder.run_analysis, args=(directory, pixel_verify, resume, time_budget or None))
     thread.daemon = True
     thread.start()
     
@@ -195,6 +241,21 @@ def get_status(task_id):
     
     return jsonify(response)
 
+@app.route('/throttle/<task_id>', methods=['GET', 'POST'])
+def throttle_limits(task_id):
+    """Legge o modifica a runtime i limiti di I/O e CPU di un task."""
+    if task_id not in active_tasks:
+        return jsonify({"error": "Task non trovato"}), 404
+    
+    task = active_tasks[task_id]
+    if request.method == 'POST':
+        try:
+            task.throttle.set_limits(**_parse_throttle_limits(request.get_json() or {}))
+        except (TypeError, ValueError):
+            return jsonify({"error": "Limiti di risorse non validi"}), 400
+    
+    return jsonify(task.throttle.get_limits())
+
 @app.route('/download_report/<task_id>')
 def download_report(task_id):
     """Scarica il report dei risultati."""
@@ -432,6 +493,7 @@ if __name__ == '__main__':
     print("📍 URL alternativo: http://127.0.0.1:5000")
     print("🔄 Premi Ctrl+C per fermare il server")
     print("=" * 50)
+    apply_pixel_limit(DEFAULT_MAX_PIXELS)
     
     try:
         app.run(debug=True, host='0.0.0.0', port=5000)